@@ -24,12 +24,45 @@ class Settings(BaseSettings):
 
     UPLOAD_DIR: str = "uploads"
     MAX_UPLOAD_MB: int = 10
+    UPLOAD_CHUNK_KB: int = 256
+    # CV text extraction runs in a process pool (services/pdf_pool.py).
+    PDF_WORKERS: int = 2
+    PDF_MAX_TASKS_PER_CHILD: int = 50
+    PDF_EXTRACT_TIMEOUT_SECONDS: float = 20.0
+    PDF_MAX_PAGES: int = 30
+    # Scoring only needs the first pages; extraction stops once this much
+    # text is collected.
+    PDF_MAX_CHARS: int = 50000
+    # Also report the peak heap per document via tracemalloc (the growth of
+    # the worker's peak RSS is always reported). Slows extraction down
+    # severalfold and traces every thread of the process it runs in, so only
+    # enable it to profile (the pool workers are separate processes).
+    PDF_TRACE_MEMORY: bool = False
+    # /vacancies/recommended: candidates scored per requested result, and how
+    # often the in-memory skill index is rebuilt from the database.
+    RECOMMEND_CANDIDATES_PER_RESULT: int = 20
+    RECOMMEND_MIN_CANDIDATES: int = 200
+    RECOMMEND_INDEX_REFRESH_SECONDS: float = 300.0
 
     STORAGE_PROVIDER: str = "local"
     AWS_ACCESS_KEY_ID: str | None = None
     AWS_SECRET_ACCESS_KEY: str | None = None
     AWS_S3_BUCKET: str | None = None
     AWS_REGION: str | None = None
+    # Shared S3 client (services/storage.py). The endpoint is for MinIO or the
+    # fake server in services/fake_s3.py; leave unset for AWS.
+    S3_ENDPOINT_URL: str | None = None
+    S3_ADDRESSING_STYLE: str = "auto"  # auto | path | virtual
+    S3_MAX_POOL_CONNECTIONS: int = 50
+    S3_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    S3_READ_TIMEOUT_SECONDS: float = 60.0
+    S3_MAX_ATTEMPTS: int = 3
+    # Uploads are streamed in UPLOAD_CHUNK_KB reads; to S3 as a multipart
+    # upload with parts of this size once they outgrow a single part. The
+    # part being collected is spooled to a temp file past S3_SPOOL_MEMORY_KB.
+    S3_MULTIPART_PART_MB: int = 8
+    S3_SPOOL_MEMORY_KB: int = 256
+    S3_PRESIGN_SECONDS: int = 3600
     
     bucket_name: str | None = None
     bucket_region: str | None = None
@@ -38,8 +71,92 @@ class Settings(BaseSettings):
 
     GEMINI_API_KEY: str | None = None
     OPENROUTER_API_KEY: str | None = None
-    LLM_PROVIDER: str = "gemini"  
+    LLM_PROVIDER: str = "gemini"  # gemini | openrouter | mock
     LLM_MODEL: str | None = None  
+    LLM_HTTP_MAX_CONNECTIONS: int = 200
+    LLM_HTTP_MAX_KEEPALIVE: int = 50
+    LLM_STREAMING: bool = True
+    # Per-stage routing; unset values fall back to LLM_MODEL / the built-in
+    # generation config. Stages: SCORE (application and batch scoring),
+    # QUESTION (chat turns, session summaries), FINAL (re-score when a chat ends).
+    LLM_SCORE_MODEL: str | None = None
+    LLM_SCORE_TEMPERATURE: float | None = None
+    LLM_SCORE_MAX_TOKENS: int | None = None
+    LLM_QUESTION_MODEL: str | None = None
+    LLM_QUESTION_TEMPERATURE: float | None = None
+    LLM_QUESTION_MAX_TOKENS: int | None = None
+    LLM_FINAL_MODEL: str | None = None
+    LLM_FINAL_TEMPERATURE: float | None = None
+    LLM_FINAL_MAX_TOKENS: int | None = None
+
+    LLM_RETRY_ATTEMPTS: int = 1
+    LLM_RETRY_BASE_DELAY_SECONDS: float = 0.25
+    LLM_RETRY_MAX_DELAY_SECONDS: float = 4.0
+    LLM_HEALTH_WINDOW: int = 50
+    LLM_BREAKER_ERROR_RATE: float = 0.5
+    LLM_BREAKER_MIN_REQUESTS: int = 10
+    LLM_BREAKER_CONSECUTIVE_FAILURES: int = 3
+    LLM_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    LLM_BREAKER_MAX_COOLDOWN_SECONDS: float = 600.0
+
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 0.9
+    LLM_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    LLM_HEDGE_DEFAULT_DELAY_SECONDS: float = 4.0
+    LLM_DEADLINE_SECONDS: float = 45.0
+
+    # Admission control for upstream calls: a global cap on in-flight requests
+    # and a token bucket per provider (requests/second, burst). 0 rps disables the bucket.
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_GEMINI_RPS: float = 10.0
+    LLM_GEMINI_BURST: float = 20.0
+    LLM_OPENROUTER_RPS: float = 10.0
+    LLM_OPENROUTER_BURST: float = 20.0
+    # Persist one llm_call_log row per upstream call made on behalf of an application.
+    LLM_CALL_LOG_ENABLED: bool = False
+    # Token budgets over a rolling window (0 = unlimited). Exhausted budgets
+    # make analyses fall back to the local compute_relevance heuristics.
+    LLM_TOKEN_BUDGET_PER_VACANCY: int = 0
+    LLM_TOKEN_BUDGET_PER_EMPLOYER: int = 0
+    LLM_TOKEN_BUDGET_WINDOW_DAYS: int = 30
+
+    # Background application scoring. "redis" needs the optional `redis`
+    # package and REDIS_URL; otherwise jobs are dispatched in-process.
+    SCORING_QUEUE_BACKEND: str = "local"  # local | redis
+    SCORING_WORKERS: int = 4
+    SCORING_MAX_ATTEMPTS: int = 3
+    SCORING_REDIS_KEY: str = "smartbot:scoring_jobs"
+
+    # Per-section prompt budgets, in (estimated) tokens.
+    LLM_PROMPT_BUDGET_REQUIREMENTS: int = 1000
+    LLM_PROMPT_BUDGET_CV: int = 4000
+    LLM_PROMPT_BUDGET_PROFILE: int = 600
+    LLM_PROMPT_BUDGET_PASSAGES: int = 1200
+    LLM_PROMPT_BUDGET_CHAT: int = 1500
+    LLM_PROMPT_BUDGET_SUMMARY: int = 500
+
+    # Chat turns send the rolling summary plus this many latest messages; older
+    # messages are folded into ChatSession.context_summary.
+    CHAT_RECENT_MESSAGES: int = 6
+    CHAT_SUMMARY_MAX_ITEMS: int = 12
+
+    LLM_BATCH_MAX_SIZE: int = 10
+    LLM_BATCH_BUDGET_TOKENS: int = 3000
+    LLM_BATCH_REQUIREMENTS_TOKENS: int = 400
+
+    # LLM_PROVIDER=mock: OpenRouter-compatible mock, in-process unless a URL is given.
+    MOCK_LLM_BASE_URL: str | None = None
+    MOCK_LLM_LATENCY_MS: float = 800.0
+    MOCK_LLM_LATENCY_SIGMA: float = 0.5
+    MOCK_LLM_TTFT_FRACTION: float = 0.3
+    MOCK_LLM_ERROR_RATE: float = 0.0
+    MOCK_LLM_STREAM_CHUNK_CHARS: int = 12
+    MOCK_LLM_SEED: int | None = None
+
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 6 * 3600
+    LLM_CACHE_MAX_ENTRIES: int = 2048
+    LLM_CACHE_PERSIST: bool = False
     
     class Config:
         env_file = ".env"
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Boolean, Column, Integer, String, Text, DateTime, ForeignKey, Float
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from app.db.session import Base
 
@@ -13,7 +13,12 @@ class User(Base):
     password_hash: Mapped[str] = mapped_column(String(255))
     role: Mapped[str] = mapped_column(String(50), default="admin")
     cv_file_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
+    cv_file_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)  # as uploaded
     cv_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Matching profile of cv_text, see services/matching.cv_profile.
+    cv_terms: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # distinct words, sorted
+    cv_experience_years: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    cv_salary: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -44,7 +49,11 @@ class Application(Base):
     candidate_name: Mapped[str] = mapped_column(String(120))
     candidate_email: Mapped[str] = mapped_column(String(255))
     cv_file_path: Mapped[str] = mapped_column(String(500))
+    cv_file_name: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     cv_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    cv_terms: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    cv_experience_years: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    cv_salary: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     parsed_cv_json: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     relevance_score: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     mismatch_reasons: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
@@ -60,6 +69,10 @@ class ChatSession(Base):
     application_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.id"))
     state: Mapped[str] = mapped_column(String(20), default="open")
     last_relevance_score: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    # Rolling summary of older turns ({"facts": [...], "resolved": [...]}) and
+    # how many messages from the start of the session it already covers.
+    context_summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summarized_messages: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     closed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
@@ -73,3 +86,85 @@ class ChatMessage(Base):
     content: Mapped[str] = mapped_column(Text)
     meta_json: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    payload: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class ScoringJob(Base):
+    __tablename__ = "scoring_jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    application_id: Mapped[int] = mapped_column(Integer, ForeignKey("applications.id"), index=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)  # queued | running | done | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class LLMCallLog(Base):
+    # Optional per-application telemetry (LLM_CALL_LOG_ENABLED). No foreign key
+    # so the history outlives deleted applications.
+    __tablename__ = "llm_call_log"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    application_id: Mapped[int] = mapped_column(Integer, index=True)
+    provider: Mapped[str] = mapped_column(String(30))
+    model: Mapped[str] = mapped_column(String(120))
+    priority: Mapped[int] = mapped_column(Integer)
+    streamed: Mapped[bool] = mapped_column(Boolean, default=False)
+    outcome: Mapped[str] = mapped_column(String(20))
+    attempts: Mapped[int] = mapped_column(Integer, default=1)
+    queue_wait: Mapped[float] = mapped_column(Float, default=0.0)
+    latency: Mapped[float] = mapped_column(Float, default=0.0)
+    ttft: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    prompt_chars: Mapped[int] = mapped_column(Integer, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    response_chars: Mapped[int] = mapped_column(Integer, default=0)
+    response_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    usage_reported: Mapped[Optional[bool]] = mapped_column(Boolean, nullable=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class LLMUsage(Base):
+    # One row per upstream call made on behalf of an application / chat;
+    # `reported` is False when the provider returned no usage metadata and
+    # the token counts are estimates. No foreign keys, like llm_call_log.
+    __tablename__ = "llm_usage"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    application_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    session_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    vacancy_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    employer_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    provider: Mapped[str] = mapped_column(String(30))
+    model: Mapped[str] = mapped_column(String(120))
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    reported: Mapped[bool] = mapped_column(Boolean, default=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class CVText(Base):
+    # Extracted CV text keyed by the SHA-256 of the uploaded PDF bytes, so a
+    # re-uploaded file never goes through pypdf again. `hits` counts uploads
+    # served from this row; `limits` records the extraction settings the text
+    # was produced under (see cv_texts.extraction_limits).
+    __tablename__ = "cv_texts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, index=True)
+    text: Mapped[str] = mapped_column(Text)
+    limits: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,17 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from pathlib import Path
+import asyncio
 
 from app.core.config import settings
 from app.routers import vacancies, applications, admin
 from app.routers import auth
 from app.routers import ws_chat
 from app.routers import employer
-from app.db.session import engine, SessionLocal
+from app.db.session import engine, SessionLocal, add_missing_columns
 from app.db import models
 from app.core.security import get_password_hash
+from app.services.llm import aclose_http_clients
+from app.services import llm_metrics, llm_usage, pdf_pool, scoring, search
 
 
 app = FastAPI(title=settings.APP_NAME)
@@ -20,6 +23,8 @@ import os as _os
 _os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, models.Base.metadata)
+search.ensure_index(engine)
 
 app.add_middleware(
     CORSMiddleware,
@@ -29,6 +34,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Room for the other form fields and multipart boundaries next to the file.
+_FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # A declared body that cannot fit is refused before it is parsed and
+    # spooled; save_upload still counts the bytes of the file itself.
+    length = request.headers.get("content-length") or ""
+    if (
+        length.isdigit()
+        and request.headers.get("content-type", "").startswith("multipart/form-data")
+        and int(length) > settings.MAX_UPLOAD_MB * 1024 * 1024 + _FORM_OVERHEAD_BYTES
+    ):
+        return JSONResponse({"detail": f"File is larger than {settings.MAX_UPLOAD_MB} MB"}, status_code=413)
+    return await call_next(request)
+
+
 app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
 
 # API routes
@@ -57,6 +80,11 @@ if STATIC_DIR.exists():
             return FileResponse(index_file)
         return {"detail": "Frontend not built yet. Run 'npm run build' in frontend directory."}
 
+@app.on_event("startup")
+async def start_scoring_workers():
+    await scoring.start_workers()
+
+
 @app.on_event("startup")
 def on_startup():
     models.Base.metadata.create_all(bind=engine)
@@ -94,3 +122,12 @@ def on_startup():
             db.commit()
     finally:
         db.close()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await scoring.stop_workers()
+    await aclose_http_clients()
+    await asyncio.to_thread(llm_usage.flush)
+    await asyncio.to_thread(llm_metrics.flush)
+    pdf_pool.shutdown()
@@ -1,10 +1,12 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db
 from app.core.security import create_access_token, verify_password, require_roles
 from app.db import models
+from app.services import cv_texts, llm_health, llm_metrics, llm_scheduler, llm_usage, scoring, storage
 from pydantic import BaseModel
 
 
@@ -89,6 +91,75 @@ def get_application_details(application_id: int, db: Session = Depends(get_db)):
         "relevance_score": app.relevance_score,
         "mismatches": (app.mismatch_reasons or "").split(",") if app.mismatch_reasons else [],  # visible only in admin
         "summary_text": app.summary_text,  # visible only in admin
-        "cv_url": f"/uploads/{app.cv_file_path.split('/')[-1]}",
+        "cv_url": storage.public_url(app.cv_file_path, app.cv_file_name),
         "created_at": app.created_at.isoformat(),
     }
+
+
+@router.get("/llm/health", dependencies=[Depends(require_roles("admin"))])
+def llm_health_status():
+    return llm_health.snapshot()
+
+
+@router.post("/llm/health/reset", dependencies=[Depends(require_roles("admin"))])
+def llm_health_reset(name: str | None = None):
+    llm_health.reset(name)
+    return {"reset": name or "all"}
+
+
+@router.get("/llm/metrics", dependencies=[Depends(require_roles("admin"))])
+def llm_metrics_status(format: str = "json"):
+    # format=prometheus returns the text exposition format for scraping.
+    if format == "prometheus":
+        return PlainTextResponse(llm_metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+    return llm_metrics.snapshot()
+
+
+@router.get("/llm/calls/{application_id}", dependencies=[Depends(require_roles("admin"))])
+def llm_calls_for_application(application_id: int, db: Session = Depends(get_db)):
+    rows = (
+        db.query(models.LLMCallLog)
+        .filter(models.LLMCallLog.application_id == application_id)
+        .order_by(models.LLMCallLog.id.asc())
+        .all()
+    )
+    return [
+        {
+            "provider": r.provider,
+            "model": r.model,
+            "priority": r.priority,
+            "streamed": r.streamed,
+            "outcome": r.outcome,
+            "attempts": r.attempts,
+            "queue_wait_ms": round(r.queue_wait * 1000, 1),
+            "latency_ms": round(r.latency * 1000, 1),
+            "ttft_ms": round(r.ttft * 1000, 1) if r.ttft is not None else None,
+            "prompt_tokens": r.prompt_tokens,
+            "response_tokens": r.response_tokens,
+            "error": r.error,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in rows
+    ]
+
+
+@router.get("/llm/usage", dependencies=[Depends(require_roles("admin"))])
+def llm_usage_report(group_by: str = "employer", days: int | None = None, db: Session = Depends(get_db)):
+    if group_by not in ("application", "session", "vacancy", "employer"):
+        raise HTTPException(status_code=400, detail="group_by must be application, session, vacancy or employer")
+    return llm_usage.report(db, group_by, days)
+
+
+@router.get("/llm/scheduler", dependencies=[Depends(require_roles("admin"))])
+def llm_scheduler_status():
+    return llm_scheduler.get_scheduler().metrics()
+
+
+@router.get("/scoring", dependencies=[Depends(require_roles("admin"))])
+def scoring_status(db: Session = Depends(get_db)):
+    return scoring.stats(db)
+
+
+@router.get("/cv/extraction", dependencies=[Depends(require_roles("admin"))])
+def cv_extraction_status(db: Session = Depends(get_db)):
+    return cv_texts.stats(db)
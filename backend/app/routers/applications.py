@@ -7,8 +7,8 @@ from app.core.security import create_access_token
 from app.db import models
 from app.schemas.application import ApplicationRead, ApplicationSummary, ApplicationListItem
 from app.services.files import save_upload
-from app.services.cv import extract_text_from_pdf, compute_relevance
-from app.services.llm import analyze_cv, score_from_llm_result
+from app.services import scoring, search
+from app.services.matching import cv_profile
 from app.core.security import get_current_user
 
 
@@ -39,51 +39,35 @@ async def create_application(
     if existing:
         raise HTTPException(status_code=409, detail="You have already applied to this vacancy")
     
-    cv_text = user.cv_text
-    path = user.cv_file_path
-    
-    vacancy_dict = {
-        "title": v.title,
-        "city": v.city,
-        "description": v.description,
-        "min_experience_years": v.min_experience_years,
-        "employment_type": v.employment_type,
-        "education_level": v.education_level,
-        "languages": v.languages.split(",") if v.languages else [],
-        "salary_min": v.salary_min,
-        "salary_max": v.salary_max,
-        "currency": v.currency,
-        "skills": v.skills.split(",") if v.skills else [],
-    }
-    score: int
-    mismatches: list[str]
-    summary: str
-    llm = analyze_cv(cv_text, vacancy_dict)
-    if llm is not None:
-        score, mismatches, summary = score_from_llm_result(llm, vacancy_dict)
-    else:
-        score, mismatches, summary = compute_relevance(cv_text, vacancy_dict)
-
+    # Scoring runs in the background (see services/scoring.py); the summary
+    # endpoint reports scoring_status until the job has written the score.
     app = models.Application(
         vacancy_id=v.id,
         candidate_name=user.email.split("@")[0],
         candidate_email=user.email,
-        cv_file_path=path,
-        cv_text=cv_text,
-        relevance_score=score,
-        mismatch_reasons=",".join(mismatches) if mismatches else None,
-        summary_text=summary,
+        cv_file_path=user.cv_file_path,
+        cv_file_name=user.cv_file_name,
+        cv_text=user.cv_text,
+        cv_terms=user.cv_terms,
+        cv_experience_years=user.cv_experience_years,
+        cv_salary=user.cv_salary,
     )
+    if user.cv_experience_years is None:
+        # CV uploaded before profiles were stored.
+        for column, value in cv_profile(user.cv_text).items():
+            setattr(app, column, value)
     db.add(app)
     db.commit()
     db.refresh(app)
+    search.index_application(db, app)
+    await scoring.enqueue(db, app.id)
 
     chat_token = create_access_token(
         subject=f"user:{user.id}", 
         extra_claims={"role": user.role, "application_id": app.id}
     )
     ws_url = f"/ws/applications/{app.id}?token={chat_token}"
-    return {"application_id": app.id, "chat_token": chat_token, "ws_url": ws_url}
+    return {"application_id": app.id, "chat_token": chat_token, "ws_url": ws_url, "scoring_status": "scoring"}
 
 
 @router.get("/{application_id}/summary", response_model=ApplicationSummary)
@@ -95,6 +79,7 @@ def get_summary(application_id: int, db: Session = Depends(get_db)):
         relevance_score=app.relevance_score,
         mismatch_reasons=app.mismatch_reasons.split(",") if app.mismatch_reasons else None,
         summary_text=app.summary_text,
+        scoring_status=scoring.scoring_status(db, app.id),
     )
 
 
@@ -139,6 +124,8 @@ def delete_application(application_id: int, db: Session = Depends(get_db), user=
         session_ids = [s.id for s in sessions]
         db.query(models.ChatMessage).filter(models.ChatMessage.session_id.in_(session_ids)).delete(synchronize_session=False)
         db.query(models.ChatSession).filter(models.ChatSession.id.in_(session_ids)).delete(synchronize_session=False)
+    db.query(models.ScoringJob).filter(models.ScoringJob.application_id == app.id).delete(synchronize_session=False)
+    search.remove_applications(db, [app.id])
     db.delete(app)
     db.commit()
     return {"deleted": True}
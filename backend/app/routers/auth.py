@@ -1,13 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Response
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-import os
 
 from app.core.deps import get_db
 from app.core.security import create_access_token, verify_password, get_password_hash, get_current_user
 from app.db import models
-from app.services.files import save_upload
-from app.services.cv import extract_text_from_pdf
+from app.services.files import save_upload_with_digest
+from app.services import cv_texts, pdf_pool, search, storage
+from app.services.matching import cv_profile
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -103,17 +103,25 @@ async def upload_cv(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Save the CV file
-    cv_path = await save_upload(cv)
+    cv_path, cv_digest = await save_upload_with_digest(cv)
     
-    # Extract text from the CV
-    cv_text = extract_text_from_pdf(cv_path)
+    # Extract text from the CV (reused if this exact file was seen before,
+    # otherwise in the PDF worker pool, off the event loop)
+    try:
+        cv_text = await cv_texts.extract_text(db, cv_path, cv_digest)
+    except pdf_pool.PdfExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
     # Update user's CV information
     user.cv_file_path = cv_path
+    user.cv_file_name = cv.filename
     user.cv_text = cv_text
+    for column, value in cv_profile(cv_text).items():
+        setattr(user, column, value)
     
     db.commit()
     db.refresh(user)
+    search.index_user(db, user)
     
     return {
         "id": user.id,
@@ -134,9 +142,7 @@ def get_cv_url(current=Depends(get_current_user), db: Session = Depends(get_db))
     if not user.cv_file_path:
         raise HTTPException(status_code=404, detail="No CV uploaded")
     
-    # Return the relative URL path
-    filename = os.path.basename(user.cv_file_path)
-    return {"url": f"/uploads/{filename}"}
+    return {"url": storage.public_url(user.cv_file_path, user.cv_file_name)}
 
 
 @router.get("/get-ws-token")
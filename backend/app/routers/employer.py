@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.core.deps import get_db
 from app.core.security import require_roles, get_current_user
 from app.db import models
+from app.services import search, storage
 
 router = APIRouter(prefix="/employer", tags=["employer"], dependencies=[Depends(require_roles("employer", "admin"))])
 
@@ -44,7 +45,7 @@ def get_my_application(application_id: int, db: Session = Depends(get_db), user=
         "candidate_name": app.candidate_name,
         "candidate_email": app.candidate_email,
         "relevance_score": app.relevance_score,
-        "cv_url": f"/uploads/{app.cv_file_path.split('/')[-1]}",
+        "cv_url": storage.public_url(app.cv_file_path, app.cv_file_name),
         "created_at": app.created_at.isoformat(),
     }
 
@@ -114,3 +115,23 @@ def list_applications_for_vacancy(vacancy_id: int, db: Session = Depends(get_db)
         }
         for a in apps
     ]
+
+
+@router.get("/search")
+def search_cvs(
+    q: str = Query(..., min_length=1, max_length=200),
+    scope: str = "applications",
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    is_admin = (user.role or "").lower() == "admin"
+    if scope == "candidates":
+        # Candidate profiles are not tied to any employer's vacancies.
+        if not is_admin:
+            raise HTTPException(status_code=403, detail="Forbidden")
+        return search.search_candidates(db, q, page, page_size)
+    if scope != "applications":
+        raise HTTPException(status_code=400, detail="scope must be 'applications' or 'candidates'")
+    return search.search_applications(db, q, None if is_admin else user.id, page, page_size)
@@ -1,11 +1,15 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from app.core.deps import get_db
 from app.db import models
 from app.core.security import require_roles, get_current_user
-from app.schemas.vacancy import VacancyCreate, VacancyRead
+from app.schemas.vacancy import VacancyCreate, VacancyRead, VacancyFitRequest, VacancyFitItem
+from app.services.matching import score_vacancies, stored_features
+from app.services.llm import analyze_cv_batch_async, score_from_llm_result
+from app.services.vacancies import vacancy_to_dict
+from app.services import recommendations, search
 
 
 router = APIRouter(prefix="/vacancies", tags=["vacancies"])
@@ -17,6 +21,54 @@ def list_vacancies(db: Session = Depends(get_db)):
     return [to_read(v) for v in rows]
 
 
+@router.post("/fit", response_model=List[VacancyFitItem])
+async def fit_vacancies(payload: VacancyFitRequest, db: Session = Depends(get_db), user=Depends(get_current_user)):
+    if not user.cv_text:
+        raise HTTPException(status_code=400, detail="Please upload your CV in your profile first")
+    ids = list(dict.fromkeys(payload.vacancy_ids))
+    rows = db.query(models.Vacancy).filter(models.Vacancy.id.in_(ids)).all()
+    by_id = {v.id: v for v in rows}
+    vacancies = [by_id[i] for i in ids if i in by_id]
+    dicts = [vacancy_to_dict(v) for v in vacancies]
+    llm_results = await analyze_cv_batch_async(user.cv_text, dicts)
+    heuristics = iter(score_vacancies(stored_features(user), [d for d, llm in zip(dicts, llm_results) if llm is None]))
+    out: list[VacancyFitItem] = []
+    for v, vac_dict, llm in zip(vacancies, dicts, llm_results):
+        if llm is not None:
+            score, mismatches, summary = score_from_llm_result(llm, vac_dict)
+            source = "llm"
+        else:
+            score, mismatches, summary = next(heuristics)
+            source = "heuristic"
+        out.append(VacancyFitItem(
+            vacancy_id=v.id,
+            title=v.title,
+            score=score,
+            mismatches=[str(m) for m in mismatches],
+            summary=summary,
+            source=source,
+        ))
+    return out
+
+
+# Declared before /{vacancy_id}, which would otherwise capture "recommended".
+@router.get("/recommended", response_model=List[VacancyFitItem])
+def recommended_vacancies(k: int = Query(10, ge=1, le=100), user=Depends(get_current_user)):
+    if not user.cv_text:
+        raise HTTPException(status_code=400, detail="Please upload your CV in your profile first")
+    return [
+        VacancyFitItem(
+            vacancy_id=vacancy_id,
+            title=title,
+            score=score,
+            mismatches=[str(m) for m in mismatches],
+            summary=summary,
+            source="heuristic",
+        )
+        for vacancy_id, title, (score, mismatches, summary) in recommendations.recommend(stored_features(user), k)
+    ]
+
+
 @router.get("/{vacancy_id}", response_model=VacancyRead)
 def get_vacancy(vacancy_id: int, db: Session = Depends(get_db)):
     v = db.get(models.Vacancy, vacancy_id)
@@ -44,6 +96,7 @@ def create_vacancy(payload: VacancyCreate, db: Session = Depends(get_db), user=D
     db.add(v)
     db.commit()
     db.refresh(v)
+    recommendations.add(v)
     return to_read(v)
 
 
@@ -81,8 +134,11 @@ def delete_vacancy(vacancy_id: int, db: Session = Depends(get_db), user=Depends(
             if session_ids:
                 db.query(models.ChatMessage).filter(models.ChatMessage.session_id.in_(session_ids)).delete(synchronize_session=False)
                 db.query(models.ChatSession).filter(models.ChatSession.id.in_(session_ids)).delete(synchronize_session=False)
+        db.query(models.ScoringJob).filter(models.ScoringJob.application_id.in_(app_ids)).delete(synchronize_session=False)
+        search.remove_applications(db, app_ids)
         db.query(models.Application).filter(models.Application.vacancy_id == v.id).delete(synchronize_session=False)
 
     db.delete(v)
     db.commit()
+    recommendations.remove(vacancy_id)
     return {"deleted": True}
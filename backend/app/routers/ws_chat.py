@@ -8,8 +8,10 @@ from sqlalchemy.orm import Session
 from app.core.deps import get_db
 from app.core.security import decode_token
 from app.db import models
-from app.services.llm import analyze_cv, score_from_llm_result
-from app.services.cv import compute_relevance
+from app.services.llm import STAGE_FINAL, analyze_cv_async, analyze_cv_stream, score_from_llm_result
+from app.services import chat_summary, llm_scheduler, llm_usage
+from app.services.matching import VacancyMatcher, stored_features
+from app.services.vacancies import vacancy_to_dict
 
 
 router = APIRouter()
@@ -17,6 +19,44 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _scoring_context(chat_ctx: list[dict]) -> list[dict]:
+    # Trailing bot questions carry no new information about the candidate, so
+    # dropping them lets "end" reuse the cached analysis of the last answer.
+    end = len(chat_ctx)
+    while end and (chat_ctx[end - 1].get("role") or "") == "bot":
+        end -= 1
+    return chat_ctx[:end]
+
+
+async def _stream_question(
+    websocket: WebSocket,
+    qid: int,
+    cv_text: str,
+    vacancy: dict,
+    chat_ctx: Optional[list[dict]] = None,
+    profile: Optional[dict] = None,
+    focus: Optional[list[str]] = None,
+) -> Optional[dict]:
+    result = None
+    async for kind, value in analyze_cv_stream(cv_text, vacancy, chat_ctx, profile, focus):
+        if kind == "delta":
+            await websocket.send_json({"type": "question_delta", "id": qid, "text": value})
+        elif kind == "reset":
+            await websocket.send_json({"type": "question_reset", "id": qid})
+        else:
+            result = value
+    return result
+
+
+def _profile_and_focus(result: dict, profile: Optional[dict], focus: Optional[list[str]]) -> tuple[Optional[dict], Optional[list[str]]]:
+    new_profile = result.get("candidate_profile")
+    new_focus = result.get("mismatches")
+    return (
+        new_profile if isinstance(new_profile, dict) and new_profile else profile,
+        [str(m) for m in new_focus] if isinstance(new_focus, list) else focus,
+    )
+
+
 @router.websocket("/ws/applications/{application_id}")
 async def ws_app_chat(
     websocket: WebSocket,
@@ -82,19 +122,11 @@ async def ws_app_chat(
         db.refresh(session)
 
     vacancy = db.get(models.Vacancy, app.vacancy_id)
-    vacancy_dict = {
-        "title": vacancy.title if vacancy else None,
-        "city": vacancy.city if vacancy else None,
-        "description": vacancy.description if vacancy else None,
-        "min_experience_years": vacancy.min_experience_years if vacancy else None,
-        "employment_type": vacancy.employment_type if vacancy else None,
-        "education_level": vacancy.education_level if vacancy else None,
-        "languages": vacancy.languages.split(",") if vacancy and vacancy.languages else [],
-        "salary_min": vacancy.salary_min if vacancy else None,
-        "salary_max": vacancy.salary_max if vacancy else None,
-        "currency": vacancy.currency if vacancy else None,
-        "skills": vacancy.skills.split(",") if vacancy and vacancy.skills else [],
-    }
+    vacancy_dict = vacancy_to_dict(vacancy)
+    llm_usage.bind_application(app, vacancy, session.id)
+    # Heuristic fallback for every turn: compiled once, matched against the stored term set.
+    matcher = VacancyMatcher(vacancy_dict)
+    cv_features = stored_features(app)
 
     existing_msgs = (
         db.query(models.ChatMessage)
@@ -112,20 +144,48 @@ async def ws_app_chat(
         "session_id": session.id,
     })
 
+    # Messages before `summarized` are folded into `summary_state`; turns send
+    # the summary plus the messages after it (services/chat_summary.py).
+    summary_state, summarized = chat_summary.load(session)
+    fold_task: Optional[asyncio.Task] = None
+
+    async def _apply_fold() -> None:
+        nonlocal fold_task, summary_state, summarized
+        if fold_task is None:
+            return
+        try:
+            summary_state, summarized = await fold_task
+            chat_summary.save(session, summary_state, summarized)
+            db.commit()
+        except Exception as e:
+            logger.warning("Failed to fold chat history for application %s: %s", application_id, e)
+        fold_task = None
+
+    def _start_fold() -> None:
+        nonlocal fold_task
+        # Runs while the candidate is typing; awaited before the next turn.
+        if fold_task is None and chat_summary.fold_point(chat_ctx, summarized) > summarized:
+            fold_task = asyncio.create_task(chat_summary.fold(summary_state, list(chat_ctx), summarized, vacancy_dict))
+
     asked = set()
     asked_texts: set[str] = set()
     max_turns = 8 
     llm_first_question = None
+    # After the first analysis the LLM gets the extracted profile plus the CV
+    # passages relevant to open mismatches instead of the full CV text.
+    profile: Optional[dict] = None
+    focus: Optional[list[str]] = None
     try:
         await websocket.send_json({"type": "analysis_status", "message": "Идёт оценка портфолио…"})
         await websocket.send_json({"type": "bot_typing", "value": True})
         
         logger.info(f"Calling LLM for application {application_id}")
-        llm_once = await asyncio.to_thread(analyze_cv, app.cv_text or "", vacancy_dict)
+        llm_once = await _stream_question(websocket, 1, app.cv_text or "", vacancy_dict)
         logger.info(f"LLM response for application {application_id}: {llm_once}")
         
         if isinstance(llm_once, dict):
             llm_first_question = (llm_once.get("question") or "").strip() or None
+            profile, focus = _profile_and_focus(llm_once, profile, focus)
             logger.info(f"Extracted question: {llm_first_question}")
         else:
             logger.error(f"LLM returned non-dict response: {type(llm_once)}")
@@ -170,7 +230,7 @@ async def ws_app_chat(
             return f"Расскажите, пожалуйста, кратко о самом релевантном опыте для {title}: что делали и какие результаты получили?"
 
         # Update quick baseline relevance
-        score, mismatches, summary = compute_relevance(app.cv_text or "", vacancy_dict)
+        score, mismatches, summary = matcher.score_features(cv_features)
         app.relevance_score = score
         app.mismatch_reasons = ",".join(mismatches) if mismatches else None
         app.summary_text = summary
@@ -194,6 +254,9 @@ async def ws_app_chat(
             await websocket.close()
             return
 
+    turn_inputs: tuple[list[dict], Optional[dict], Optional[list[str]]] = (
+        chat_summary.prompt_context(summary_state, chat_ctx, summarized), None, None
+    )
     try:
         qid = 1
         while True:
@@ -203,13 +266,17 @@ async def ws_app_chat(
                 db.add(models.ChatMessage(session_id=session.id, sender="user", content=user_text))
                 chat_ctx.append({"role": "user", "content": user_text})
                 await websocket.send_json({"type": "bot_typing", "value": True})
-                updated = await asyncio.to_thread(analyze_cv, app.cv_text or "", vacancy_dict, chat_ctx)
+                await _apply_fold()
+                turn_ctx = chat_summary.prompt_context(summary_state, chat_ctx, summarized)
+                turn_inputs = (turn_ctx, profile, focus)
+                updated = await _stream_question(websocket, qid + 1, app.cv_text or "", vacancy_dict, turn_ctx, profile, focus)
                 if updated is not None:
+                    profile, focus = _profile_and_focus(updated, profile, focus)
                     score, new_mismatches, summary = score_from_llm_result(updated, vacancy_dict)
                     next_q = (updated.get("question") or "").strip() or None
                 else:
                     # Keep non-scripted behavior: do not synthesize questions
-                    score, new_mismatches, summary = compute_relevance(app.cv_text or "", vacancy_dict)
+                    score, new_mismatches, summary = matcher.score_features(cv_features)
                     next_q = None
                 
                 await websocket.send_json({"type": "bot_typing", "value": False})
@@ -237,6 +304,7 @@ async def ws_app_chat(
                     db.commit()
                     asked.add(qid)
                     asked_texts.add(next_q.strip().lower())
+                    _start_fold()
                 else:
                     await websocket.send_json({
                         "type": "final_summary",
@@ -247,11 +315,17 @@ async def ws_app_chat(
                     await websocket.close()
                     break
             elif data.get("type") == "end":
-                updated = await asyncio.to_thread(analyze_cv, app.cv_text or "", vacancy_dict, chat_ctx)
+                # Same inputs as the last answer's analysis, so this is a cache hit
+                # unless the final stage is routed to a different model/config.
+                end_ctx, end_profile, end_focus = turn_inputs
+                updated = await analyze_cv_async(
+                    app.cv_text or "", vacancy_dict, _scoring_context(end_ctx), end_profile, end_focus,
+                    llm_scheduler.INTERACTIVE, STAGE_FINAL,
+                )
                 if updated is not None:
                     score, new_mismatches, summary = score_from_llm_result(updated, vacancy_dict)
                 else:
-                    score, new_mismatches, summary = compute_relevance(app.cv_text or "", vacancy_dict)
+                    score, new_mismatches, summary = matcher.score_features(cv_features)
 
                 app.relevance_score = score
                 app.mismatch_reasons = ",".join(new_mismatches) if new_mismatches else None
@@ -272,3 +346,5 @@ async def ws_app_chat(
                 await websocket.send_json({"type": "error", "message": "unknown message"})
     except WebSocketDisconnect:
         pass
+    finally:
+        await _apply_fold()
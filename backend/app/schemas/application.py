@@ -25,6 +25,7 @@ class ApplicationSummary(BaseModel):
     relevance_score: Optional[int] = None
     mismatch_reasons: Optional[List[str]] = None
     summary_text: Optional[str] = None
+    scoring_status: Optional[str] = None  # scoring | scored | failed
 
 
 class ApplicationListItem(BaseModel):
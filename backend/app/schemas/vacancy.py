@@ -25,3 +25,16 @@ class VacancyRead(VacancyBase):
 
     class Config:
         from_attributes = True
+
+
+class VacancyFitRequest(BaseModel):
+    vacancy_ids: List[int] = Field(..., min_length=1, max_length=200)
+
+
+class VacancyFitItem(BaseModel):
+    vacancy_id: int
+    title: str
+    score: int
+    mismatches: List[str] = []
+    summary: str = ""
+    source: str
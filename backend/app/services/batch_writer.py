@@ -0,0 +1,109 @@
+from __future__ import annotations
+from typing import Any, Callable, Optional
+import logging
+import queue
+import threading
+
+from sqlalchemy.orm import Session
+
+
+logger = logging.getLogger(__name__)
+
+# Bookkeeping rows (token usage, call logs) are written by a background thread
+# so that code running on the event loop never blocks on the database. Rows
+# queued while a commit is in flight go out together in the next one, so the
+# batch size grows with the write rate. Rows still queued when the process
+# dies are lost; call flush() on shutdown.
+
+_MAX_BATCH = 500
+
+
+class BatchWriter:
+    def __init__(
+        self,
+        name: str,
+        session_factory: Callable[[], Session],
+        on_written: Optional[Callable[[list[Any], bool], None]] = None,
+    ):
+        self.name = name
+        self._session_factory = session_factory
+        self._on_written = on_written  # called with each batch and whether it was committed
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def add(self, row: Any) -> None:
+        # Never blocks: the row is inserted later, in a batch.
+        self._put(("row", row))
+
+    def run(self, job: Callable[[Session], None]) -> None:
+        # Runs job(db) on the writer thread after the rows queued before it are written.
+        self._put(("job", job))
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        # Blocks until everything queued so far is written; not for the event loop.
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._put(("flush", done))
+        return done.wait(timeout)
+
+    def _put(self, item: tuple[str, Any]) -> None:
+        self._queue.put(item)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            items = [self._queue.get()]
+            while len(items) < _MAX_BATCH:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows: list[Any] = []
+            for kind, value in items:
+                if kind == "row":
+                    rows.append(value)
+                    continue
+                self._write(rows)
+                rows = []
+                if kind == "job":
+                    self._job(value)
+                else:
+                    value.set()
+            self._write(rows)
+
+    def _write(self, rows: list[Any]) -> None:
+        if not rows:
+            return
+        db = self._session_factory()
+        db.expire_on_commit = False  # on_written reads the rows after the session is closed
+        try:
+            db.add_all(rows)
+            db.commit()
+            ok = True
+        except Exception as e:
+            logger.warning("%s: failed to write %d rows: %s", self.name, len(rows), e)
+            db.rollback()
+            ok = False
+        finally:
+            db.close()
+        if self._on_written is not None:
+            try:
+                self._on_written(rows, ok)
+            except Exception:
+                logger.exception("%s: on_written callback failed", self.name)
+
+    def _job(self, job: Callable[[Session], None]) -> None:
+        db = self._session_factory()
+        try:
+            job(db)
+        except Exception:
+            logger.exception("%s: background job failed", self.name)
+            db.rollback()
+        finally:
+            db.close()
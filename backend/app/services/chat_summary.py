@@ -0,0 +1,111 @@
+from __future__ import annotations
+from typing import Any, Optional, Sequence
+import json
+import logging
+
+from app.core.config import settings
+from app.db import models
+from app.services import llm_scheduler
+from app.services.llm import summarize_chat_async
+
+
+logger = logging.getLogger(__name__)
+
+# Chat turns send {"role": "summary"} + the latest CHAT_RECENT_MESSAGES
+# messages instead of the whole transcript. Older messages are folded into a
+# compact state so the per-turn prompt stays the same size however long the
+# chat gets:
+#   {"facts": ["Готов к переезду в Алматы", ...], "resolved": ["город", ...]}
+
+
+def empty() -> dict[str, list[str]]:
+    return {"facts": [], "resolved": []}
+
+
+def load(session: models.ChatSession) -> tuple[dict[str, list[str]], int]:
+    state = empty()
+    if session.context_summary:
+        try:
+            raw = json.loads(session.context_summary)
+            state = _clean(raw.get("facts"), raw.get("resolved"))
+        except Exception:
+            logger.warning("Ignoring unreadable context_summary of chat session %s", session.id)
+    return state, session.summarized_messages or 0
+
+
+def save(session: models.ChatSession, state: dict[str, list[str]], summarized: int) -> None:
+    session.context_summary = json.dumps(state, ensure_ascii=False)
+    session.summarized_messages = summarized
+
+
+def render(state: dict[str, list[str]]) -> str:
+    parts = []
+    if state.get("facts"):
+        parts.append("Выяснено из ответов кандидата:\n" + "\n".join(f"- {f}" for f in state["facts"]))
+    if state.get("resolved"):
+        parts.append("Уже обсуждено (не спрашивать снова):\n" + "\n".join(f"- {r}" for r in state["resolved"]))
+    return "\n".join(parts)
+
+
+def prompt_context(state: dict[str, list[str]], chat_ctx: Sequence[dict], summarized: int) -> list[dict]:
+    text = render(state)
+    head = [{"role": "summary", "content": text}] if text else []
+    return head + list(chat_ctx[summarized:])
+
+
+def fold_point(chat_ctx: Sequence[dict], summarized: int) -> int:
+    # Index up to which messages should be folded, or `summarized` if the
+    # recent window still fits. The boundary is moved back to a bot message
+    # so a question is never separated from its answer.
+    keep = max(2, settings.CHAT_RECENT_MESSAGES)
+    if len(chat_ctx) - summarized <= keep:
+        return summarized
+    point = len(chat_ctx) - keep
+    while point > summarized and (chat_ctx[point].get("role") or "") != "bot":
+        point -= 1
+    return point
+
+
+def _clean(facts: Any, resolved: Any) -> dict[str, list[str]]:
+    def items(value: Any) -> list[str]:
+        out: list[str] = []
+        for item in value if isinstance(value, list) else []:
+            text = str(item).strip()
+            if text and text.lower() not in {o.lower() for o in out}:
+                out.append(text)
+        return out[-settings.CHAT_SUMMARY_MAX_ITEMS :]
+
+    return {"facts": items(facts), "resolved": items(resolved)}
+
+
+def _heuristic_fold(state: dict[str, list[str]], messages: Sequence[dict]) -> dict[str, list[str]]:
+    facts = list(state.get("facts") or [])
+    question = ""
+    for m in messages:
+        role = (m.get("role") or "").lower()
+        content = (m.get("content") or "").strip()
+        if role == "bot":
+            question = content
+        elif role in ("user", "candidate") and content:
+            facts.append(f"{question[:80]} — {content[:160]}" if question else content[:200])
+            question = ""
+    return _clean(facts, state.get("resolved"))
+
+
+async def fold(
+    state: dict[str, list[str]],
+    chat_ctx: Sequence[dict],
+    summarized: int,
+    vacancy: dict,
+) -> tuple[dict[str, list[str]], int]:
+    point = fold_point(chat_ctx, summarized)
+    if point <= summarized:
+        return state, summarized
+    messages = list(chat_ctx[summarized:point])
+    data = await summarize_chat_async(render(state), messages, vacancy, llm_scheduler.APPLICATION)
+    if isinstance(data, dict) and isinstance(data.get("facts"), list):
+        new_state = _clean(data.get("facts"), data.get("resolved"))
+    else:
+        new_state = _heuristic_fold(state, messages)
+    logger.info("Folded %d chat message(s) into the session summary", point - summarized)
+    return new_state, point
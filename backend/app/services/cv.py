@@ -1,114 +1,108 @@
+from contextlib import closing, contextmanager
 from pypdf import PdfReader
-from typing import List, Tuple, Dict, Any
-import io
+from typing import List, Tuple, Dict, Any, Iterator, Optional
+import logging
+import sys
+import tempfile
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
 from app.core.config import settings
+from app.services import storage
+from app.services.matching import VacancyMatcher
 
 
-def extract_text_from_pdf(path: str) -> str:
-    if isinstance(path, str) and path.startswith("s3://"):
-        _, _, rest = path.partition("s3://")
-        bucket, _, key = rest.partition("/")
-        if not bucket or not key:
-            raise ValueError("Invalid S3 URL for PDF: expected s3://<bucket>/<key>")
-        try:
-            import boto3  # type: ignore
-        except Exception as e:
-            raise RuntimeError("boto3 is required to read PDFs from S3") from e
-        s3 = boto3.client(
-            "s3",
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_REGION,
-        )
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        data: bytes = obj["Body"].read()
-        reader = PdfReader(io.BytesIO(data))
-    else:
-        reader = PdfReader(path)
-    texts: list[str] = []
-    for page in reader.pages:
-        texts.append(page.extract_text() or "")
-    return "\n".join(texts)
+logger = logging.getLogger(__name__)
 
 
-def compute_relevance(cv_text: str, vacancy: Dict[str, Any]) -> Tuple[int, List[str], str]:
-    text = cv_text.lower()
-    score = 40
-    mismatches: List[str] = []
-    notes: List[str] = []
+@contextmanager
+def _open_pdf(path: str) -> Iterator[PdfReader]:
+    # pypdf reads objects lazily from the stream it is given, so the document
+    # is never held in memory as a whole: local files are read in place and
+    # S3 bodies are spooled to an anonymous temp file first.
+    if storage.is_remote(path):
+        with tempfile.TemporaryFile() as spool:
+            storage.download_to(path, spool)
+            spool.seek(0)
+            yield PdfReader(spool)
+    else:
+        with open(path, "rb") as f:
+            yield PdfReader(f)
 
-    skills = [s.lower() for s in (vacancy.get("skills", []) or [])]
-    matched_skills = sum(1 for s in skills if s and s in text)
-    if skills:
-        skills_weight = 35
-        score += int(skills_weight * (matched_skills / max(1, len(skills))))
-        notes.append(f"навыки {matched_skills}/{len(skills)}")
 
-    city = (vacancy.get("city") or "").lower()
-    if city:
-        if city in text:
-            score += 6
-            notes.append("город совпадает")
-        else:
-            mismatches.append("город")
+def iter_pdf_pages(path: str, max_pages: Optional[int] = None) -> Iterator[str]:
+    with _open_pdf(path) as reader:
+        for i, page in enumerate(reader.pages):
+            if max_pages is not None and i >= max_pages:
+                logger.warning("PDF %s has more than %d pages; the rest is ignored", path, max_pages)
+                return
+            yield page.extract_text() or ""
 
-    min_exp = int(vacancy.get("min_experience_years") or 0)
-    if min_exp:
-        import re
-        exp_match = re.search(r"(опыт\s*(\d+))|((\d+)\+?\s*год)", text)
-        years = 0
-        if exp_match:
-            years = int(next((g for g in exp_match.groups() if g and g.isdigit()), "0"))
-        if years >= min_exp:
-            score += 6
-            notes.append(f"опыт {years} >= {min_exp}")
-        else:
-            mismatches.append("опыт")
 
-    emp = (vacancy.get("employment_type") or "").lower()
-    if emp:
-        if emp in text:
-            score += 3
-        else:
-            mismatches.append("занятость")
+def _max_rss() -> Optional[int]:
+    # High-water mark of this process's resident set size, in bytes.
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
 
-    edu = (vacancy.get("education_level") or "").lower()
-    if edu:
-        if edu in text or ("бакалавр" in edu and "бакалавр" in text):
-            score += 3
-        else:
-            mismatches.append("образование")
 
-    langs = [l.lower() for l in (vacancy.get("languages") or [])]
-    if langs:
-        lang_hit = sum(1 for l in langs if l and l in text)
-        if lang_hit == 0:
-            mismatches.append("языки")
-        else:
-            score += 3
-            notes.append(f"языки {lang_hit}/{len(langs)}")
+def extract_pdf(path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> tuple[str, dict[str, Any]]:
+    """Text of the first pages of a PDF, at most `max_chars` long, plus extraction stats.
 
+    Pages are pulled one at a time and extraction stops as soon as the cap is
+    reached. The stats always include how far this document raised the
+    process's peak RSS (cheap, and meaningful in the recycled pool workers);
+    with PDF_TRACE_MEMORY they also include the peak Python heap allocated
+    while processing it.
+    """
+    rss_before = _max_rss()
+    trace = settings.PDF_TRACE_MEMORY and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    parts: list[str] = []
+    kept = 0
+    pages = 0
+    truncated = False
     try:
-        smin = float(vacancy.get("salary_min") or 0.0)
-    except Exception:
-        smin = 0.0
-    if smin:
-        import re
-        sal_match = re.search(r"(\d{2,6})\s*(k|тыс|тг|₸)?", text)
-        if sal_match:
-            claimed = float(sal_match.group(1))
-            if claimed <= smin * 1.2:  
-                score += 4
-            else:
-                mismatches.append("зарплата")
+        with closing(iter_pdf_pages(path, max_pages)) as page_texts:
+            for text in page_texts:
+                pages += 1
+                sep = 1 if parts else 0
+                if max_chars is not None and kept + sep + len(text) > max_chars:
+                    room = max_chars - kept - sep
+                    if room > 0:
+                        parts.append(text[:room])
+                    truncated = True
+                    break
+                parts.append(text)
+                kept += sep + len(text)
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+    out = "\n".join(parts)
+    rss_after = _max_rss()
+    stats = {
+        "pages": pages,
+        "chars": len(out),
+        "truncated": truncated,
+        "seconds": round(time.perf_counter() - started, 4),
+        "peak_bytes": peak,
+        "rss_growth_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+    }
+    return out, stats
 
-    title = (vacancy.get("title") or "").lower()
-    if title:
-        key = title.split("(")[0].strip()
-        if any(tok for tok in key.split() if tok in text):
-            score += 5
-            notes.append("позиция релевантна")
 
-    score = max(0, min(100, score))
-    summary = "; ".join(notes) if notes else ""
-    return score, mismatches, summary
+def extract_text_from_pdf(path: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    return extract_pdf(path, max_pages, max_chars)[0]
+
+
+def compute_relevance(cv_text: str, vacancy: Dict[str, Any]) -> Tuple[int, List[str], str]:
+    # Rules live in services/matching.py; use score_vacancies / score_cvs
+    # there to score many pairs at once.
+    return VacancyMatcher(vacancy).score(cv_text)
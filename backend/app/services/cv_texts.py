@@ -0,0 +1,74 @@
+from __future__ import annotations
+from datetime import datetime
+from typing import Any, Optional
+import asyncio
+import hashlib
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.services import pdf_pool, storage
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path: str) -> str:
+    # SHA-256 of a stored upload, streamed from whichever backend holds it.
+    digest = hashlib.sha256()
+    for chunk in storage.iter_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extraction_limits() -> str:
+    # Settings the extracted text depends on. A row extracted under other
+    # limits (or before they were recorded) is extracted again and replaced.
+    return f"pages={settings.PDF_MAX_PAGES};chars={settings.PDF_MAX_CHARS}"
+
+
+async def extract_text(db: Session, path: str, digest: Optional[str] = None) -> str:
+    digest = digest or await asyncio.to_thread(file_digest, path)
+    limits = extraction_limits()
+    row = db.query(models.CVText).filter(models.CVText.sha256 == digest).first()
+    if row is not None and row.limits == limits:
+        row.hits += 1
+        row.last_used_at = datetime.utcnow()
+        db.commit()
+        logger.info("CV text cache hit for %s", digest[:12])
+        return row.text
+    text = await pdf_pool.extract_text(path)
+    size = await storage.asize(path)
+    if row is not None:
+        logger.info("CV text for %s was extracted with %s; replaced", digest[:12], row.limits)
+        row.text, row.limits, row.size_bytes = text, limits, size
+        row.last_used_at = datetime.utcnow()
+        db.commit()
+        return text
+    db.add(models.CVText(sha256=digest, text=text, limits=limits, size_bytes=size))
+    try:
+        db.commit()
+    except IntegrityError:
+        # The same file was extracted concurrently; its row is as good as ours.
+        db.rollback()
+    return text
+
+
+def stats(db: Session) -> dict[str, Any]:
+    documents, hits, size = db.query(
+        func.count(models.CVText.id),
+        func.coalesce(func.sum(models.CVText.hits), 0),
+        func.coalesce(func.sum(models.CVText.size_bytes), 0),
+    ).one()
+    uploads = documents + hits
+    return {
+        "documents": documents,
+        "uploads": uploads,
+        "hits": int(hits),
+        "hit_ratio": round(hits / uploads, 4) if uploads else None,
+        "stored_bytes": int(size),
+    }
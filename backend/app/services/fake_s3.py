@@ -0,0 +1,192 @@
+from __future__ import annotations
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+import hashlib
+import re
+import threading
+import uuid
+
+
+# Local stand-in for the parts of the S3 API that services/storage.py uses:
+# path-style PUT / GET (with Range) / HEAD / DELETE of objects, user metadata
+# and multipart uploads, kept in memory. Point S3_ENDPOINT_URL at it (with
+# S3_ADDRESSING_STYLE=path) to run S3-mode tests and benchmarks offline.
+# Any credentials are accepted; buckets spring into existence on first write.
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class _Object:
+    __slots__ = ("data", "content_type", "metadata", "etag", "modified")
+
+    def __init__(self, data: bytes, content_type: str, metadata: dict[str, str], etag: Optional[str] = None):
+        self.data = data
+        self.content_type = content_type
+        self.metadata = metadata
+        self.etag = etag or f'"{hashlib.md5(data).hexdigest()}"'
+        self.modified = formatdate(usegmt=True)
+
+
+class FakeS3Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int]):
+        super().__init__(address, _Handler)
+        self.lock = threading.Lock()
+        self.objects: dict[tuple[str, str], _Object] = {}
+        self.uploads: dict[str, dict] = {}
+
+    @property
+    def endpoint_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so client connection pooling is exercised
+    server: FakeS3Server
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def _target(self) -> tuple[str, str, dict[str, list[str]]]:
+        url = urlsplit(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        return bucket, key, parse_qs(url.query, keep_blank_values=True)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send(self, status: int, body: bytes = b"", headers: Optional[dict[str, str]] = None, head: bool = False) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and not head:
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str, head: bool = False) -> None:
+        body = f"<?xml version='1.0' encoding='UTF-8'?><Error><Code>{code}</Code><Message>{code}</Message></Error>".encode()
+        self._send(status, body, {"Content-Type": "application/xml"}, head)
+
+    def _xml(self, body: str) -> None:
+        self._send(200, f"<?xml version='1.0' encoding='UTF-8'?>{body}".encode(), {"Content-Type": "application/xml"})
+
+    def do_PUT(self) -> None:
+        bucket, key, query = self._target()
+        data = self._body()
+        if "uploadId" in query:
+            upload = self.server.uploads.get(query["uploadId"][0])
+            if upload is None:
+                return self._error(404, "NoSuchUpload")
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            with self.server.lock:
+                upload["parts"][int(query["partNumber"][0])] = data
+            return self._send(200, headers={"ETag": etag})
+        obj = _Object(data, self.headers.get("Content-Type") or "binary/octet-stream", self._metadata())
+        with self.server.lock:
+            self.server.objects[(bucket, key)] = obj
+        self._send(200, headers={"ETag": obj.etag})
+
+    def do_POST(self) -> None:
+        bucket, key, query = self._target()
+        self._body()
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with self.server.lock:
+                self.server.uploads[upload_id] = {
+                    "key": (bucket, key),
+                    "parts": {},
+                    "content_type": self.headers.get("Content-Type") or "binary/octet-stream",
+                    "metadata": self._metadata(),
+                }
+            return self._xml(
+                f"<InitiateMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>"
+            )
+        if "uploadId" in query:
+            with self.server.lock:
+                upload = self.server.uploads.pop(query["uploadId"][0], None)
+            if upload is None:
+                return self._error(404, "NoSuchUpload")
+            parts = [upload["parts"][n] for n in sorted(upload["parts"])]
+            etag = f'"{hashlib.md5(b"".join(hashlib.md5(p).digest() for p in parts)).hexdigest()}-{len(parts)}"'
+            obj = _Object(b"".join(parts), upload["content_type"], upload["metadata"], etag)
+            with self.server.lock:
+                self.server.objects[upload["key"]] = obj
+            return self._xml(
+                f"<CompleteMultipartUploadResult><Bucket>{bucket}</Bucket><Key>{key}</Key>"
+                f"<ETag>{etag}</ETag></CompleteMultipartUploadResult>"
+            )
+        self._error(400, "InvalidRequest")
+
+    def do_GET(self, head: bool = False) -> None:
+        bucket, key, _ = self._target()
+        obj = self.server.objects.get((bucket, key))
+        if obj is None:
+            return self._error(404, "NoSuchKey", head)
+        headers = {
+            "Content-Type": obj.content_type,
+            "ETag": obj.etag,
+            "Last-Modified": obj.modified,
+            "Accept-Ranges": "bytes",
+            **{f"x-amz-meta-{k}": v for k, v in obj.metadata.items()},
+        }
+        data = obj.data
+        match = _RANGE_RE.match(self.headers.get("Range") or "")
+        if match and not head:
+            first, last = match.groups()
+            if first:
+                start, end = int(first), min(int(last), len(data) - 1) if last else len(data) - 1
+            else:
+                start, end = max(0, len(data) - int(last)), len(data) - 1
+            if start >= len(data):
+                return self._error(416, "InvalidRange")
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return self._send(206, data[start:end + 1], headers)
+        if head:
+            headers["Content-Length"] = str(len(data))
+            self.send_response(200)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self._send(200, data, headers)
+
+    def do_HEAD(self) -> None:
+        self.do_GET(head=True)
+
+    def do_DELETE(self) -> None:
+        bucket, key, query = self._target()
+        with self.server.lock:
+            if "uploadId" in query:
+                self.server.uploads.pop(query["uploadId"][0], None)
+            else:
+                self.server.objects.pop((bucket, key), None)
+        self._send(204)
+
+    def _metadata(self) -> dict[str, str]:
+        prefix = "x-amz-meta-"
+        return {name[len(prefix):].lower(): value for name, value in self.headers.items() if name.lower().startswith(prefix)}
+
+
+def start(host: str = "127.0.0.1", port: int = 0) -> FakeS3Server:
+    """Serve in a background thread; port 0 picks a free port. Stop with .shutdown()."""
+    server = FakeS3Server((host, port))
+    threading.Thread(target=server.serve_forever, name="fake-s3", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run an in-memory S3-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    server = FakeS3Server((args.host, args.port))
+    print(f"fake S3 listening on {server.endpoint_url}")
+    server.serve_forever()
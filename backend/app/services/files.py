@@ -1,26 +1,8 @@
-import os
+import hashlib
 from pathlib import Path
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
 from app.core.config import settings
-from typing import Optional
-
-_s3_client = None
-
-def _get_s3_client():
-    global _s3_client
-    if _s3_client is not None:
-        return _s3_client
-    try:
-        import boto3  # type: ignore
-    except Exception as e:
-        raise RuntimeError("boto3 is required for S3 storage but not installed") from e
-    _s3_client = boto3.client(
-        "s3",
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_REGION,
-    )
-    return _s3_client
+from app.services import storage
 
 
 def ensure_upload_dir() -> None:
@@ -28,35 +10,35 @@ def ensure_upload_dir() -> None:
 
 
 async def save_upload(file: UploadFile, filename: str | None = None) -> str:
+    path, _ = await save_upload_with_digest(file, filename)
+    return path
+
+
+async def save_upload_with_digest(file: UploadFile, filename: str | None = None) -> tuple[str, str]:
+    """Stream the upload to storage and return (location, SHA-256 hex digest of its bytes).
+
+    The file is read in UPLOAD_CHUNK_KB chunks that are hashed and written as
+    they arrive; crossing MAX_UPLOAD_MB aborts the write with a 413.
+    """
     name = filename or file.filename or "file"
-    content = await file.read()
-
-    if (settings.STORAGE_PROVIDER or "local").lower() == "s3":
-        if not settings.AWS_S3_BUCKET:
-            raise RuntimeError("AWS_S3_BUCKET is not configured")
-        key = name
-        s3 = _get_s3_client()
-        base_stem = Path(name).stem
-        suffix = Path(name).suffix
-        attempt = 0
-        final_key = key
-        while True:
-            try:
-                s3.head_object(Bucket=settings.AWS_S3_BUCKET, Key=final_key)
-                attempt += 1
-                final_key = f"{base_stem}_{attempt}{suffix}"
-            except Exception:
-                break
-        s3.put_object(Bucket=settings.AWS_S3_BUCKET, Key=final_key, Body=content, ContentType=file.content_type or "application/octet-stream")
-        return f"s3://{settings.AWS_S3_BUCKET}/{final_key}"
-
-    ensure_upload_dir()
-    dest = Path(settings.UPLOAD_DIR) / name
-    i = 1
-    stem = dest.stem
-    suffix = dest.suffix
-    while dest.exists():
-        dest = Path(settings.UPLOAD_DIR) / f"{stem}_{i}{suffix}"
-        i += 1
-    Path(dest).write_bytes(content)
-    return str(dest)
+    limit = settings.MAX_UPLOAD_MB * 1024 * 1024
+    too_large = HTTPException(status_code=413, detail=f"File is larger than {settings.MAX_UPLOAD_MB} MB")
+    if file.size is not None and file.size > limit:
+        raise too_large
+
+    store = storage.backend()
+    writer = store.writer(storage.new_key(name), file.content_type, name)
+    digest = hashlib.sha256()
+    received = 0
+    try:
+        while chunk := await file.read(settings.UPLOAD_CHUNK_KB * 1024):
+            received += len(chunk)
+            if received > limit:
+                raise too_large
+            digest.update(chunk)
+            await writer.write(chunk)
+        location = await writer.commit()
+    except BaseException:
+        await writer.abort()
+        raise
+    return location, digest.hexdigest()
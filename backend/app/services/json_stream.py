@@ -0,0 +1,111 @@
+from __future__ import annotations
+from typing import Optional
+
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JsonFieldStreamer:
+    """Incrementally pulls one top-level string field out of a streamed JSON object.
+
+    Feed raw model output chunk by chunk; ``feed`` returns the newly decoded
+    part of the field's value (possibly empty). Anything before the first
+    ``{`` (e.g. a markdown fence) is ignored, nested objects and other string
+    values are skipped.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self.done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._expect_key = False
+        self._string_is_key = False
+        self._string_buf: list[str] = []
+        self._current_key: Optional[str] = None
+        self._target = False
+
+    def feed(self, chunk: str) -> str:
+        out: list[str] = []
+        for ch in chunk or "":
+            if self.done:
+                break
+            if self._in_string:
+                self._feed_string_char(ch, out)
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_buf = []
+                self._string_is_key = self._depth == 1 and self._expect_key
+                self._target = (
+                    self._depth == 1 and not self._string_is_key and self._current_key == self.field
+                )
+                if self._string_is_key:
+                    self._expect_key = False
+            elif ch in "{[":
+                self._depth += 1
+                self._expect_key = ch == "{" and self._depth == 1
+            elif ch in "}]":
+                self._depth = max(0, self._depth - 1)
+            elif ch == "," and self._depth == 1:
+                self._expect_key = True
+                self._current_key = None
+        return "".join(out)
+
+    def _feed_string_char(self, ch: str, out: list[str]) -> None:
+        if self._unicode is not None:
+            self._unicode += ch
+            if len(self._unicode) == 4:
+                try:
+                    code = int(self._unicode, 16)
+                except ValueError:
+                    code = 0xFFFD
+                self._unicode = None
+                self._emit_code(code, out)
+            return
+        if self._escape:
+            self._escape = False
+            if ch == "u":
+                self._unicode = ""
+                return
+            self._emit(_SIMPLE_ESCAPES.get(ch, ch), out)
+            return
+        if ch == "\\":
+            self._escape = True
+            return
+        if ch == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._current_key = "".join(self._string_buf)
+            elif self._target:
+                self.done = True
+            self._target = False
+            return
+        self._emit(ch, out)
+
+    def _emit_code(self, code: int, out: list[str]) -> None:
+        if 0xD800 <= code <= 0xDBFF:
+            self._high_surrogate = code
+            return
+        if 0xDC00 <= code <= 0xDFFF and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(code), out)
+
+    def _emit(self, text: str, out: list[str]) -> None:
+        if self._string_is_key:
+            self._string_buf.append(text)
+        elif self._target:
+            out.append(text)
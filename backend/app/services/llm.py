@@ -1,12 +1,17 @@
 from __future__ import annotations
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+import asyncio
 import httpx
 import json
 import re
 import logging
+import time
 
 import google.generativeai as genai
 from app.core.config import settings
+from app.services import llm_cache, llm_health, llm_metrics, llm_scheduler, llm_usage
+from app.services import prompt as prompt_builder
+from app.services.json_stream import JsonFieldStreamer
 
 
 SYSTEM_INSTRUCTION = (
@@ -15,10 +20,22 @@ SYSTEM_INSTRUCTION = (
     "ВСЕ текстовые значения (включая items в mismatches и поля внутри candidate_profile) — на русском языке, краткие и по делу."
 )
 
+# Bump whenever prompt wording or the expected JSON shape changes so cached
+# analyses produced by the old prompt are not served any more.
+PROMPT_VERSION = "2024-10-v2"
+
 logger = logging.getLogger(__name__)
 
-_GEMINI_MODELS_CACHE: dict[str, Any] = {}
+# Pipeline stages that can be routed to their own model / generation config:
+# "score" is the initial application scoring (and batch scoring), "question"
+# every chat turn, "final" the re-score and summary when the chat ends.
+STAGE_SCORE = "score"
+STAGE_QUESTION = "question"
+STAGE_FINAL = "final"
+
+_GEMINI_MODELS_CACHE: dict[tuple[str, Optional[float], Optional[int]], Any] = {}
 _OPENROUTER_CLIENT: Optional[httpx.Client] = None
+_OPENROUTER_ASYNC_CLIENT: Optional[httpx.AsyncClient] = None
 
 if getattr(settings, "GEMINI_API_KEY", None):
     try:
@@ -37,47 +54,102 @@ def _get_http_client() -> httpx.Client:
     return _OPENROUTER_CLIENT
 
 
-def _clip_text(text: str, limit: int = 12000) -> str:
-    if not isinstance(text, str):
-        return ""
-    if len(text) <= limit:
-        return text
-    head = text[: int(limit * 0.8)]
-    tail = text[-int(limit * 0.2) :]
-    return head + "\n…\n" + tail
+def _get_async_http_client() -> httpx.AsyncClient:
+    global _OPENROUTER_ASYNC_CLIENT
+    if _OPENROUTER_ASYNC_CLIENT is None or _OPENROUTER_ASYNC_CLIENT.is_closed:
+        transport = None
+        if _provider() == "mock" and not settings.MOCK_LLM_BASE_URL:
+            # No external mock server configured: serve the mock in-process.
+            from app.services.mock_llm import app as mock_app
+
+            transport = httpx.ASGITransport(app=mock_app)
+        _OPENROUTER_ASYNC_CLIENT = httpx.AsyncClient(
+            timeout=30,
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return _OPENROUTER_ASYNC_CLIENT
+
+
+async def aclose_http_clients() -> None:
+    global _OPENROUTER_ASYNC_CLIENT
+    if _OPENROUTER_ASYNC_CLIENT is not None:
+        await _OPENROUTER_ASYNC_CLIENT.aclose()
+        _OPENROUTER_ASYNC_CLIENT = None
+
+
+def _provider() -> str:
+    return (settings.LLM_PROVIDER or "").lower()
+
+
+def _openrouter_first() -> bool:
+    # The mock provider speaks the OpenRouter wire format.
+    return _provider() in ("openrouter", "mock")
+
+
+def _openrouter_enabled() -> bool:
+    return _provider() == "mock" or bool(settings.OPENROUTER_API_KEY)
+
+
+def _stage_config(stage: str) -> tuple[Optional[str], Optional[float], Optional[int]]:
+    # (model, temperature, max output tokens); None means "use the default".
+    config = {
+        STAGE_SCORE: (settings.LLM_SCORE_MODEL, settings.LLM_SCORE_TEMPERATURE, settings.LLM_SCORE_MAX_TOKENS),
+        STAGE_QUESTION: (settings.LLM_QUESTION_MODEL, settings.LLM_QUESTION_TEMPERATURE, settings.LLM_QUESTION_MAX_TOKENS),
+        STAGE_FINAL: (settings.LLM_FINAL_MODEL, settings.LLM_FINAL_TEMPERATURE, settings.LLM_FINAL_MAX_TOKENS),
+    }.get(stage, (None, None, None))
+    return config[0] or None, config[1], config[2] or None
+
+
+def _openrouter_model(stage: str = STAGE_SCORE) -> str:
+    model = _stage_config(stage)[0] or settings.LLM_MODEL
+    if model:
+        return model
+    return "mock/relevance" if _provider() == "mock" else "deepseek/deepseek-v3"
+
+
+def _openrouter_url() -> str:
+    if _provider() == "mock":
+        return (settings.MOCK_LLM_BASE_URL or "http://mock-llm").rstrip("/") + "/api/v1/chat/completions"
+    return OPENROUTER_URL
 
 
 def _normalize_model_name(name: str) -> str:
     return name.split("/", 1)[-1]
 
 
-def _get_model(model_name: str):
+def _get_model(model_name: str, stage: str = STAGE_SCORE):
     if not settings.GEMINI_API_KEY:
         logger.debug("Skipping Gemini model '%s' because GEMINI_API_KEY is missing", model_name)
         return None
     name = _normalize_model_name(model_name)
-    if name in _GEMINI_MODELS_CACHE:
-        return _GEMINI_MODELS_CACHE[name]
+    _, temperature, max_tokens = _stage_config(stage)
+    temperature = 0.6 if temperature is None else temperature
+    cache_key = (name, temperature, max_tokens)
+    if cache_key in _GEMINI_MODELS_CACHE:
+        return _GEMINI_MODELS_CACHE[cache_key]
+    generation_config: dict[str, Any] = {
+        "response_mime_type": "application/json",
+        "temperature": temperature,
+        "top_p": 0.9,
+    }
+    if max_tokens:
+        generation_config["max_output_tokens"] = max_tokens
     try:
         model = genai.GenerativeModel(
             name,
             system_instruction=SYSTEM_INSTRUCTION,
-            generation_config={
-                "response_mime_type": "application/json",
-                "temperature": 0.6,
-                "top_p": 0.9,
-            },
+            generation_config=generation_config,
         )
     except TypeError:
         model = genai.GenerativeModel(
             name,
-            generation_config={
-                "response_mime_type": "application/json",
-                "temperature": 0.6,
-                "top_p": 0.9,
-            },
+            generation_config=generation_config,
         )
-    _GEMINI_MODELS_CACHE[name] = model
+    _GEMINI_MODELS_CACHE[cache_key] = model
     return model
 
 
@@ -99,7 +171,7 @@ def _format_chat_context(chat_context: Optional[Sequence[dict]] = None) -> str:
     for m in chat_context:
         role = (m.get("role") or m.get("sender") or "").lower()
         content = (m.get("content") or "").strip()
-        if not content:
+        if not content or role == "summary":
             continue
         if role in ("user", "candidate"):
             lines.append(f"Кандидат: {content}")
@@ -112,6 +184,14 @@ def _format_chat_context(chat_context: Optional[Sequence[dict]] = None) -> str:
     return "\n".join(lines[-15:])  
 
 
+def _chat_summary(chat_context: Optional[Sequence[dict]] = None) -> str:
+    # Older turns arrive folded into a single {"role": "summary"} message, see services/chat_summary.py.
+    for m in chat_context or []:
+        if (m.get("role") or "").lower() == "summary":
+            return (m.get("content") or "").strip()
+    return ""
+
+
 def _requirements_text(vacancy: dict) -> str:
     parts: list[str] = []
     title = vacancy.get("title")
@@ -156,6 +236,50 @@ def _requirements_text(vacancy: dict) -> str:
 
 
 def _sanitize_and_parse_json(text: str) -> Optional[dict[str, Any]]:
+    # Every model output passes through here, so this is also where the
+    # response size of the current call is recorded.
+    record = llm_metrics.current_call()
+    if record is not None:
+        record.response_chars = len(text or "")
+        if not record.usage_reported:
+            record.response_tokens = prompt_builder.estimate_tokens(text or "")
+    data = _parse_json_text(text)
+    if data is None:
+        llm_metrics.inc(
+            "llm_json_parse_failures_total",
+            provider=record.provider if record else "unknown",
+            model=record.model if record else "unknown",
+        )
+    return data
+
+
+def _record_usage(prompt_tokens: Any, completion_tokens: Any) -> None:
+    # Replace the estimated token counts of the current call with the ones
+    # reported by the provider (Gemini usage_metadata / OpenRouter usage).
+    record = llm_metrics.current_call()
+    if record is None:
+        return
+    try:
+        prompt_tokens, completion_tokens = int(prompt_tokens or 0), int(completion_tokens or 0)
+    except (TypeError, ValueError):
+        return
+    if not (prompt_tokens or completion_tokens):
+        return
+    record.prompt_tokens = prompt_tokens
+    record.response_tokens = completion_tokens
+    record.usage_reported = True
+
+
+def _budget_exhausted() -> bool:
+    budget = llm_usage.exhausted()
+    if budget is None:
+        return False
+    logger.info("LLM token budget for %s is exhausted; using heuristics", budget)
+    llm_metrics.inc("llm_budget_exhausted_total", budget=budget.split(":", 1)[0])
+    return True
+
+
+def _parse_json_text(text: str) -> Optional[dict[str, Any]]:
     t = (text or "").strip()
     if not t:
         return None
@@ -175,17 +299,13 @@ def _sanitize_and_parse_json(text: str) -> Optional[dict[str, Any]]:
         return None
 
 
-def analyze_cv_with_gemini(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None) -> Optional[dict[str, Any]]:
-    model_names = _resolve_model_candidates()
-
+def _gemini_prompt(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> str:
     chat_block = _format_chat_context(chat_context)
-    req_text = _requirements_text(vacancy)
+    summary = _chat_summary(chat_context)
+    context = prompt_builder.build_context(_requirements_text(vacancy), cv_text, chat_block, profile, focus, summary)
 
-    prompt = (
-        f"ТРЕБОВАНИЯ ВАКАНСИИ (текст):\n{_clip_text(req_text, 4000)}\n\n"
-        f"ВАКАНСИЯ(JSON): {json.dumps(vacancy, ensure_ascii=False)}\n\n"
-        f"РЕЗЮМЕ(ПОЛНЫЙ ТЕКСТ):\n{_clip_text(cv_text, 12000)}\n\n"
-        + (f"КОНТЕКСТ ИЗ ЧАТА (последние сообщения):\n{chat_block}\n\n" if chat_block else "") +
+    return (
+        context +
         "Требования к ответу: верни СТРОГО JSON следующей структуры, без текста вне JSON. \n"
         "Все значения-строки — НА РУССКОМ ЯЗЫКЕ. Тексты — короткие и понятные. Если данных нет, ставь null или пустой список.\n"
         "{\n"
@@ -206,7 +326,7 @@ def analyze_cv_with_gemini(cv_text: str, vacancy: dict, chat_context: Optional[S
             "  * Задавай вопрос только про НОВОЕ несоответствие, которое ещё НЕ обсуждалось.\n"
             "  * Если ответ кандидата был достаточным и устранил несоответствие, НЕ спрашивай про него снова.\n"
             "  * Если все критичные несоответствия уже обсуждены, верни question: null — это сигнал завершить диалог.\n"
-            if chat_block 
+            if chat_block or summary
             else "Сформулируй первый вопрос про САМОЕ критичное несоответствие из mismatches.\n"
         )
         + "Формулируй вопрос как живой HR-менеджер (без шаблонов, перечислений, списков). "
@@ -215,43 +335,190 @@ def analyze_cv_with_gemini(cv_text: str, vacancy: dict, chat_context: Optional[S
         "'Вижу, что в вакансии указан Санкт-Петербург. Вы готовы к переезду или рассматриваете удалённую работу?'\n"
         "- summary — краткая выжимка по соответствию кандидата вакансии.\n"
     )
+
+
+def _blocking_allowed() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return True
+    return False
+
+
+# Blocking variant behind analyze_cv(): the upstream call and the backoff
+# sleeps block the calling thread, so it is only for scripts and worker
+# threads. Code running on the event loop uses _run_with_retries_async.
+def _run_with_retries(label: str, call: Callable[[], Any], parse: Callable[[Any], Optional[dict[str, Any]]], prompt: str = "") -> Optional[dict[str, Any]]:
+    if not _blocking_allowed():
+        raise RuntimeError(f"blocking LLM call to '{label}' on the event loop; use the async variant or asyncio.to_thread")
+    health = llm_health.get(label)
+    record = llm_metrics.start_call(label, llm_scheduler.APPLICATION, len(prompt), prompt_builder.estimate_tokens(prompt))
+    for attempt in range(settings.LLM_RETRY_ATTEMPTS + 1):
+        if not health.allow():
+            logger.info("LLM: skipping '%s' (circuit %s)", label, health.state)
+            llm_metrics.finish_call(record, "circuit_open")
+            return None
+        record.attempts += 1
+        started = time.monotonic()
+        try:
+            resp = call()
+        except Exception as e:
+            fatal = llm_health.is_fatal(e)
+            health.record_failure(time.monotonic() - started, e, fatal=fatal)
+            logger.warning("LLM '%s' failed (attempt %d): %s", label, attempt + 1, e)
+            if fatal or attempt >= settings.LLM_RETRY_ATTEMPTS:
+                record.latency = time.monotonic() - started
+                llm_metrics.finish_call(record, "error", e)
+                return None
+            time.sleep(llm_health.backoff_delay(attempt))
+            continue
+        data = parse(resp)
+        record.latency = time.monotonic() - started
+        if data is None:
+            health.record_failure(record.latency, "empty or invalid JSON")
+            llm_metrics.finish_call(record, "invalid_json")
+        else:
+            health.record_success(record.latency)
+            llm_metrics.finish_call(record, "ok")
+        return data
+    return None
+
+
+async def _run_with_retries_async(
+    label: str,
+    call: Callable[[], Awaitable[Any]],
+    parse: Callable[[Any], Optional[dict[str, Any]]],
+    priority: int = llm_scheduler.APPLICATION,
+    prompt: str = "",
+) -> Optional[dict[str, Any]]:
+    health = llm_health.get(label)
+    scheduler = llm_scheduler.get_scheduler()
+    provider = label.split(":", 1)[0]
+    record = llm_metrics.start_call(label, priority, len(prompt), prompt_builder.estimate_tokens(prompt))
+    for attempt in range(settings.LLM_RETRY_ATTEMPTS + 1):
+        if not health.allow():
+            logger.info("LLM: skipping '%s' (circuit %s)", label, health.state)
+            llm_metrics.finish_call(record, "circuit_open")
+            return None
+        probe = health.state == llm_health.HALF_OPEN
+        record.attempts += 1
+        started = time.monotonic()
+        try:
+            async with scheduler.slot(priority, provider) as waited:
+                # Latency is measured from admission so queueing does not
+                # count against the model's health.
+                record.queue_wait += waited
+                started = time.monotonic()
+                resp = await call()
+        except asyncio.CancelledError:
+            if probe:
+                health.release_probe()
+            record.latency = time.monotonic() - started
+            llm_metrics.finish_call(record, "timeout")
+            raise
+        except Exception as e:
+            fatal = llm_health.is_fatal(e)
+            health.record_failure(time.monotonic() - started, e, fatal=fatal)
+            logger.warning("LLM '%s' failed (attempt %d): %s", label, attempt + 1, e)
+            if fatal or attempt >= settings.LLM_RETRY_ATTEMPTS:
+                record.latency = time.monotonic() - started
+                llm_metrics.finish_call(record, "error", e)
+                return None
+            await asyncio.sleep(llm_health.backoff_delay(attempt))
+            continue
+        data = parse(resp)
+        record.latency = time.monotonic() - started
+        if data is None:
+            health.record_failure(record.latency, "empty or invalid JSON")
+            llm_metrics.finish_call(record, "invalid_json")
+        else:
+            health.record_success(record.latency)
+            llm_metrics.finish_call(record, "ok")
+        return data
+    return None
+
+
+def _gemini_models(stage: str = STAGE_SCORE) -> list[str]:
+    ordered = llm_health.ordered(_resolve_model_candidates(), prefix="gemini:")
+    preferred = _normalize_model_name(_stage_config(stage)[0] or "")
+    # A stage model goes first regardless of measured latency (it is usually
+    # picked for being small/fast or strong); only an open circuit demotes it.
+    if not preferred.startswith("gemini") or llm_health.get(f"gemini:{preferred}").state == llm_health.OPEN:
+        return ordered
+    return [preferred] + [name for name in ordered if name != preferred]
+
+
+def _gemini_result(name: str, resp: Any) -> Optional[dict[str, Any]]:
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is not None:
+        _record_usage(getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+    text = (getattr(resp, "text", None) or "").strip()
+    if not text:
+        logger.warning("Gemini model '%s' returned empty text", name)
+        return None
+    data = _sanitize_and_parse_json(text)
+    if not data:
+        logger.warning("Gemini model '%s' returned non-JSON or invalid JSON", name)
+        return None
+    return data
+
+
+def analyze_cv_with_gemini(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> Optional[dict[str, Any]]:
     if not settings.GEMINI_API_KEY:
         logger.warning("analyze_cv_with_gemini: GEMINI_API_KEY not set; skipping Gemini calls")
         return None
-    for name in model_names:
-        try:
-            model = _get_model(name)
-            if not model:
-                continue
-            logger.info("Gemini: trying model '%s'", name)
-            resp = model.generate_content([prompt])
-            text = (getattr(resp, "text", None) or "").strip()
-            if not text:
-                logger.warning("Gemini model '%s' returned empty text", name)
-                continue
-            data = _sanitize_and_parse_json(text)
-            if not data:
-                logger.warning("Gemini model '%s' returned non-JSON or invalid JSON", name)
-                continue
-            return data
-        except Exception as e:
-            logger.exception("Gemini model '%s' failed: %s", name, e)
+    prompt = _gemini_prompt(cv_text, vacancy, chat_context, profile, focus)
+    for name in _gemini_models():
+        model = _get_model(name)
+        if not model:
             continue
+        logger.info("Gemini: trying model '%s'", name)
+        data = _run_with_retries(
+            f"gemini:{name}",
+            lambda: model.generate_content([prompt]),
+            lambda resp: _gemini_result(name, resp),
+            prompt,
+        )
+        if data is not None:
+            return data
+        llm_metrics.inc("llm_fallbacks_total", kind="next_model")
     logger.error("All Gemini model attempts failed or returned invalid output")
     return None
 
 
-def analyze_cv_with_openrouter(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None) -> Optional[dict[str, Any]]:
-    if not settings.OPENROUTER_API_KEY:
-        logger.debug("OpenRouter API key not set; skipping OpenRouter")
+async def _gemini_json_async(prompt: str, priority: int = llm_scheduler.APPLICATION, stage: str = STAGE_SCORE) -> Optional[dict[str, Any]]:
+    if not settings.GEMINI_API_KEY:
+        logger.warning("Gemini: GEMINI_API_KEY not set; skipping Gemini calls")
         return None
+    for name in _gemini_models(stage):
+        model = _get_model(name, stage)
+        if not model:
+            continue
+        logger.info("Gemini: trying model '%s'", name)
+        data = await _run_with_retries_async(
+            f"gemini:{name}",
+            lambda: model.generate_content_async([prompt]),
+            lambda resp: _gemini_result(name, resp),
+            priority,
+            prompt,
+        )
+        if data is not None:
+            return data
+        llm_metrics.inc("llm_fallbacks_total", kind="next_model")
+    logger.error("All Gemini model attempts failed or returned invalid output")
+    return None
+
+
+async def analyze_cv_with_gemini_async(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> Optional[dict[str, Any]]:
+    return await _gemini_json_async(_gemini_prompt(cv_text, vacancy, chat_context, profile, focus))
+
+
+def _openrouter_prompt(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> str:
     chat_block = _format_chat_context(chat_context)
-    req_text = _requirements_text(vacancy)
-    prompt = (
-        f"ТРЕБОВАНИЯ ВАКАНСИИ (текст):\n{_clip_text(req_text, 4000)}\n\n"
-        f"ВАКАНСИЯ(JSON): {json.dumps(vacancy, ensure_ascii=False)}\n\n"
-        f"РЕЗЮМЕ(ПОЛНЫЙ ТЕКСТ):\n{_clip_text(cv_text, 16000)}\n\n"
-        + (f"КОНТЕКСТ ИЗ ЧАТА (последние сообщения):\n{chat_block}\n\n" if chat_block else "") +
+    summary = _chat_summary(chat_context)
+    context = prompt_builder.build_context(_requirements_text(vacancy), cv_text, chat_block, profile, focus, summary)
+    return (
+        context +
         "Требования к ответу: верни СТРОГО JSON следующей структуры, без текста вне JSON. \n"
         "Все значения-строки — НА РУССКОМ ЯЗЫКЕ. Тексты — короткие и понятные. Если данных нет, ставь null или пустой список.\n"
         "{\n"
@@ -267,54 +534,530 @@ def analyze_cv_with_openrouter(cv_text: str, vacancy: dict, chat_context: Option
         "- question — один естественный вопрос кандидату по САМЫМ критичным несоответствиям из mismatches (без перечислений, 1–2 предложения).\n"
         "- summary — краткая выжимка.\n"
     )
-    model = settings.LLM_MODEL or "deepseek/deepseek-v3"
+
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def _openrouter_request(prompt: str, stage: str = STAGE_SCORE) -> tuple[str, dict[str, str], dict[str, Any]]:
+    model = _openrouter_model(stage)
+    _, temperature, max_tokens = _stage_config(stage)
+    headers = {
+        "Authorization": f"Bearer {settings.OPENROUTER_API_KEY or 'mock'}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_INSTRUCTION},
+            {"role": "user", "content": prompt},
+        ],
+        "response_format": {"type": "json_object"},
+    }
+    if temperature is not None:
+        payload["temperature"] = temperature
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    return model, headers, payload
+
+
+def _openrouter_result(r: httpx.Response, model: str) -> Optional[dict[str, Any]]:
     try:
-        headers = {
-            "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": SYSTEM_INSTRUCTION},
-                {"role": "user", "content": prompt},
-            ],
-            "response_format": {"type": "json_object"},
-        }
-        client = _get_http_client()
-        r = client.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload)
-        try:
-            r.raise_for_status()
-        except Exception as http_err:
-            logger.error("OpenRouter error: %s | status=%s | body=%s", http_err, r.status_code, r.text[:1000])
-            return None
         data = r.json()
-        content = (data.get("choices", [{}])[0].get("message", {}).get("content") or "").strip()
-        if not content:
-            logger.warning("OpenRouter returned empty content for model '%s'", model)
-            return None
-        try:
-            return json.loads(content)
-        except Exception as e:
-            logger.warning("OpenRouter returned non-JSON content: %s", content[:1000])
-            return None
-    except Exception as e:
-        logger.exception("OpenRouter call failed: %s", e)
+    except Exception:
+        logger.warning("OpenRouter returned a non-JSON body: %s", r.text[:1000])
         return None
+    usage = data.get("usage") or {}
+    _record_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+    content = (data.get("choices", [{}])[0].get("message", {}).get("content") or "").strip()
+    if not content:
+        logger.warning("OpenRouter returned empty content for model '%s'", model)
+        return None
+    parsed = _sanitize_and_parse_json(content)
+    if parsed is None:
+        logger.warning("OpenRouter returned non-JSON content: %s", content[:1000])
+    return parsed
+
+
+def _raise_for_openrouter_status(r: httpx.Response) -> httpx.Response:
+    if r.status_code >= 400:
+        logger.error("OpenRouter error | status=%s | body=%s", r.status_code, r.text[:1000])
+    r.raise_for_status()
+    return r
+
+
+def analyze_cv_with_openrouter(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> Optional[dict[str, Any]]:
+    if not _openrouter_enabled():
+        logger.debug("OpenRouter API key not set; skipping OpenRouter")
+        return None
+    prompt = _openrouter_prompt(cv_text, vacancy, chat_context, profile, focus)
+    model, headers, payload = _openrouter_request(prompt)
+    client = _get_http_client()
+    return _run_with_retries(
+        f"openrouter:{model}",
+        lambda: _raise_for_openrouter_status(client.post(_openrouter_url(), headers=headers, json=payload)),
+        lambda r: _openrouter_result(r, model),
+        prompt,
+    )
+
+
+async def _openrouter_json_async(prompt: str, priority: int = llm_scheduler.APPLICATION, stage: str = STAGE_SCORE) -> Optional[dict[str, Any]]:
+    if not _openrouter_enabled():
+        logger.debug("OpenRouter API key not set; skipping OpenRouter")
+        return None
+    model, headers, payload = _openrouter_request(prompt, stage)
+    client = _get_async_http_client()
 
+    async def _post() -> httpx.Response:
+        return _raise_for_openrouter_status(await client.post(_openrouter_url(), headers=headers, json=payload))
 
-def analyze_cv(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None) -> Optional[dict[str, Any]]:
-    provider = (settings.LLM_PROVIDER or "").lower()
+    return await _run_with_retries_async(f"openrouter:{model}", _post, lambda r: _openrouter_result(r, model), priority, prompt)
+
+
+async def analyze_cv_with_openrouter_async(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> Optional[dict[str, Any]]:
+    return await _openrouter_json_async(_openrouter_prompt(cv_text, vacancy, chat_context, profile, focus))
+
+
+def _cache_key(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]], profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None, stage: str = STAGE_SCORE) -> str:
+    provider = _provider()
+    # Keyed by the resolved stage config rather than the stage name, so stages
+    # sharing a model still share cached analyses.
+    return llm_cache.make_key(
+        cv_text, vacancy, chat_context, provider, settings.LLM_MODEL or "", PROMPT_VERSION,
+        extra={"profile": profile, "focus": list(focus or []), "stage": list(_stage_config(stage))},
+    )
+
+
+def _analyze_cv_uncached(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> Optional[dict[str, Any]]:
+    if _budget_exhausted():
+        return None
+    provider = _provider()
     logger.info("LLM provider selected: %s", provider or "<default>")
+    if _openrouter_first():
+        out = analyze_cv_with_openrouter(cv_text, vacancy, chat_context, profile, focus)
+        if out is not None or provider == "mock":
+            return out
+        logger.info("Falling back to Gemini after OpenRouter returned no result")
+        llm_metrics.inc("llm_fallbacks_total", kind="provider")
+    out = analyze_cv_with_gemini(cv_text, vacancy, chat_context, profile, focus)
+    return out
+
+
+def analyze_cv(cv_text: str, vacancy: dict, chat_context: Optional[Sequence[dict]] = None, profile: Optional[dict] = None, focus: Optional[Sequence[str]] = None) -> Optional[dict[str, Any]]:
+    key = _cache_key(cv_text, vacancy, chat_context, profile, focus)
+    cached = llm_cache.get(key)
+    if cached is not None:
+        return cached
+    out = _analyze_cv_uncached(cv_text, vacancy, chat_context, profile, focus)
+    llm_cache.put(key, out)
+    return out
+
+
+def _hedge_delay(primary: str, stage: str = STAGE_SCORE) -> float:
+    if primary == "openrouter":
+        label = f"openrouter:{_openrouter_model(stage)}"
+    else:
+        models = _gemini_models(stage)
+        label = f"gemini:{models[0]}" if models else ""
+    observed = llm_health.get(label).latency_percentile(settings.LLM_HEDGE_PERCENTILE) if label else None
+    if observed is None:
+        return settings.LLM_HEDGE_DEFAULT_DELAY_SECONDS
+    return max(settings.LLM_HEDGE_MIN_DELAY_SECONDS, observed)
+
+
+async def _hedged(
+    primary: Callable[[], Awaitable[Optional[dict[str, Any]]]],
+    secondary: Callable[[], Awaitable[Optional[dict[str, Any]]]],
+    delay: float,
+) -> Optional[dict[str, Any]]:
+    first = asyncio.ensure_future(primary())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        out = first.result()
+        if out is not None:
+            return out
+        logger.info("LLM hedge: primary returned no result, trying secondary")
+        llm_metrics.inc("llm_fallbacks_total", kind="provider")
+        return await secondary()
+    logger.info("LLM hedge: primary slower than %.2fs, firing secondary", delay)
+    llm_metrics.inc("llm_fallbacks_total", kind="hedge")
+    pending = {first, asyncio.ensure_future(secondary())}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and task.result() is not None:
+                    return task.result()
+        return None
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _complete_json_async(
+    gemini_prompt: str,
+    openrouter_prompt: str,
+    priority: int = llm_scheduler.APPLICATION,
+    stage: str = STAGE_SCORE,
+) -> Optional[dict[str, Any]]:
+    provider = _provider()
+    logger.info("LLM provider selected: %s (stage %s)", provider or "<default>", stage)
+
+    def openrouter() -> Awaitable[Optional[dict[str, Any]]]:
+        return _openrouter_json_async(openrouter_prompt, priority, stage)
+
+    def gemini() -> Awaitable[Optional[dict[str, Any]]]:
+        return _gemini_json_async(gemini_prompt, priority, stage)
+
+    if provider == "mock":
+        return await openrouter()
+    if settings.LLM_HEDGE_ENABLED:
+        primary, secondary = (openrouter, gemini) if provider == "openrouter" else (gemini, openrouter)
+        return await _hedged(primary, secondary, _hedge_delay("openrouter" if provider == "openrouter" else "gemini", stage))
     if provider == "openrouter":
-        out = analyze_cv_with_openrouter(cv_text, vacancy, chat_context)
+        out = await openrouter()
         if out is not None:
             return out
         logger.info("Falling back to Gemini after OpenRouter returned no result")
-    out = analyze_cv_with_gemini(cv_text, vacancy, chat_context)
+        llm_metrics.inc("llm_fallbacks_total", kind="provider")
+    return await gemini()
+
+
+async def _complete_json_with_deadline(
+    gemini_prompt: str,
+    openrouter_prompt: str,
+    priority: int = llm_scheduler.APPLICATION,
+    stage: str = STAGE_SCORE,
+) -> Optional[dict[str, Any]]:
+    out: Optional[dict[str, Any]] = None
+    if _budget_exhausted():
+        pass
+    elif not settings.LLM_DEADLINE_SECONDS:
+        out = await _complete_json_async(gemini_prompt, openrouter_prompt, priority, stage)
+    else:
+        try:
+            out = await asyncio.wait_for(_complete_json_async(gemini_prompt, openrouter_prompt, priority, stage), settings.LLM_DEADLINE_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("LLM call exceeded the %.1fs deadline; callers fall back to heuristics", settings.LLM_DEADLINE_SECONDS)
+            llm_metrics.inc("llm_fallbacks_total", kind="deadline")
+    if out is None:
+        llm_metrics.inc("llm_fallbacks_total", kind="heuristic")
     return out
 
 
+async def analyze_cv_async(
+    cv_text: str,
+    vacancy: dict,
+    chat_context: Optional[Sequence[dict]] = None,
+    profile: Optional[dict] = None,
+    focus: Optional[Sequence[str]] = None,
+    priority: int = llm_scheduler.APPLICATION,
+    stage: str = STAGE_SCORE,
+) -> Optional[dict[str, Any]]:
+    key = _cache_key(cv_text, vacancy, chat_context, profile, focus, stage)
+    return await llm_cache.get_or_compute(
+        key,
+        lambda: _complete_json_with_deadline(
+            _gemini_prompt(cv_text, vacancy, chat_context, profile, focus),
+            _openrouter_prompt(cv_text, vacancy, chat_context, profile, focus),
+            priority,
+            stage,
+        ),
+    )
+
+
+def _summary_prompt(previous: str, messages: Sequence[dict], vacancy: dict) -> str:
+    return (
+        f"ТРЕБОВАНИЯ ВАКАНСИИ:\n{prompt_builder.clip_to_tokens(_requirements_text(vacancy), settings.LLM_BATCH_REQUIREMENTS_TOKENS)}\n\n"
+        f"ТЕКУЩАЯ СВОДКА:\n{previous or '(пусто)'}\n\n"
+        f"НОВЫЕ СООБЩЕНИЯ ДЛЯ СВОДКИ:\n{_format_chat_context(messages)}\n\n"
+        "Обнови сводку диалога с кандидатом: добавь факты из новых сообщений к текущей сводке.\n"
+        "Верни СТРОГО JSON без текста вне JSON. Все строки — на русском языке, коротко.\n"
+        "{\n"
+        "  \"facts\": [str],\n"
+        "  \"resolved\": [str]\n"
+        "}\n"
+        "Пояснения:\n"
+        f"- facts — не более {settings.CHAT_SUMMARY_MAX_ITEMS} кратких фактов о кандидате, которые выяснились в диалоге (объедини повторы).\n"
+        "- resolved — несоответствия требованиям вакансии, которые уже обсуждены и не требуют повторного вопроса.\n"
+    )
+
+
+async def summarize_chat_async(
+    previous: str,
+    messages: Sequence[dict],
+    vacancy: dict,
+    priority: int = llm_scheduler.APPLICATION,
+    stage: str = STAGE_QUESTION,
+) -> Optional[dict[str, Any]]:
+    prompt = _summary_prompt(previous, messages, vacancy)
+    return await _complete_json_with_deadline(prompt, prompt, priority, stage)
+
+
+def _batch_prompt(cv_text: str, vacancies: Sequence[tuple[int, dict]]) -> str:
+    blocks = [
+        f"ВАКАНСИЯ #{idx}:\n{prompt_builder.clip_to_tokens(_requirements_text(v), settings.LLM_BATCH_REQUIREMENTS_TOKENS)}"
+        for idx, v in vacancies
+    ]
+    return (
+        f"РЕЗЮМЕ(ПОЛНЫЙ ТЕКСТ):\n{prompt_builder.clip_to_tokens(cv_text, settings.LLM_PROMPT_BUDGET_CV)}\n\n"
+        + "\n\n".join(blocks) + "\n\n"
+        "Оцени соответствие ОДНОГО и того же резюме КАЖДОЙ вакансии выше независимо друг от друга.\n"
+        "Верни СТРОГО JSON без текста вне JSON. Все строки — на русском языке, коротко.\n"
+        "{\n"
+        "  \"results\": [{\"index\": number, \"score\": number, \"mismatches\": [str], \"summary\": str}]\n"
+        "}\n"
+        "Пояснения:\n"
+        "- index — номер вакансии из заголовка 'ВАКАНСИЯ #N'; по одному элементу на каждую вакансию.\n"
+        "- score — целое число 0..100, основанное на соответствии требованиям этой вакансии.\n"
+        "- mismatches — КОРОТКИЕ формулировки ключевых несоответствий ТОЛЬКО относительно требований этой вакансии.\n"
+        "- summary — одно предложение о соответствии.\n"
+    )
+
+
+def _split_batches(vacancies: Sequence[dict]) -> list[list[tuple[int, dict]]]:
+    batches: list[list[tuple[int, dict]]] = []
+    current: list[tuple[int, dict]] = []
+    used = 0
+    for idx, vacancy in enumerate(vacancies):
+        cost = min(prompt_builder.estimate_tokens(_requirements_text(vacancy)), settings.LLM_BATCH_REQUIREMENTS_TOKENS)
+        if current and (len(current) >= settings.LLM_BATCH_MAX_SIZE or used + cost > settings.LLM_BATCH_BUDGET_TOKENS):
+            batches.append(current)
+            current, used = [], 0
+        current.append((idx, vacancy))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _score_batch(cv_text: str, batch: list[tuple[int, dict]], priority: int) -> dict[int, dict[str, Any]]:
+    provider = _provider()
+    key = llm_cache.make_key(
+        cv_text, {"batch": [v for _, v in batch]}, None, provider, settings.LLM_MODEL or "", PROMPT_VERSION,
+        extra={"kind": "batch", "stage": list(_stage_config(STAGE_SCORE))},
+    )
+    # Indices inside the prompt are local to the batch so cached entries stay
+    # valid when the same vacancies show up at other positions of a request.
+    local = [(i, v) for i, (_, v) in enumerate(batch)]
+    prompt = _batch_prompt(cv_text, local)
+    data = await llm_cache.get_or_compute(key, lambda: _complete_json_with_deadline(prompt, prompt, priority, STAGE_SCORE))
+    out: dict[int, dict[str, Any]] = {}
+    items = (data or {}).get("results")
+    if not isinstance(items, list):
+        return out
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            local_idx = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        if 0 <= local_idx < len(batch):
+            out[batch[local_idx][0]] = item
+    return out
+
+
+async def analyze_cv_batch_async(cv_text: str, vacancies: Sequence[dict], priority: int = llm_scheduler.BATCH) -> list[Optional[dict[str, Any]]]:
+    results: list[Optional[dict[str, Any]]] = [None] * len(vacancies)
+    if not vacancies:
+        return results
+    batches = _split_batches(vacancies)
+    logger.info("LLM batch scoring: %d vacancies in %d request(s)", len(vacancies), len(batches))
+    for scored in await asyncio.gather(*[_score_batch(cv_text, b, priority) for b in batches]):
+        for idx, item in scored.items():
+            results[idx] = item
+    return results
+
+
+async def _stream_gemini_text(name: str, prompt: str, stage: str = STAGE_QUESTION) -> AsyncIterator[str]:
+    model = _get_model(name, stage)
+    if not model:
+        return
+    logger.info("Gemini: streaming from model '%s'", name)
+    resp = await model.generate_content_async([prompt], stream=True)
+    async for chunk in resp:
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage is not None:
+            _record_usage(getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
+        try:
+            text = chunk.text
+        except Exception:
+            text = ""
+        if text:
+            yield text
+
+
+async def _stream_openrouter_text(prompt: str, stage: str = STAGE_QUESTION) -> AsyncIterator[str]:
+    model, headers, payload = _openrouter_request(prompt, stage)
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    client = _get_async_http_client()
+    async with client.stream("POST", _openrouter_url(), headers=headers, json=payload) as r:
+        if r.status_code >= 400:
+            body = (await r.aread()).decode("utf-8", "replace")
+            raise RuntimeError(f"OpenRouter stream error: status={r.status_code} body={body[:1000]}")
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                event = json.loads(data)
+            except Exception:
+                continue
+            usage = event.get("usage")
+            if usage:
+                _record_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+            delta = (event.get("choices") or [{}])[0].get("delta") or {}
+            text = delta.get("content")
+            if text:
+                yield text
+
+
+async def _iter_until(chunks: AsyncIterator[str], deadline: Optional[float]) -> AsyncIterator[str]:
+    if deadline is None:
+        async for chunk in chunks:
+            yield chunk
+        return
+    iterator = chunks.__aiter__()
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("LLM stream deadline exceeded")
+            try:
+                chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _stream_sources(
+    cv_text: str,
+    vacancy: dict,
+    chat_context: Optional[Sequence[dict]],
+    profile: Optional[dict] = None,
+    focus: Optional[Sequence[str]] = None,
+    stage: str = STAGE_QUESTION,
+) -> list[tuple[str, str, Callable[[], AsyncIterator[str]]]]:
+    sources: list[tuple[str, str, Callable[[], AsyncIterator[str]]]] = []
+    if _openrouter_first() and _openrouter_enabled():
+        openrouter_prompt = _openrouter_prompt(cv_text, vacancy, chat_context, profile, focus)
+        sources.append((f"openrouter:{_openrouter_model(stage)}", openrouter_prompt, lambda: _stream_openrouter_text(openrouter_prompt, stage)))
+    if settings.GEMINI_API_KEY and _provider() != "mock":
+        gemini_prompt = _gemini_prompt(cv_text, vacancy, chat_context, profile, focus)
+        for name in _gemini_models(stage):
+            sources.append((f"gemini:{name}", gemini_prompt, lambda name=name: _stream_gemini_text(name, gemini_prompt, stage)))
+    return sources
+
+
+# Yields ("delta", text) while `field` is being generated and finally
+# ("result", dict | None). ("reset", None) means the partially streamed text
+# must be discarded because the source failed and the next one is tried.
+async def analyze_cv_stream(
+    cv_text: str,
+    vacancy: dict,
+    chat_context: Optional[Sequence[dict]] = None,
+    profile: Optional[dict] = None,
+    focus: Optional[Sequence[str]] = None,
+    field: str = "question",
+    priority: int = llm_scheduler.INTERACTIVE,
+    stage: str = STAGE_QUESTION,
+) -> AsyncIterator[tuple[str, Any]]:
+    key = _cache_key(cv_text, vacancy, chat_context, profile, focus, stage)
+    cached = await llm_cache.aget(key)
+    joined = False
+    if cached is None and not settings.LLM_STREAMING:
+        cached = await analyze_cv_async(cv_text, vacancy, chat_context, profile, focus, priority, stage)
+    elif cached is None:
+        # Identical analysis already running (streamed or not): wait for it
+        # and replay its result instead of calling upstream again.
+        joined, cached = await llm_cache.join(key)
+    if cached is not None or joined or not settings.LLM_STREAMING:
+        value = (cached or {}).get(field)
+        if isinstance(value, str) and value:
+            yield "delta", value
+        yield "result", cached
+        return
+
+    result: Optional[dict[str, Any]] = None
+    flight = llm_cache.begin(key)
+    try:
+        deadline = time.monotonic() + settings.LLM_DEADLINE_SECONDS if settings.LLM_DEADLINE_SECONDS else None
+        attempted = 0
+        sources = [] if _budget_exhausted() else _stream_sources(cv_text, vacancy, chat_context, profile, focus, stage)
+        for label, prompt, source in sources:
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.warning("LLM stream exceeded the %.1fs deadline; callers fall back to heuristics", settings.LLM_DEADLINE_SECONDS)
+                llm_metrics.inc("llm_fallbacks_total", kind="deadline")
+                break
+            health = llm_health.get(label)
+            record = llm_metrics.start_call(label, priority, len(prompt), prompt_builder.estimate_tokens(prompt), streamed=True)
+            if not health.allow():
+                logger.info("LLM: skipping stream from '%s' (circuit %s)", label, health.state)
+                llm_metrics.finish_call(record, "circuit_open")
+                continue
+            probe = health.state == llm_health.HALF_OPEN
+            if attempted:
+                llm_metrics.inc("llm_fallbacks_total", kind="stream_source")
+            attempted += 1
+            record.attempts = 1
+            streamer = JsonFieldStreamer(field)
+            parts: list[str] = []
+            emitted = False
+            started = time.monotonic()
+            try:
+                async with llm_scheduler.get_scheduler().slot(priority, label.split(":", 1)[0]) as waited:
+                    record.queue_wait = waited
+                    started = time.monotonic()
+                    async for chunk in _iter_until(source(), deadline):
+                        if not parts:
+                            record.ttft = time.monotonic() - started
+                        parts.append(chunk)
+                        delta = streamer.feed(chunk)
+                        if delta:
+                            emitted = True
+                            yield "delta", delta
+            except (asyncio.CancelledError, GeneratorExit):
+                # The caller went away or was cancelled mid-stream.
+                if probe:
+                    health.release_probe()
+                record.latency = time.monotonic() - started
+                llm_metrics.finish_call(record, "timeout")
+                raise
+            except Exception as e:
+                record.latency = time.monotonic() - started
+                health.record_failure(record.latency, e, fatal=llm_health.is_fatal(e))
+                llm_metrics.finish_call(record, "timeout" if isinstance(e, asyncio.TimeoutError) else "error", e)
+                logger.warning("LLM stream from %s failed: %s", label, e)
+            else:
+                result = _sanitize_and_parse_json("".join(parts)) or None
+                record.latency = time.monotonic() - started
+                if result:
+                    health.record_success(record.latency)
+                    llm_metrics.finish_call(record, "ok")
+                    break
+                health.record_failure(record.latency, "empty or invalid JSON")
+                llm_metrics.finish_call(record, "invalid_json")
+                logger.warning("LLM stream from %s returned no valid JSON", label)
+            if emitted:
+                yield "reset", None
+        else:
+            logger.error("All streaming LLM sources failed or returned invalid output")
+        if result is None:
+            llm_metrics.inc("llm_fallbacks_total", kind="heuristic")
+        await llm_cache.aput(key, result)
+    finally:
+        llm_cache.finish(key, flight, result)
+    yield "result", result
+
+
 def score_from_llm_result(llm: dict[str, Any], vacancy: dict) -> tuple[int, list[str], str]:
     mismatches = llm.get("mismatches") or []
     summary = llm.get("summary") or ""
@@ -0,0 +1,253 @@
+from __future__ import annotations
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, Sequence
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _normalize_text(text: Optional[str]) -> str:
+    return _WS_RE.sub(" ", text or "").strip()
+
+
+def make_key(
+    cv_text: str,
+    vacancy: dict,
+    chat_context: Optional[Sequence[dict]],
+    provider: str,
+    model: str,
+    prompt_version: str,
+    extra: Optional[dict] = None,
+) -> str:
+    ctx = [
+        [(m.get("role") or m.get("sender") or "").lower(), _normalize_text(m.get("content"))]
+        for m in (chat_context or [])
+    ]
+    material = {
+        "cv": _normalize_text(cv_text),
+        "vacancy": vacancy,
+        "ctx": ctx,
+        "provider": provider,
+        "model": model,
+        "prompt": prompt_version,
+        "extra": extra or {},
+    }
+    raw = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MEMORY = LRUCache(settings.LLM_CACHE_MAX_ENTRIES, settings.LLM_CACHE_TTL_SECONDS)
+_INFLIGHT: dict[str, asyncio.Future] = {}
+_STATS = {"hits": 0, "persistent_hits": 0, "misses": 0, "coalesced": 0}
+
+
+def _load_persistent(key: str) -> Optional[dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        row = db.get(models.LLMCacheEntry, key)
+        if not row:
+            return None
+        if row.created_at < datetime.utcnow() - timedelta(seconds=settings.LLM_CACHE_TTL_SECONDS):
+            db.delete(row)
+            db.commit()
+            return None
+        return json.loads(row.payload)
+    except Exception as e:
+        logger.warning("LLM cache: failed to read persistent entry: %s", e)
+        return None
+    finally:
+        db.close()
+
+
+def _store_persistent(key: str, value: dict[str, Any]) -> None:
+    db = SessionLocal()
+    try:
+        row = db.get(models.LLMCacheEntry, key)
+        payload = json.dumps(value, ensure_ascii=False)
+        if row:
+            row.payload = payload
+            row.created_at = datetime.utcnow()
+        else:
+            db.add(models.LLMCacheEntry(key=key, payload=payload))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning("LLM cache: failed to write persistent entry: %s", e)
+    finally:
+        db.close()
+
+
+def get(key: str) -> Optional[dict[str, Any]]:
+    # Blocks on the persistent store; async code uses aget().
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    value = _MEMORY.get(key)
+    if value is not None:
+        _STATS["hits"] += 1
+        return copy.deepcopy(value)
+    if settings.LLM_CACHE_PERSIST:
+        value = _load_persistent(key)
+        if value is not None:
+            _STATS["persistent_hits"] += 1
+            _MEMORY.set(key, value)
+            return copy.deepcopy(value)
+    return None
+
+
+def put(key: str, value: Optional[dict[str, Any]]) -> None:
+    # Failed analyses (None) are never cached so the next call retries upstream.
+    if not settings.LLM_CACHE_ENABLED or value is None:
+        return
+    _MEMORY.set(key, copy.deepcopy(value))
+    if settings.LLM_CACHE_PERSIST:
+        _store_persistent(key, value)
+
+
+async def aget(key: str) -> Optional[dict[str, Any]]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    value = _MEMORY.get(key)
+    if value is not None:
+        _STATS["hits"] += 1
+        return copy.deepcopy(value)
+    if settings.LLM_CACHE_PERSIST:
+        value = await asyncio.to_thread(_load_persistent, key)
+        if value is not None:
+            _STATS["persistent_hits"] += 1
+            _MEMORY.set(key, value)
+            return copy.deepcopy(value)
+    return None
+
+
+async def aput(key: str, value: Optional[dict[str, Any]]) -> None:
+    if not settings.LLM_CACHE_ENABLED or value is None:
+        return
+    _MEMORY.set(key, copy.deepcopy(value))
+    if settings.LLM_CACHE_PERSIST:
+        await asyncio.to_thread(_store_persistent, key, value)
+
+
+# Callers that cannot go through get_or_compute (streaming analyses, whose
+# leader yields the text as it arrives) coalesce by hand: join() waits for a
+# computation of the key that is already in flight, otherwise begin() registers
+# the caller as the leader, and finish() hands its result to the followers.
+# A leader that is abandoned mid-stream hands them None, as a failed call would.
+
+async def join(key: str) -> tuple[bool, Optional[dict[str, Any]]]:
+    # (True, result) if another caller was computing the key, else (False, None).
+    future = _INFLIGHT.get(key) if settings.LLM_CACHE_ENABLED else None
+    if future is None:
+        return False, None
+    _STATS["coalesced"] += 1
+    result = await asyncio.shield(future)
+    return True, copy.deepcopy(result)
+
+
+def begin(key: str) -> Optional[asyncio.Future]:
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    _STATS["misses"] += 1
+    future = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = future
+    return future
+
+
+def finish(key: str, future: Optional[asyncio.Future], value: Optional[dict[str, Any]]) -> None:
+    if future is None:
+        return
+    if not future.done():
+        future.set_result(copy.deepcopy(value))
+    if _INFLIGHT.get(key) is future:
+        del _INFLIGHT[key]
+
+
+async def get_or_compute(key: str, compute: Callable[[], Awaitable[Optional[dict[str, Any]]]]) -> Optional[dict[str, Any]]:
+    if not settings.LLM_CACHE_ENABLED:
+        return await compute()
+    hit = _MEMORY.get(key)
+    if hit is not None:
+        _STATS["hits"] += 1
+        return copy.deepcopy(hit)
+    joined, result = await join(key)
+    if joined:
+        return result
+
+    async def _leader() -> Optional[dict[str, Any]]:
+        if settings.LLM_CACHE_PERSIST:
+            stored = await asyncio.to_thread(_load_persistent, key)
+            if stored is not None:
+                _STATS["persistent_hits"] += 1
+                _MEMORY.set(key, stored)
+                return stored
+        _STATS["misses"] += 1
+        value = await compute()
+        if value is not None:
+            _MEMORY.set(key, copy.deepcopy(value))
+            if settings.LLM_CACHE_PERSIST:
+                await asyncio.to_thread(_store_persistent, key, value)
+        return value
+
+    # The upstream call runs as its own task so a disconnecting caller does not
+    # cancel it for the other coalesced waiters.
+    task = asyncio.ensure_future(_leader())
+    _INFLIGHT[key] = task
+    task.add_done_callback(lambda t: _INFLIGHT.pop(key, None) if _INFLIGHT.get(key) is t else None)
+    result = await asyncio.shield(task)
+    return copy.deepcopy(result)
+
+
+def stats() -> dict[str, Any]:
+    return {**_STATS, "entries": len(_MEMORY), "inflight": len(_INFLIGHT)}
+
+
+def clear() -> None:
+    _MEMORY.clear()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+from collections import deque
+from typing import Any, Iterable, Optional
+import logging
+import random
+import threading
+import time
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors that mean "this model will not work until someone changes config"
+# (deprecated / unknown model, bad key). Retrying them only burns latency.
+_FATAL_ERROR_NAMES = {"NotFound", "PermissionDenied", "InvalidArgument", "Unauthenticated", "FailedPrecondition"}
+_FATAL_HTTP_STATUSES = {400, 401, 403, 404}
+
+
+class ModelHealth:
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._window: deque[tuple[float, bool, float]] = deque(maxlen=settings.LLM_HEALTH_WINDOW)
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._cooldown = settings.LLM_BREAKER_COOLDOWN_SECONDS
+        self._probe_inflight = False
+        self._ewma_latency: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() < self._open_until:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_inflight = False
+            if self._probe_inflight:
+                return False
+            self._probe_inflight = True
+            return True
+
+    def release_probe(self) -> None:
+        # The half-open probe was cancelled (hedge loser, deadline, client
+        # gone): that says nothing about the model, so just let the next
+        # caller probe it.
+        with self._lock:
+            self._probe_inflight = False
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self._window.append((time.monotonic(), True, latency))
+            alpha = 0.3
+            self._ewma_latency = latency if self._ewma_latency is None else alpha * latency + (1 - alpha) * self._ewma_latency
+            self._consecutive_failures = 0
+            self._probe_inflight = False
+            if self.state != CLOSED:
+                logger.info("LLM breaker for '%s' closed after successful probe", self.name)
+            self.state = CLOSED
+            self._cooldown = settings.LLM_BREAKER_COOLDOWN_SECONDS
+
+    def record_failure(self, latency: float, error: Any = None, fatal: bool = False) -> None:
+        with self._lock:
+            self._window.append((time.monotonic(), False, latency))
+            self._consecutive_failures += 1
+            self._probe_inflight = False
+            self._last_error = str(error)[:300] if error is not None else None
+            if self.state == HALF_OPEN:
+                # A failed probe doubles the cooldown so a dead model is probed less and less often.
+                self._cooldown = min(self._cooldown * 2, settings.LLM_BREAKER_MAX_COOLDOWN_SECONDS)
+                self._open()
+            elif fatal or self._should_trip():
+                self._open()
+
+    def _should_trip(self) -> bool:
+        if self._consecutive_failures >= settings.LLM_BREAKER_CONSECUTIVE_FAILURES:
+            return True
+        if len(self._window) < settings.LLM_BREAKER_MIN_REQUESTS:
+            return False
+        return self._error_rate() >= settings.LLM_BREAKER_ERROR_RATE
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            logger.warning("LLM breaker for '%s' opened for %.0fs (last error: %s)", self.name, self._cooldown, self._last_error)
+        self.state = OPEN
+        self._open_until = time.monotonic() + self._cooldown
+
+    def _error_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(1 for _, ok, _ in self._window if not ok) / len(self._window)
+
+    def latency_percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(lat for _, ok, lat in self._window if ok)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, max(0, int(round(q * (len(samples) - 1)))))
+        return samples[idx]
+
+    def sort_key(self) -> tuple[int, float]:
+        rank = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[self.state]
+        return rank, self._ewma_latency if self._ewma_latency is not None else float("inf")
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            ok_latencies = sorted(lat for _, ok, lat in self._window if ok)
+            return {
+                "name": self.name,
+                "state": self.state,
+                "requests": len(self._window),
+                "error_rate": round(self._error_rate(), 3),
+                "consecutive_failures": self._consecutive_failures,
+                "ewma_latency_ms": round(self._ewma_latency * 1000, 1) if self._ewma_latency is not None else None,
+                "p50_latency_ms": round(ok_latencies[len(ok_latencies) // 2] * 1000, 1) if ok_latencies else None,
+                "open_for_seconds": round(max(0.0, self._open_until - time.monotonic()), 1) if self.state == OPEN else 0,
+                "last_error": self._last_error,
+            }
+
+
+_REGISTRY: dict[str, ModelHealth] = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get(name: str) -> ModelHealth:
+    health = _REGISTRY.get(name)
+    if health is None:
+        with _REGISTRY_LOCK:
+            health = _REGISTRY.setdefault(name, ModelHealth(name))
+    return health
+
+
+def ordered(names: Iterable[str], prefix: str = "") -> list[str]:
+    # Healthy models first, fastest first; unmeasured models keep the configured order.
+    indexed = list(enumerate(names))
+    indexed.sort(key=lambda item: (*get(prefix + item[1]).sort_key(), item[0]))
+    return [name for _, name in indexed]
+
+
+def is_fatal(error: BaseException) -> bool:
+    if type(error).__name__ in _FATAL_ERROR_NAMES:
+        return True
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return status in _FATAL_HTTP_STATUSES
+
+
+def backoff_delay(attempt: int) -> float:
+    # "Full jitter" exponential backoff: uniform in [0, min(cap, base * 2^attempt)].
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY_SECONDS, settings.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def snapshot() -> list[dict[str, Any]]:
+    return [h.snapshot() for h in sorted(_REGISTRY.values(), key=lambda h: h.name)]
+
+
+def reset(name: Optional[str] = None) -> None:
+    with _REGISTRY_LOCK:
+        if name is None:
+            _REGISTRY.clear()
+        else:
+            _REGISTRY.pop(name, None)
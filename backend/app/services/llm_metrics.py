@@ -0,0 +1,218 @@
+from __future__ import annotations
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+import threading
+import time
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services import llm_usage
+from app.services.batch_writer import BatchWriter
+
+
+# Seconds. Chat turns are interactive, so resolution matters most below ~10s.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+# Bytes.
+MEMORY_BUCKETS = tuple(float(2 ** n) for n in range(18, 30, 2))  # 256 KiB .. 128 MiB
+
+_HELP = {
+    "llm_calls_total": "Upstream LLM calls by outcome",
+    "llm_retries_total": "Retried upstream LLM attempts",
+    "llm_fallbacks_total": "Fallbacks taken (next model, other provider, hedge, heuristics)",
+    "llm_json_parse_failures_total": "Model outputs that could not be parsed as JSON",
+    "llm_queue_wait_seconds": "Time spent waiting for a scheduler slot",
+    "llm_upstream_latency_seconds": "Upstream call latency, from admission to parsed response",
+    "llm_time_to_first_token_seconds": "Streaming calls: time to the first chunk",
+    "llm_prompt_tokens": "Prompt size in (estimated) tokens",
+    "llm_response_tokens": "Response size in (estimated) tokens",
+    "llm_budget_exhausted_total": "Analyses served by heuristics because a token budget was exhausted",
+    "pdf_extract_seconds": "CV text extraction time per document",
+    "pdf_extract_peak_bytes": "Peak Python heap while extracting one CV (PDF_TRACE_MEMORY)",
+    "pdf_extract_rss_growth_bytes": "Growth of the worker's peak RSS while extracting one CV",
+    "pdf_extract_truncated_total": "CVs whose text was cut at PDF_MAX_CHARS",
+}
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return None
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)),
+        }
+
+
+_LOCK = threading.Lock()
+_COUNTERS: dict[str, dict[tuple[tuple[str, str], ...], float]] = {}
+_HISTOGRAMS: dict[str, dict[tuple[tuple[str, str], ...], Histogram]] = {}
+
+
+def _labels(labels: dict[str, Any]) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels: Any) -> None:
+    key = _labels(labels)
+    with _LOCK:
+        series = _COUNTERS.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def observe(name: str, value: float, buckets: tuple[float, ...] = LATENCY_BUCKETS, **labels: Any) -> None:
+    key = _labels(labels)
+    with _LOCK:
+        series = _HISTOGRAMS.setdefault(name, {})
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = Histogram(buckets)
+        hist.observe(value)
+
+
+@dataclass
+class CallRecord:
+    provider: str
+    model: str
+    priority: int
+    prompt_chars: int = 0
+    prompt_tokens: int = 0
+    response_chars: int = 0
+    response_tokens: int = 0
+    usage_reported: bool = False  # token counts come from the provider, not estimate_tokens
+    queue_wait: float = 0.0
+    latency: float = 0.0
+    ttft: Optional[float] = None
+    attempts: int = 0
+    streamed: bool = False
+    outcome: str = "ok"  # ok | error | invalid_json | circuit_open | timeout
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+
+
+_CURRENT_CALL: ContextVar[Optional[CallRecord]] = ContextVar("llm_current_call", default=None)
+
+
+def start_call(label: str, priority: int, prompt_chars: int, prompt_tokens: int, streamed: bool = False) -> CallRecord:
+    provider, _, model = label.partition(":")
+    record = CallRecord(provider, model, priority, prompt_chars, prompt_tokens, streamed=streamed)
+    _CURRENT_CALL.set(record)
+    return record
+
+
+def current_call() -> Optional[CallRecord]:
+    return _CURRENT_CALL.get()
+
+
+def finish_call(record: CallRecord, outcome: str, error: Any = None) -> None:
+    record.outcome = outcome
+    record.error = str(error)[:500] if error is not None else None
+    labels = {"provider": record.provider, "model": record.model}
+    inc("llm_calls_total", provider=record.provider, model=record.model, outcome=outcome)
+    if record.attempts > 1:
+        inc("llm_retries_total", record.attempts - 1, **labels)
+    if outcome != "circuit_open":
+        observe("llm_queue_wait_seconds", record.queue_wait, priority=record.priority)
+        observe("llm_upstream_latency_seconds", record.latency, streamed=record.streamed, **labels)
+        observe("llm_prompt_tokens", record.prompt_tokens, SIZE_BUCKETS, **labels)
+    if record.ttft is not None:
+        observe("llm_time_to_first_token_seconds", record.ttft, **labels)
+    if record.response_chars:
+        observe("llm_response_tokens", record.response_tokens, SIZE_BUCKETS, **labels)
+    if _CURRENT_CALL.get() is record:
+        _CURRENT_CALL.set(None)
+    if outcome in ("ok", "invalid_json"):
+        # Invalid output is billed all the same.
+        llm_usage.record(record.provider, record.model, record.prompt_tokens, record.response_tokens, record.usage_reported)
+    application_id = llm_usage.current_scope().application_id
+    if settings.LLM_CALL_LOG_ENABLED and application_id is not None:
+        _persist(application_id, record)
+
+
+# Call logs are inserted in batches by a background thread (see batch_writer).
+_WRITER = BatchWriter("llm-call-log-writer", lambda: SessionLocal())
+
+
+def _persist(application_id: int, record: CallRecord) -> None:
+    data = asdict(record)
+    data.pop("started_at")
+    _WRITER.add(models.LLMCallLog(application_id=application_id, **data))
+
+
+def flush(timeout: Optional[float] = 10.0) -> bool:
+    # Waits for queued call logs to be written; call from a thread, not the event loop.
+    return _WRITER.flush(timeout)
+
+
+def snapshot() -> dict[str, Any]:
+    with _LOCK:
+        counters = {
+            name: [{"labels": dict(k), "value": v} for k, v in sorted(series.items())]
+            for name, series in sorted(_COUNTERS.items())
+        }
+        histograms = {
+            name: [{"labels": dict(k), **h.snapshot()} for k, h in sorted(series.items())]
+            for name, series in sorted(_HISTOGRAMS.items())
+        }
+    return {"counters": counters, "histograms": histograms}
+
+
+def _fmt_labels(key: tuple[tuple[str, str], ...], extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render_prometheus() -> str:
+    lines: list[str] = []
+    with _LOCK:
+        for name, series in sorted(_COUNTERS.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_fmt_labels(key)} {value:g}")
+        for name, series in sorted(_HISTOGRAMS.items()):
+            lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip([f"{b:g}" for b in h.buckets] + ["+Inf"], h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_fmt_labels(key, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {h.sum:g}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _LOCK:
+        _COUNTERS.clear()
+        _HISTOGRAMS.clear()
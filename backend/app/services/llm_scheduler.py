@@ -0,0 +1,168 @@
+from __future__ import annotations
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first.
+INTERACTIVE = 0
+APPLICATION = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", APPLICATION: "application", BATCH: "batch"}
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> float:
+        # Returns 0 when a token was taken, otherwise seconds until one is available.
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class LLMScheduler:
+    """Global admission control for upstream LLM calls.
+
+    At most ``max_concurrency`` calls run at once, and each provider has a
+    token bucket limiting its request rate. A caller is admitted once both a
+    slot and a token of its provider are free; waiting callers are served by
+    priority class, then FIFO, and nobody holds a slot while waiting for a
+    token.
+    """
+
+    def __init__(self, max_concurrency: int, provider_rates: dict[str, tuple[float, float]]):
+        self.max_concurrency = max_concurrency
+        self._running = 0
+        self._queue: list[tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in provider_rates.items()}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._waits: dict[int, deque[float]] = {p: deque(maxlen=500) for p in PRIORITY_NAMES}
+        self._admitted: dict[int, int] = {p: 0 for p in PRIORITY_NAMES}
+
+    def _token_delay(self, provider: str) -> float:
+        bucket = self._buckets.get(provider)
+        return bucket.try_take() if bucket is not None else 0.0
+
+    def _wake_next(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # A waiter whose provider is out of tokens also blocks the lower
+        # priority waiters of that provider, but not those of other providers.
+        blocked: set[str] = set()
+        skipped = []
+        retry_in: Optional[float] = None
+        while self._queue and self._running < self.max_concurrency:
+            entry = heapq.heappop(self._queue)
+            _, _, provider, fut = entry
+            if fut.done():
+                continue
+            if provider in blocked:
+                skipped.append(entry)
+                continue
+            delay = self._token_delay(provider)
+            if delay > 0:
+                blocked.add(provider)
+                skipped.append(entry)
+                retry_in = delay if retry_in is None else min(retry_in, delay)
+                continue
+            self._running += 1
+            fut.set_result(None)
+        for entry in skipped:
+            heapq.heappush(self._queue, entry)
+        if retry_in is not None:
+            self._timer = asyncio.get_running_loop().call_later(retry_in, self._wake_next)
+
+    async def _acquire(self, priority: int, provider: Optional[str] = None) -> None:
+        provider = provider or ""
+        if self._running < self.max_concurrency and not self._queue and self._token_delay(provider) <= 0:
+            self._running += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), provider, fut))
+        self._wake_next()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot was granted just as we were cancelled: hand it on.
+                self._running -= 1
+                self._wake_next()
+            raise
+
+    def _release(self) -> None:
+        self._running -= 1
+        self._wake_next()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = APPLICATION, provider: Optional[str] = None) -> AsyncIterator[float]:
+        started = time.monotonic()
+        await self._acquire(priority, provider)
+        try:
+            waited = time.monotonic() - started
+            self._waits.setdefault(priority, deque(maxlen=500)).append(waited)
+            self._admitted[priority] = self._admitted.get(priority, 0) + 1
+            yield waited
+        finally:
+            self._release()
+
+    def metrics(self) -> dict[str, Any]:
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _, fut in self._queue:
+            if not fut.done():
+                depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+        waits = {}
+        for priority, samples in self._waits.items():
+            ordered = sorted(samples)
+            waits[PRIORITY_NAMES.get(priority, str(priority))] = {
+                "admitted": self._admitted.get(priority, 0),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else None,
+                "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "queue_depth": depth,
+            "wait_time": waits,
+        }
+
+
+_SCHEDULER: Optional[LLMScheduler] = None
+
+
+def get_scheduler() -> LLMScheduler:
+    global _SCHEDULER
+    if _SCHEDULER is None:
+        _SCHEDULER = LLMScheduler(
+            settings.LLM_MAX_CONCURRENCY,
+            {
+                "gemini": (settings.LLM_GEMINI_RPS, settings.LLM_GEMINI_BURST),
+                "openrouter": (settings.LLM_OPENROUTER_RPS, settings.LLM_OPENROUTER_BURST),
+            },
+        )
+    return _SCHEDULER
@@ -0,0 +1,219 @@
+from __future__ import annotations
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.batch_writer import BatchWriter
+
+
+logger = logging.getLogger(__name__)
+
+# Token accounting. Every upstream call made inside a bound scope is stored
+# as an llm_usage row. Rows are written in batches by a background thread, and
+# per-vacancy / per-employer totals over the budget window are kept in memory:
+# tokens of queued rows are counted as soon as they are recorded, and the
+# committed totals are reloaded from the table every _TOTALS_TTL_SECONDS on the
+# writer thread, so the budget check on the hot path never touches the
+# database. Until the first load completes only this process's own usage is
+# counted.
+
+_TOTALS_TTL_SECONDS = 60.0
+
+
+@dataclass(frozen=True)
+class UsageScope:
+    application_id: Optional[int] = None
+    session_id: Optional[int] = None
+    vacancy_id: Optional[int] = None
+    employer_id: Optional[int] = None
+
+
+_SCOPE: ContextVar[UsageScope] = ContextVar("llm_usage_scope", default=UsageScope())
+_LOCK = threading.Lock()
+_TOTALS: dict[tuple[str, int], int] = {}  # committed tokens in the budget window
+_PENDING: dict[tuple[str, int], int] = {}  # recorded, not yet committed
+_LOADED_AT: Optional[float] = None
+_LOADING = False
+
+def bind(
+    application_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+    vacancy_id: Optional[int] = None,
+    employer_id: Optional[int] = None,
+) -> UsageScope:
+    # Calls made by the current task (and tasks it spawns) are charged to this scope.
+    scope = UsageScope(application_id, session_id, vacancy_id, employer_id)
+    _SCOPE.set(scope)
+    return scope
+
+
+def bind_application(app: models.Application, vacancy: Optional[models.Vacancy], session_id: Optional[int] = None) -> UsageScope:
+    return bind(app.id, session_id, app.vacancy_id, vacancy.created_by if vacancy else None)
+
+
+def current_scope() -> UsageScope:
+    return _SCOPE.get()
+
+
+def _window_start() -> datetime:
+    return datetime.utcnow() - timedelta(days=settings.LLM_TOKEN_BUDGET_WINDOW_DAYS)
+
+
+def _column(kind: str):
+    return models.LLMUsage.vacancy_id if kind == "vacancy" else models.LLMUsage.employer_id
+
+
+def _keys(scope: Any) -> list[tuple[str, int]]:
+    return [(kind, key) for kind, key in (("vacancy", scope.vacancy_id), ("employer", scope.employer_id)) if key is not None]
+
+
+def _total(kind: str, key: int) -> int:
+    _refresh_if_stale()
+    with _LOCK:
+        return _TOTALS.get((kind, key), 0) + _PENDING.get((kind, key), 0)
+
+
+def _refresh_if_stale() -> None:
+    global _LOADING
+    with _LOCK:
+        if _LOADING or (_LOADED_AT is not None and time.monotonic() - _LOADED_AT < _TOTALS_TTL_SECONDS):
+            return
+        _LOADING = True
+    _WRITER.run(_load_totals)
+
+
+def _load_totals(db: Session) -> None:
+    # Runs on the writer thread, so rows recorded so far are either committed
+    # (and in the sums) or still in _PENDING.
+    global _LOADED_AT, _LOADING
+    try:
+        totals: dict[tuple[str, int], int] = {}
+        for kind in ("vacancy", "employer"):
+            column = _column(kind)
+            rows = (
+                db.query(column, func.sum(models.LLMUsage.prompt_tokens + models.LLMUsage.completion_tokens))
+                .filter(models.LLMUsage.created_at >= _window_start(), column.isnot(None))
+                .group_by(column)
+                .all()
+            )
+            totals.update(((kind, key), int(total or 0)) for key, total in rows)
+        with _LOCK:
+            _TOTALS.clear()
+            _TOTALS.update(totals)
+            _LOADED_AT = time.monotonic()
+    finally:
+        with _LOCK:
+            _LOADING = False
+
+
+def _written(rows: list[models.LLMUsage], ok: bool) -> None:
+    # Failed writes are dropped, and their tokens are not billed.
+    with _LOCK:
+        for row in rows:
+            tokens = row.prompt_tokens + row.completion_tokens
+            for k in _keys(row):
+                left = _PENDING.get(k, 0) - tokens
+                if left > 0:
+                    _PENDING[k] = left
+                else:
+                    _PENDING.pop(k, None)
+                if ok:
+                    _TOTALS[k] = _TOTALS.get(k, 0) + tokens
+
+
+_WRITER = BatchWriter("llm-usage-writer", lambda: SessionLocal(), _written)
+
+
+def exhausted(scope: Optional[UsageScope] = None) -> Optional[str]:
+    # Name of the exhausted budget, or None if calls may proceed.
+    scope = scope or current_scope()
+    if settings.LLM_TOKEN_BUDGET_PER_VACANCY and scope.vacancy_id is not None:
+        if _total("vacancy", scope.vacancy_id) >= settings.LLM_TOKEN_BUDGET_PER_VACANCY:
+            return f"vacancy:{scope.vacancy_id}"
+    if settings.LLM_TOKEN_BUDGET_PER_EMPLOYER and scope.employer_id is not None:
+        if _total("employer", scope.employer_id) >= settings.LLM_TOKEN_BUDGET_PER_EMPLOYER:
+            return f"employer:{scope.employer_id}"
+    return None
+
+
+def record(provider: str, model: str, prompt_tokens: int, completion_tokens: int, reported: bool) -> None:
+    scope = current_scope()
+    if scope == UsageScope() or not (prompt_tokens or completion_tokens):
+        return
+    row = models.LLMUsage(
+        application_id=scope.application_id,
+        session_id=scope.session_id,
+        vacancy_id=scope.vacancy_id,
+        employer_id=scope.employer_id,
+        provider=provider,
+        model=model,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        reported=reported,
+    )
+    with _LOCK:
+        for k in _keys(scope):
+            _PENDING[k] = _PENDING.get(k, 0) + prompt_tokens + completion_tokens
+    _WRITER.add(row)
+
+
+def flush(timeout: Optional[float] = 10.0) -> bool:
+    # Waits for queued usage rows to be written; call from a thread, not the event loop.
+    return _WRITER.flush(timeout)
+
+
+def report(db: Session, group_by: str = "employer", days: Optional[int] = None) -> list[dict[str, Any]]:
+    columns = {
+        "application": models.LLMUsage.application_id,
+        "session": models.LLMUsage.session_id,
+        "vacancy": models.LLMUsage.vacancy_id,
+        "employer": models.LLMUsage.employer_id,
+    }
+    column = columns.get(group_by, models.LLMUsage.employer_id)
+    since = datetime.utcnow() - timedelta(days=days if days is not None else settings.LLM_TOKEN_BUDGET_WINDOW_DAYS)
+    rows = (
+        db.query(
+            column,
+            func.count(models.LLMUsage.id),
+            func.sum(models.LLMUsage.prompt_tokens),
+            func.sum(models.LLMUsage.completion_tokens),
+        )
+        .filter(models.LLMUsage.created_at >= since, column.isnot(None))
+        .group_by(column)
+        .order_by(func.sum(models.LLMUsage.prompt_tokens + models.LLMUsage.completion_tokens).desc())
+        .all()
+    )
+    budget = {
+        "vacancy": settings.LLM_TOKEN_BUDGET_PER_VACANCY,
+        "employer": settings.LLM_TOKEN_BUDGET_PER_EMPLOYER,
+    }.get(group_by) or None
+    return [
+        {
+            group_by + "_id": key,
+            "calls": calls,
+            "prompt_tokens": int(prompt or 0),
+            "completion_tokens": int(completion or 0),
+            "total_tokens": int((prompt or 0) + (completion or 0)),
+            "budget": budget,
+        }
+        for key, calls, prompt, completion in rows
+    ]
+
+
+def reset_totals() -> None:
+    global _LOADED_AT
+    flush()
+    with _LOCK:
+        _TOTALS.clear()
+        _PENDING.clear()
+        _LOADED_AT = None
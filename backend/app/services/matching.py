@@ -0,0 +1,261 @@
+from __future__ import annotations
+from functools import cached_property
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import re
+
+from app.services import terms
+
+
+# Compiled form of the compute_relevance heuristics. A VacancyMatcher holds
+# everything that only depends on the vacancy (lowercased skills, languages,
+# city, title tokens, thresholds); CVFeatures holds what only depends on the
+# CV (lowercased text, experience years, claimed salary). Scoring a pair is
+# then a handful of substring / set lookups. cv.compute_relevance delegates
+# here, so this is the only copy of the rules.
+#
+# Alongside each CV text a small profile is stored (cv_terms / cv_experience_years
+# / cv_salary, written once at upload by cv_profile): the regex-derived values,
+# and the CV's distinct words for candidate lookups (recommendations). Scoring
+# still runs the substring rules on cv_text itself, so a stored CV scores
+# exactly like compute_relevance on the raw text; a word set could not answer
+# substring questions like "does the CV mention 'react'" for "React.js".
+
+_EXPERIENCE_RE = re.compile(r"(опыт\s*(\d+))|((\d+)\+?\s*год)")
+_SALARY_RE = re.compile(r"(\d{2,6})\s*(k|тыс|тг|₸)?")
+_BACHELOR = "бакалавр"
+
+# Below this many distinct patterns, C-level `in` scans beat walking the
+# automaton character by character in Python.
+_AUTOMATON_MIN_PATTERNS = 256
+
+Result = Tuple[int, List[str], str]
+
+
+class PatternSet:
+    """Aho-Corasick automaton reporting which of a fixed set of substrings occur in a text."""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._out: list[frozenset[str]] = [frozenset()]
+        self.patterns = frozenset(p for p in patterns if p)
+        for pattern in self.patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._out.append(frozenset())
+                state = nxt
+            self._out[state] = self._out[state] | {pattern}
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] | self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> set[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[str] = set()
+        remaining = len(self.patterns)
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+                if len(found) == remaining:
+                    break
+        return found
+
+
+class CVFeatures:
+    def __init__(self, cv_text: str, present: Optional[set[str]] = None):
+        self.text = cv_text.lower()
+        self._present = present
+
+    @classmethod
+    def from_profile(
+        cls,
+        cv_text: str,
+        experience_years: int,
+        claimed_salary: Optional[float],
+        cv_terms: Optional[str] = None,
+    ) -> CVFeatures:
+        cv = cls(cv_text)
+        cv.__dict__["experience_years"] = experience_years
+        cv.__dict__["claimed_salary"] = claimed_salary
+        if cv_terms is not None:
+            cv.__dict__["terms"] = frozenset(cv_terms.split())
+        return cv
+
+    @cached_property
+    def terms(self) -> frozenset[str]:
+        # Words of the CV, for candidate lookups (recommendations); scoring
+        # itself uses the substring rules.
+        return frozenset(terms.words(self.text))
+
+    def has(self, pattern: str) -> bool:
+        if self._present is not None:
+            return pattern in self._present
+        return pattern in self.text
+
+    @cached_property
+    def experience_years(self) -> int:
+        match = _EXPERIENCE_RE.search(self.text)
+        if not match:
+            return 0
+        return int(next((g for g in match.groups() if g and g.isdigit()), "0"))
+
+    @cached_property
+    def claimed_salary(self) -> Optional[float]:
+        match = _SALARY_RE.search(self.text)
+        return float(match.group(1)) if match else None
+
+
+def cv_profile(cv_text: str) -> Dict[str, Any]:
+    """Column values stored with a CV text (User / Application) for scoring without rescanning it."""
+    cv = CVFeatures(cv_text)
+    return {
+        "cv_terms": " ".join(sorted(cv.terms)),
+        "cv_experience_years": cv.experience_years,
+        "cv_salary": cv.claimed_salary,
+    }
+
+
+def stored_features(row: Any) -> CVFeatures:
+    # `row` is a User, an Application or a result row with cv_text and the
+    # profile columns (cv_terms may be left out); rows written before the
+    # profile existed derive it from the text.
+    text = row.cv_text or ""
+    if row.cv_experience_years is None:
+        return CVFeatures(text)
+    return CVFeatures.from_profile(text, row.cv_experience_years, row.cv_salary, getattr(row, "cv_terms", None))
+
+
+class VacancyMatcher:
+    def __init__(self, vacancy: Dict[str, Any]):
+        self.skills = [s.lower() for s in (vacancy.get("skills", []) or [])]
+        self.city = (vacancy.get("city") or "").lower()
+        self.min_exp = int(vacancy.get("min_experience_years") or 0)
+        self.employment = (vacancy.get("employment_type") or "").lower()
+        self.education = (vacancy.get("education_level") or "").lower()
+        self.languages = [l.lower() for l in (vacancy.get("languages") or [])]
+        try:
+            self.salary_min = float(vacancy.get("salary_min") or 0.0)
+        except Exception:
+            self.salary_min = 0.0
+        title = (vacancy.get("title") or "").lower()
+        self.title_tokens = title.split("(")[0].strip().split() if title else []
+
+    @property
+    def patterns(self) -> set[str]:
+        out = {*self.skills, *self.languages, *self.title_tokens, self.city, self.employment, self.education}
+        if _BACHELOR in self.education:
+            out.add(_BACHELOR)
+        out.discard("")
+        return out
+
+    def score(self, cv_text: str) -> Result:
+        return self.score_features(CVFeatures(cv_text))
+
+    def score_features(self, cv: CVFeatures) -> Result:
+        score = 40
+        mismatches: List[str] = []
+        notes: List[str] = []
+
+        if self.skills:
+            matched = sum(1 for s in self.skills if s and cv.has(s))
+            score += int(35 * (matched / max(1, len(self.skills))))
+            notes.append(f"навыки {matched}/{len(self.skills)}")
+
+        if self.city:
+            if cv.has(self.city):
+                score += 6
+                notes.append("город совпадает")
+            else:
+                mismatches.append("город")
+
+        if self.min_exp:
+            years = cv.experience_years
+            if years >= self.min_exp:
+                score += 6
+                notes.append(f"опыт {years} >= {self.min_exp}")
+            else:
+                mismatches.append("опыт")
+
+        if self.employment:
+            if cv.has(self.employment):
+                score += 3
+            else:
+                mismatches.append("занятость")
+
+        if self.education:
+            if cv.has(self.education) or (_BACHELOR in self.education and cv.has(_BACHELOR)):
+                score += 3
+            else:
+                mismatches.append("образование")
+
+        if self.languages:
+            lang_hit = sum(1 for l in self.languages if l and cv.has(l))
+            if lang_hit == 0:
+                mismatches.append("языки")
+            else:
+                score += 3
+                notes.append(f"языки {lang_hit}/{len(self.languages)}")
+
+        if self.salary_min:
+            claimed = cv.claimed_salary
+            if claimed is not None:
+                if claimed <= self.salary_min * 1.2:
+                    score += 4
+                else:
+                    mismatches.append("зарплата")
+
+        if any(cv.has(tok) for tok in self.title_tokens):
+            score += 5
+            notes.append("позиция релевантна")
+
+        score = max(0, min(100, score))
+        return score, mismatches, "; ".join(notes)
+
+
+class VacancyIndex:
+    """Matchers for a set of vacancies, compiled once and reusable across CVs."""
+
+    def __init__(self, vacancies: Sequence[Dict[str, Any]]):
+        self.matchers = [VacancyMatcher(v) for v in vacancies]
+        patterns: set[str] = set()
+        for m in self.matchers:
+            patterns |= m.patterns
+        self._automaton = PatternSet(patterns) if len(patterns) >= _AUTOMATON_MIN_PATTERNS else None
+
+    def score(self, cv: Union[str, CVFeatures]) -> list[Result]:
+        if isinstance(cv, str):
+            cv = CVFeatures(cv)
+        if self._automaton is not None:
+            # A copy: the hit set only covers this index's patterns.
+            present = self._automaton.search(cv.text)
+            cv = CVFeatures.from_profile(cv.text, cv.experience_years, cv.claimed_salary)
+            cv._present = present
+        return [m.score_features(cv) for m in self.matchers]
+
+
+def score_vacancies(cv: Union[str, CVFeatures], vacancies: Sequence[Dict[str, Any]]) -> list[Result]:
+    # One CV against many vacancies: the CV is lowercased, regex-scanned and
+    # (for large sets) run through the automaton once.
+    return VacancyIndex(vacancies).score(cv)
+
+
+def score_cvs(vacancy: Dict[str, Any], cv_texts: Iterable[str]) -> list[Result]:
+    # Many CVs against one vacancy: the vacancy is compiled once.
+    matcher = VacancyMatcher(vacancy)
+    return [matcher.score(text) for text in cv_texts]
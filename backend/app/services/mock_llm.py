@@ -0,0 +1,199 @@
+from __future__ import annotations
+from typing import Any, AsyncIterator, Optional
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.core.config import settings
+from app.services.cv import compute_relevance
+from app.services.prompt import estimate_tokens
+
+
+# Local stand-in for OpenRouter's chat-completions API. Answers are derived
+# from compute_relevance, so they are deterministic for a given prompt;
+# latency and failures are sampled from the MOCK_LLM_* settings.
+app = FastAPI(title="Mock LLM")
+
+_rng = random.Random(settings.MOCK_LLM_SEED)
+
+_HEADER_RE = re.compile(
+    r"^(ТРЕБОВАНИЯ ВАКАНСИИ|ПРОФИЛЬ КАНДИДАТА|ОТКРЫТЫЕ НЕСООТВЕТСТВИЯ|ФРАГМЕНТЫ РЕЗЮМЕ|РЕЗЮМЕ|КОНТЕКСТ ИЗ ЧАТА"
+    r"|СВОДКА ПРЕДЫДУЩЕГО ДИАЛОГА|ТЕКУЩАЯ СВОДКА|НОВЫЕ СООБЩЕНИЯ ДЛЯ СВОДКИ|ВАКАНСИЯ #(\d+))[^\n]*:\n",
+    re.MULTILINE,
+)
+_TAIL_RE = re.compile(r"^(Требования к ответу|Оцени соответствие|Обнови сводку)", re.MULTILINE)
+
+_QUESTIONS = {
+    "город": "Вакансия предполагает работу в городе {city}. Вам удобно работать из этого города или рассматриваете переезд?",
+    "опыт": "Расскажите, пожалуйста, подробнее про ваш релевантный опыт: сколько лет и с какими задачами сталкивались?",
+    "занятость": "Какой формат занятости вам удобен сейчас?",
+    "образование": "Уточните, пожалуйста, ваше профильное образование или курсы по теме вакансии.",
+    "языки": "Какими языками вы владеете и на каком уровне?",
+    "зарплата": "Какие у вас ожидания по зарплате на этой позиции?",
+}
+
+
+def _sections(prompt: str) -> list[tuple[str, Optional[str], str]]:
+    tail = _TAIL_RE.search(prompt)
+    body = prompt[: tail.start()] if tail else prompt
+    headers = list(_HEADER_RE.finditer(body))
+    out = []
+    for i, m in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else len(body)
+        out.append((m.group(1), m.group(2), body[m.end() : end].strip()))
+    return out
+
+
+def _split_csv(value: str) -> list[str]:
+    return [x.strip() for x in value.split(",") if x.strip()]
+
+
+def parse_requirements(text: str) -> dict[str, Any]:
+    # Inverse of llm._requirements_text.
+    vacancy: dict[str, Any] = {"skills": [], "languages": []}
+    for line in text.splitlines():
+        key, _, value = line.partition(": ")
+        value = value.strip()
+        if key == "Позиция":
+            vacancy["title"] = value
+        elif key == "Город":
+            vacancy["city"] = value
+        elif key == "Описание":
+            vacancy["description"] = value
+        elif key == "Мин. опыт":
+            m = re.match(r"(\d+)", value)
+            vacancy["min_experience_years"] = int(m.group(1)) if m else 0
+        elif key == "Тип занятости":
+            vacancy["employment_type"] = value
+        elif key == "Образование":
+            vacancy["education_level"] = value
+        elif key == "Языки":
+            vacancy["languages"] = _split_csv(value)
+        elif key == "Навыки":
+            vacancy["skills"] = _split_csv(value)
+        elif key in ("Зарплата", "Зарплата от"):
+            m = re.match(r"([\d.]+)", value)
+            vacancy["salary_min"] = float(m.group(1)) if m else None
+    return vacancy
+
+
+def _answer_for(vacancy: dict[str, Any], cv_text: str, answers_given: int) -> dict[str, Any]:
+    score, mismatches, summary = compute_relevance(cv_text, vacancy)
+    question = None
+    if answers_given < len(mismatches):
+        question = _QUESTIONS.get(mismatches[answers_given], "Расскажите, пожалуйста, о самом релевантном опыте.")
+        question = question.format(city=vacancy.get("city") or "вакансии")
+    text = cv_text.lower()
+    return {
+        "candidate_profile": {
+            "city": vacancy.get("city") if (vacancy.get("city") or "").lower() in text else None,
+            "experience_years": None,
+            "education": None,
+            "languages": [l for l in vacancy.get("languages", []) if l.lower() in text],
+            "skills": [s for s in vacancy.get("skills", []) if s.lower() in text],
+            "employment_type": None,
+            "salary_expectation": None,
+        },
+        "mismatches": mismatches,
+        "summary": summary or "Кандидат частично соответствует требованиям.",
+        "score": score,
+        "question": question,
+    }
+
+
+def build_answer(prompt: str) -> dict[str, Any]:
+    sections = _sections(prompt)
+    cv_text = "\n".join(body for name, _, body in sections if name in ("РЕЗЮМЕ", "ФРАГМЕНТЫ РЕЗЮМЕ", "ПРОФИЛЬ КАНДИДАТА"))
+    batch = [(int(idx), body) for name, idx, body in sections if idx is not None]
+    if batch:
+        results = []
+        for idx, body in batch:
+            item = _answer_for(parse_requirements(body), cv_text, 0)
+            results.append({"index": idx, "score": item["score"], "mismatches": item["mismatches"], "summary": item["summary"]})
+        return {"results": results}
+    named = {name: body for name, _, body in sections}
+    if "НОВЫЕ СООБЩЕНИЯ ДЛЯ СВОДКИ" in named:
+        previous = [line[2:] for line in named.get("ТЕКУЩАЯ СВОДКА", "").split("Уже обсуждено")[0].splitlines() if line.startswith("- ")]
+        answers = [line[len("Кандидат:") :].strip() for line in named["НОВЫЕ СООБЩЕНИЯ ДЛЯ СВОДКИ"].splitlines() if line.startswith("Кандидат:")]
+        return {"facts": previous + answers, "resolved": []}
+    requirements = named.get("ТРЕБОВАНИЯ ВАКАНСИИ", "")
+    chat = named.get("КОНТЕКСТ ИЗ ЧАТА", "")
+    # Folded answers show up as "- ..." facts in the summary section.
+    answers_given = sum(1 for line in chat.splitlines() if line.startswith("Кандидат:"))
+    answers_given += sum(1 for line in named.get("СВОДКА ПРЕДЫДУЩЕГО ДИАЛОГА", "").split("Уже обсуждено")[0].splitlines() if line.startswith("- "))
+    return _answer_for(parse_requirements(requirements), cv_text, answers_given)
+
+
+def _sample_latency() -> float:
+    median = max(0.0, settings.MOCK_LLM_LATENCY_MS) / 1000.0
+    if median == 0:
+        return 0.0
+    return median * math.exp(_rng.gauss(0.0, settings.MOCK_LLM_LATENCY_SIGMA))
+
+
+def _prompt_text(body: dict[str, Any]) -> str:
+    return "\n".join(str(m.get("content") or "") for m in body.get("messages") or [] if m.get("role") == "user")
+
+
+async def _stream(content: str, model: str, latency: float, usage: dict[str, int]) -> AsyncIterator[bytes]:
+    chunk = max(1, settings.MOCK_LLM_STREAM_CHUNK_CHARS)
+    pieces = [content[i : i + chunk] for i in range(0, len(content), chunk)] or [""]
+    first = latency * settings.MOCK_LLM_TTFT_FRACTION
+    per_piece = (latency - first) / max(1, len(pieces))
+    await asyncio.sleep(first)
+    completion_id = f"mock-{uuid.uuid4().hex[:12]}"
+    for piece in pieces:
+        event = {"id": completion_id, "model": model, "choices": [{"index": 0, "delta": {"content": piece}}]}
+        yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+        await asyncio.sleep(per_piece)
+    final = {"id": completion_id, "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+    yield f"data: {json.dumps(final)}\n\n".encode("utf-8")
+    yield b"data: [DONE]\n\n"
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model") or "mock/relevance"
+    latency = _sample_latency()
+    if _rng.random() < settings.MOCK_LLM_ERROR_RATE:
+        await asyncio.sleep(latency * settings.MOCK_LLM_TTFT_FRACTION)
+        status = _rng.choice([429, 500, 503])
+        return JSONResponse({"error": {"code": status, "message": "mock upstream error"}}, status_code=status)
+
+    prompt = _prompt_text(body)
+    content = json.dumps(build_answer(prompt), ensure_ascii=False)
+    usage = {
+        "prompt_tokens": estimate_tokens(prompt),
+        "completion_tokens": estimate_tokens(content),
+    }
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    if body.get("stream"):
+        return StreamingResponse(_stream(content, model, latency, usage), media_type="text/event-stream")
+    await asyncio.sleep(latency)
+    return {
+        "id": f"mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the mock OpenRouter-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,107 @@
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+import asyncio
+import logging
+import threading
+
+from app.core.config import settings
+from app.services import llm_metrics
+from app.services.cv import extract_pdf
+
+
+logger = logging.getLogger(__name__)
+
+# pypdf is CPU-bound and leaks memory on some documents, so extraction runs in
+# a process pool off the event loop: workers are recycled after
+# PDF_MAX_TASKS_PER_CHILD documents, and a document that overruns its
+# wall-clock budget takes the pool down with it (a running task cannot be
+# cancelled any other way) and a fresh pool is started.
+
+
+class PdfExtractionError(RuntimeError):
+    pass
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_LOCK = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=max(1, settings.PDF_WORKERS),
+                max_tasks_per_child=settings.PDF_MAX_TASKS_PER_CHILD or None,
+            )
+        return _POOL
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _LOCK:
+        if _POOL is pool:
+            _POOL = None
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+async def run(fn: Callable[..., Any], *args: Any, timeout: Optional[float] = None) -> Any:
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = _get_pool()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(pool, fn, *args), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("PDF worker exceeded %.1fs; restarting the extraction pool", timeout)
+            _discard_pool(pool)
+            raise PdfExtractionError("PDF processing timed out") from None
+        except BrokenProcessPool:
+            # Killed along with a timed-out neighbour (or crashed): retry once on a fresh pool.
+            _discard_pool(pool)
+            if attempt:
+                raise PdfExtractionError("PDF processing failed") from None
+    raise AssertionError("unreachable")
+
+
+async def extract_text(path: str) -> str:
+    try:
+        text, stats = await run(
+            extract_pdf, path, settings.PDF_MAX_PAGES or None, settings.PDF_MAX_CHARS or None,
+            timeout=settings.PDF_EXTRACT_TIMEOUT_SECONDS or None,
+        )
+    except PdfExtractionError:
+        raise
+    except Exception as e:
+        logger.warning("Failed to extract text from %s: %s", path, e)
+        raise PdfExtractionError("Could not read the PDF file") from e
+    _record(path, stats)
+    return text
+
+
+def _record(path: str, stats: dict[str, Any]) -> None:
+    logger.info(
+        "Extracted %s: %d page(s), %d chars%s in %.2fs, peak RSS +%s bytes, peak heap %s bytes",
+        path, stats["pages"], stats["chars"], " (truncated)" if stats["truncated"] else "", stats["seconds"],
+        stats["rss_growth_bytes"] if stats["rss_growth_bytes"] is not None else "n/a", stats["peak_bytes"] if stats["peak_bytes"] is not None else "n/a",
+    )
+    llm_metrics.observe("pdf_extract_seconds", stats["seconds"])
+    if stats["rss_growth_bytes"] is not None:
+        llm_metrics.observe("pdf_extract_rss_growth_bytes", stats["rss_growth_bytes"], llm_metrics.MEMORY_BUCKETS)
+    if stats["peak_bytes"] is not None:
+        llm_metrics.observe("pdf_extract_peak_bytes", stats["peak_bytes"], llm_metrics.MEMORY_BUCKETS)
+    if stats["truncated"]:
+        llm_metrics.inc("pdf_extract_truncated_total")
+
+
+def shutdown() -> None:
+    global _POOL
+    with _LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+from typing import Any, Optional, Sequence
+import json
+import re
+
+from app.core.config import settings
+
+
+_WORD_RE = re.compile(r"[\w+#]+", re.UNICODE)
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+(?=[A-ZА-ЯЁ])")
+
+
+def estimate_tokens(text: str) -> int:
+    # No tokenizer ships with the providers' SDKs we use, so approximate:
+    # BPE vocabularies cover ASCII at ~4 chars/token and Cyrillic at ~2.5.
+    if not text:
+        return 0
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return int((len(text) - non_ascii) / 4 + non_ascii / 2.5) + 1
+
+
+def clip_to_tokens(text: str, max_tokens: int) -> str:
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text or ""
+    lo, hi = 0, len(text)
+    # Binary search the character limit whose head+tail clip fits the budget.
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(_head_tail(text, mid)) <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return _head_tail(text, lo)
+
+
+def _head_tail(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    head = text[: int(limit * 0.8)]
+    tail = text[-int(limit * 0.2) :] if limit >= 5 else ""
+    return head + "\n…\n" + tail
+
+
+def _terms(text: str) -> set[str]:
+    # A 5-char prefix is a crude stem that lets "опыта"/"опытом" or
+    # "kubernetes"/"kubernetes-кластер" meet without a morphology library.
+    return {w[:5] for w in _WORD_RE.findall((text or "").lower()) if len(w) >= 3}
+
+
+def split_passages(cv_text: str, target_chars: int = 500) -> list[str]:
+    passages: list[str] = []
+    for paragraph in _PARAGRAPH_RE.split(cv_text or ""):
+        buf = ""
+        for sentence in _SENTENCE_RE.split(paragraph.strip()):
+            if not sentence:
+                continue
+            if buf and len(buf) + len(sentence) > target_chars:
+                passages.append(buf)
+                buf = ""
+            buf = f"{buf} {sentence}" if buf else sentence
+            while len(buf) > target_chars * 2:
+                passages.append(buf[:target_chars])
+                buf = buf[target_chars:]
+        if buf:
+            passages.append(buf)
+    return passages
+
+
+def relevant_passages(cv_text: str, queries: Sequence[str], max_tokens: int) -> list[str]:
+    passages = split_passages(cv_text)
+    wanted = set().union(*(_terms(q) for q in queries)) if queries else set()
+    scored = []
+    for idx, passage in enumerate(passages):
+        overlap = len(_terms(passage) & wanted)
+        if overlap:
+            scored.append((overlap, idx))
+    scored.sort(key=lambda item: (-item[0], item[1]))
+    chosen: list[int] = []
+    used = 0
+    for _, idx in scored:
+        cost = estimate_tokens(passages[idx])
+        if used + cost > max_tokens:
+            continue
+        chosen.append(idx)
+        used += cost
+    return [passages[i] for i in sorted(chosen)]
+
+
+def _fit_chat(chat_block: str, max_tokens: int) -> str:
+    lines = chat_block.splitlines()
+    kept: list[str] = []
+    used = 0
+    for line in reversed(lines):
+        cost = estimate_tokens(line)
+        if used + cost > max_tokens:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+def build_context(
+    requirements: str,
+    cv_text: str,
+    chat_block: str = "",
+    profile: Optional[dict[str, Any]] = None,
+    focus: Optional[Sequence[str]] = None,
+    summary: str = "",
+) -> str:
+    parts = [f"ТРЕБОВАНИЯ ВАКАНСИИ:\n{clip_to_tokens(requirements, settings.LLM_PROMPT_BUDGET_REQUIREMENTS)}"]
+    if profile:
+        profile_json = json.dumps(profile, ensure_ascii=False)
+        parts.append(
+            "ПРОФИЛЬ КАНДИДАТА (из предыдущего анализа резюме; обнови его по ответам и верни в candidate_profile):\n"
+            + clip_to_tokens(profile_json, settings.LLM_PROMPT_BUDGET_PROFILE)
+        )
+        if focus:
+            parts.append("ОТКРЫТЫЕ НЕСООТВЕТСТВИЯ:\n" + "\n".join(f"- {m}" for m in focus))
+        passages = relevant_passages(cv_text, list(focus or []), settings.LLM_PROMPT_BUDGET_PASSAGES)
+        if passages:
+            parts.append("ФРАГМЕНТЫ РЕЗЮМЕ (по открытым несоответствиям):\n" + "\n…\n".join(passages))
+    else:
+        parts.append(f"РЕЗЮМЕ(ПОЛНЫЙ ТЕКСТ):\n{clip_to_tokens(cv_text, settings.LLM_PROMPT_BUDGET_CV)}")
+    if summary:
+        parts.append(f"СВОДКА ПРЕДЫДУЩЕГО ДИАЛОГА:\n{clip_to_tokens(summary, settings.LLM_PROMPT_BUDGET_SUMMARY)}")
+    if chat_block:
+        chat = _fit_chat(chat_block, settings.LLM_PROMPT_BUDGET_CHAT)
+        if chat:
+            parts.append(f"КОНТЕКСТ ИЗ ЧАТА (последние сообщения):\n{chat}")
+    return "\n\n".join(parts) + "\n\n"
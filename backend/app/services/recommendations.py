@@ -0,0 +1,182 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Optional, Union
+import heapq
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services.matching import CVFeatures, Result, VacancyMatcher
+from app.services.terms import vacancy_terms
+from app.services.vacancies import vacancy_to_dict
+
+
+logger = logging.getLogger(__name__)
+
+# Inverted index from the words of normalised skill / language / city terms
+# to vacancy ids, plus a compiled VacancyMatcher per vacancy. Recommendations
+# count, over the postings of the CV's words, how many of each vacancy's terms
+# the CV has, keep the vacancies covering the largest share of their terms
+# (which is what the skill part of the score rewards) and only score those
+# with the compute_relevance rules, so the cost grows with the postings
+# touched rather than the number of vacancies.
+#
+# The index lives in process memory: create/delete in this process update it
+# directly, and it is rebuilt from the database every
+# RECOMMEND_INDEX_REFRESH_SECONDS to pick up changes made by other workers.
+# Only the first build runs in a request; later ones run in a background
+# thread while requests keep using the previous snapshot.
+
+
+class _Entry:
+    __slots__ = ("title", "terms", "matcher")
+
+    def __init__(self, title: str, terms: frozenset[str], matcher: VacancyMatcher):
+        self.title = title
+        self.terms = terms
+        self.matcher = matcher
+
+
+_LOCK = threading.Lock()
+_POSTINGS: dict[str, set[int]] = {}
+_ENTRIES: dict[int, _Entry] = {}
+_LOADED_AT: Optional[float] = None
+# One rebuild at a time. While it runs, add/remove are also journaled and
+# replayed onto the new snapshot before it is swapped in, so a change made
+# after the rebuild read the table is not lost.
+_REBUILD_LOCK = threading.Lock()
+_JOURNAL: Optional[list[tuple[int, Optional[_Entry]]]] = None
+_REFRESHING = False
+
+
+def _entry(v: models.Vacancy) -> _Entry:
+    data = vacancy_to_dict(v)
+    terms = vacancy_terms([*data["skills"], *data["languages"], data["city"] or ""])
+    words = frozenset(w for t in terms for w in t.split())
+    return _Entry(v.title, words, VacancyMatcher(data))
+
+
+def _put(postings: dict[str, set[int]], entries: dict[int, _Entry], vacancy_id: int, entry: _Entry) -> None:
+    _drop(postings, entries, vacancy_id)
+    entries[vacancy_id] = entry
+    for term in entry.terms:
+        postings.setdefault(term, set()).add(vacancy_id)
+
+
+def _drop(postings: dict[str, set[int]], entries: dict[int, _Entry], vacancy_id: int) -> None:
+    old = entries.pop(vacancy_id, None)
+    if old is None:
+        return
+    for term in old.terms:
+        ids = postings.get(term)
+        if ids is not None:
+            ids.discard(vacancy_id)
+            if not ids:
+                del postings[term]
+
+
+def _apply(postings: dict[str, set[int]], entries: dict[int, _Entry], vacancy_id: int, entry: Optional[_Entry]) -> None:
+    if entry is None:
+        _drop(postings, entries, vacancy_id)
+    else:
+        _put(postings, entries, vacancy_id, entry)
+
+
+def _rebuild_locked() -> None:
+    # Caller holds _REBUILD_LOCK.
+    global _POSTINGS, _ENTRIES, _LOADED_AT, _JOURNAL
+    started = time.monotonic()
+    with _LOCK:
+        _JOURNAL = []
+    postings: dict[str, set[int]] = {}
+    entries: dict[int, _Entry] = {}
+    db = SessionLocal()
+    try:
+        for v in db.query(models.Vacancy).yield_per(1000):
+            entry = entries[v.id] = _entry(v)
+            for term in entry.terms:
+                postings.setdefault(term, set()).add(v.id)
+        with _LOCK:
+            for vacancy_id, entry in _JOURNAL:
+                _apply(postings, entries, vacancy_id, entry)
+            _POSTINGS, _ENTRIES, _LOADED_AT = postings, entries, time.monotonic()
+    finally:
+        db.close()
+        with _LOCK:
+            _JOURNAL = None
+    logger.info("Vacancy skill index: %d vacancies, %d terms in %.2fs", len(entries), len(postings), time.monotonic() - started)
+
+
+def rebuild() -> None:
+    with _REBUILD_LOCK:
+        _rebuild_locked()
+
+
+def _refresh() -> None:
+    global _REFRESHING
+    try:
+        with _REBUILD_LOCK:
+            if _LOADED_AT is None or time.monotonic() - _LOADED_AT > settings.RECOMMEND_INDEX_REFRESH_SECONDS:
+                _rebuild_locked()
+    except Exception:
+        logger.exception("Failed to refresh the vacancy skill index")
+    finally:
+        with _LOCK:
+            _REFRESHING = False
+
+
+def _ensure_loaded() -> None:
+    global _REFRESHING
+    if _LOADED_AT is None:
+        # First use: concurrent callers wait for one build.
+        with _REBUILD_LOCK:
+            if _LOADED_AT is None:
+                _rebuild_locked()
+        return
+    if time.monotonic() - _LOADED_AT > settings.RECOMMEND_INDEX_REFRESH_SECONDS:
+        # Stale: keep serving it and refresh in the background, once.
+        with _LOCK:
+            if _REFRESHING:
+                return
+            _REFRESHING = True
+        threading.Thread(target=_refresh, name="recommendations-refresh", daemon=True).start()
+
+
+def _change(vacancy_id: int, entry: Optional[_Entry]) -> None:
+    with _LOCK:
+        if _JOURNAL is not None:
+            _JOURNAL.append((vacancy_id, entry))
+        if _LOADED_AT is not None:
+            _apply(_POSTINGS, _ENTRIES, vacancy_id, entry)
+        # Otherwise the first build reads it from the database.
+
+
+def add(v: models.Vacancy) -> None:
+    _change(v.id, _entry(v))
+
+
+def remove(vacancy_id: int) -> None:
+    _change(vacancy_id, None)
+
+
+def recommend(cv: Union[str, CVFeatures], k: int = 10) -> list[tuple[int, str, Result]]:
+    _ensure_loaded()
+    if isinstance(cv, str):
+        cv = CVFeatures(cv)
+    terms = cv.terms
+    limit = max(k * settings.RECOMMEND_CANDIDATES_PER_RESULT, settings.RECOMMEND_MIN_CANDIDATES)
+    with _LOCK:
+        hits: Counter[int] = Counter()
+        for ids in map(_POSTINGS.get, terms):
+            if ids:
+                hits.update(ids)
+        entries = _ENTRIES
+        best = heapq.nlargest(limit, hits.items(), key=lambda item: (item[1] / len(entries[item[0]].terms), item[1]))
+        candidates = [(vid, entries[vid]) for vid, _ in best]
+    scored = [(vacancy_id, entry.title, entry.matcher.score_features(cv)) for vacancy_id, entry in candidates]
+    scored.sort(key=lambda item: (-item[2][0], -item[0]))
+    return scored[:k]
+
@@ -0,0 +1,296 @@
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import logging
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models
+from app.db.session import SessionLocal
+from app.services import llm_scheduler, llm_usage
+from app.services.llm import analyze_cv_async, score_from_llm_result
+from app.services.matching import CVFeatures, VacancyMatcher, stored_features
+from app.services.vacancies import vacancy_to_dict
+
+try:  # optional dependency, only needed for SCORING_QUEUE_BACKEND=redis
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# With a shared Redis queue, a job left "running" this long was owned by a
+# worker that died.
+_STALE_AFTER = timedelta(minutes=10)
+
+
+class _LocalQueue:
+    def __init__(self) -> None:
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+
+    async def push(self, job_id: int) -> None:
+        self._queue.put_nowait(job_id)
+
+    async def pop(self) -> int:
+        return await self._queue.get()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self) -> None:
+        pass
+
+
+class _RedisQueue:
+    def __init__(self, url: str, key: str) -> None:
+        self._redis = aioredis.from_url(url)
+        self._key = key
+
+    async def push(self, job_id: int) -> None:
+        await self._redis.lpush(self._key, job_id)
+
+    async def pop(self) -> int:
+        while True:
+            item = await self._redis.brpop(self._key, timeout=5)
+            if item is not None:
+                return int(item[1])
+
+    def depth(self) -> Optional[int]:
+        return None
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+_QUEUE: Optional[_LocalQueue | _RedisQueue] = None
+_WORKERS: list[asyncio.Task] = []
+
+
+def _get_queue() -> _LocalQueue | _RedisQueue:
+    global _QUEUE
+    if _QUEUE is None:
+        if (settings.SCORING_QUEUE_BACKEND or "").lower() == "redis":
+            if aioredis is None:
+                logger.warning("SCORING_QUEUE_BACKEND=redis but the 'redis' package is not installed; using the in-process queue")
+                _QUEUE = _LocalQueue()
+            else:
+                _QUEUE = _RedisQueue(settings.REDIS_URL, settings.SCORING_REDIS_KEY)
+        else:
+            _QUEUE = _LocalQueue()
+    return _QUEUE
+
+
+def scoring_status(db: Session, application_id: int) -> str:
+    # "scoring" | "scored" | "failed"; applications created before background
+    # scoring existed have no job and count as scored.
+    job = (
+        db.query(models.ScoringJob)
+        .filter(models.ScoringJob.application_id == application_id)
+        .order_by(models.ScoringJob.id.desc())
+        .first()
+    )
+    if job is None or job.status == DONE:
+        return "scored"
+    if job.status == FAILED:
+        return "failed"
+    return "scoring"
+
+
+async def enqueue(db: Session, application_id: int) -> models.ScoringJob:
+    job = models.ScoringJob(application_id=application_id, status=QUEUED)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    await _get_queue().push(job.id)
+    return job
+
+
+def _claim(job_id: int) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        # Conditional update so that only one worker (or process, with Redis) runs a job.
+        claimed = (
+            db.query(models.ScoringJob)
+            .filter(models.ScoringJob.id == job_id, models.ScoringJob.status == QUEUED)
+            .update(
+                {
+                    models.ScoringJob.status: RUNNING,
+                    models.ScoringJob.started_at: datetime.utcnow(),
+                    models.ScoringJob.attempts: models.ScoringJob.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if not claimed:
+            return None
+        job = db.get(models.ScoringJob, job_id)
+        return job.application_id if job else None
+    finally:
+        db.close()
+
+
+def _finish(job_id: int, status: str, error: Optional[str] = None) -> None:
+    db = SessionLocal()
+    try:
+        job = db.get(models.ScoringJob, job_id)
+        if job is None:
+            return
+        job.status = status
+        job.last_error = error
+        job.finished_at = datetime.utcnow() if status in (DONE, FAILED) else None
+        db.commit()
+    finally:
+        db.close()
+
+
+# The worker coroutines run on the event loop; every database round trip
+# below (claim, load, store, finish) runs in a thread via asyncio.to_thread.
+
+def _load(application_id: int) -> Optional[tuple[str, CVFeatures, dict, int, Optional[int]]]:
+    db = SessionLocal()
+    try:
+        app = db.get(models.Application, application_id)
+        if app is None:
+            return None
+        vacancy = db.get(models.Vacancy, app.vacancy_id)
+        employer_id = vacancy.created_by if vacancy else None
+        return app.cv_text or "", stored_features(app), vacancy_to_dict(vacancy), app.vacancy_id, employer_id
+    finally:
+        db.close()
+
+
+def _store(application_id: int, score: int, mismatches: list[str], summary: str) -> None:
+    db = SessionLocal()
+    try:
+        app = db.get(models.Application, application_id)
+        if app is None:
+            return
+        finished_chat = (
+            db.query(models.ChatSession.id)
+            .filter(models.ChatSession.application_id == application_id, models.ChatSession.state == "closed")
+            .first()
+        )
+        if finished_chat is not None:
+            # The chat already produced a final score from the candidate's answers.
+            logger.info("Scoring job for application %s skipped: chat already finished", application_id)
+            return
+        app.relevance_score = score
+        app.mismatch_reasons = ",".join(mismatches) if mismatches else None
+        app.summary_text = summary
+        db.commit()
+    finally:
+        db.close()
+
+
+def _can_retry(job_id: int) -> bool:
+    db = SessionLocal()
+    try:
+        job = db.get(models.ScoringJob, job_id)
+        return job is not None and job.attempts < settings.SCORING_MAX_ATTEMPTS
+    finally:
+        db.close()
+
+
+async def score_application(application_id: int) -> None:
+    loaded = await asyncio.to_thread(_load, application_id)
+    if loaded is None:
+        return
+    cv_text, cv_features, vacancy_dict, vacancy_id, employer_id = loaded
+    # Bound here rather than in _load: the scope is a context variable of this task.
+    llm_usage.bind(application_id, None, vacancy_id, employer_id)
+
+    llm = await analyze_cv_async(cv_text, vacancy_dict, priority=llm_scheduler.APPLICATION)
+    if llm is not None:
+        score, mismatches, summary = score_from_llm_result(llm, vacancy_dict)
+    else:
+        score, mismatches, summary = VacancyMatcher(vacancy_dict).score_features(cv_features)
+    await asyncio.to_thread(_store, application_id, score, mismatches, summary)
+
+
+async def _run_job(job_id: int) -> None:
+    application_id = await asyncio.to_thread(_claim, job_id)
+    if application_id is None:
+        return
+    try:
+        await score_application(application_id)
+    except Exception as e:
+        logger.exception("Scoring job %s for application %s failed", job_id, application_id)
+        retry = await asyncio.to_thread(_can_retry, job_id)
+        await asyncio.to_thread(_finish, job_id, QUEUED if retry else FAILED, str(e)[:1000])
+        if retry:
+            await _get_queue().push(job_id)
+        return
+    await asyncio.to_thread(_finish, job_id, DONE)
+
+
+async def _worker(n: int) -> None:
+    queue = _get_queue()
+    while True:
+        try:
+            job_id = await queue.pop()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Scoring worker %d could not read the queue: %s", n, e)
+            await asyncio.sleep(1)
+            continue
+        await _run_job(job_id)
+
+
+def _pending_job_ids() -> list[int]:
+    db = SessionLocal()
+    try:
+        running = db.query(models.ScoringJob).filter(models.ScoringJob.status == RUNNING)
+        if isinstance(_get_queue(), _RedisQueue):
+            # Other processes may still be working on recent jobs.
+            running = running.filter(models.ScoringJob.started_at < datetime.utcnow() - _STALE_AFTER)
+        running.update({models.ScoringJob.status: QUEUED}, synchronize_session=False)
+        db.commit()
+        rows = db.query(models.ScoringJob.id).filter(models.ScoringJob.status == QUEUED).order_by(models.ScoringJob.id).all()
+        return [r[0] for r in rows]
+    finally:
+        db.close()
+
+
+async def start_workers() -> None:
+    if _WORKERS:
+        return
+    queue = _get_queue()
+    # The table is the source of truth: re-dispatch whatever was queued when
+    # the previous process stopped. Duplicate ids are harmless, see _claim.
+    for job_id in await asyncio.to_thread(_pending_job_ids):
+        await queue.push(job_id)
+    for n in range(max(1, settings.SCORING_WORKERS)):
+        _WORKERS.append(asyncio.create_task(_worker(n)))
+    logger.info("Started %d scoring worker(s) on the %s queue", len(_WORKERS), type(queue).__name__)
+
+
+async def stop_workers() -> None:
+    global _QUEUE
+    for task in _WORKERS:
+        task.cancel()
+    await asyncio.gather(*_WORKERS, return_exceptions=True)
+    _WORKERS.clear()
+    if _QUEUE is not None:
+        await _QUEUE.close()
+        _QUEUE = None
+
+
+def stats(db: Session) -> dict:
+    counts = dict(db.query(models.ScoringJob.status, func.count()).group_by(models.ScoringJob.status).all())
+    return {
+        "backend": type(_get_queue()).__name__,
+        "workers": len(_WORKERS),
+        "queue_depth": _get_queue().depth(),
+        "jobs": {s: counts.get(s, 0) for s in (QUEUED, RUNNING, DONE, FAILED)},
+    }
@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import Any, Optional
+import logging
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.services.stemmer import stem, stem_text
+
+
+logger = logging.getLogger(__name__)
+
+# Full-text search over Application.cv_text and User.cv_text.
+#  - SQLite: an FTS5 table `cv_search` holding Snowball-stemmed copies of the
+#    texts (FTS5 has no Russian stemmer), written by the index_* helpers when
+#    a CV is uploaded or an application created; queries are stemmed the same
+#    way and ranked with bm25().
+#  - Postgres: generated `cv_tsv` tsvector columns ('russian' configuration)
+#    with GIN indexes, so the database keeps them in sync by itself; queries
+#    go through websearch_to_tsquery and are ranked with ts_rank_cd().
+
+APPLICATION = "application"
+USER = "user"
+
+_EXCERPT_CHARS = 160
+
+
+def _dialect(bind) -> str:
+    return bind.dialect.name
+
+
+def ensure_index(engine) -> None:
+    dialect = _dialect(engine)
+    if dialect == "postgresql":
+        with engine.begin() as conn:
+            for table in ("applications", "users"):
+                conn.execute(text(
+                    f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS cv_tsv tsvector "
+                    "GENERATED ALWAYS AS (to_tsvector('russian', coalesce(cv_text, ''))) STORED"
+                ))
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_cv_tsv ON {table} USING GIN (cv_tsv)"))
+    elif dialect == "sqlite":
+        with engine.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cv_search'")).first()
+            if exists:
+                return
+            conn.execute(text("CREATE VIRTUAL TABLE cv_search USING fts5(kind UNINDEXED, ref_id UNINDEXED, body)"))
+            # First start with the index: backfill existing rows.
+            for kind, table in ((APPLICATION, "applications"), (USER, "users")):
+                rows = conn.execute(text(f"SELECT id, cv_text FROM {table} WHERE cv_text IS NOT NULL")).all()
+                for ref_id, cv_text in rows:
+                    _insert(conn, kind, ref_id, cv_text)
+            logger.info("Created the cv_search full-text index")
+    else:
+        logger.warning("Full-text CV search is not available for the %s dialect", dialect)
+
+
+def _insert(conn, kind: str, ref_id: int, cv_text: Optional[str]) -> None:
+    conn.execute(text("DELETE FROM cv_search WHERE kind = :kind AND ref_id = :ref_id"), {"kind": kind, "ref_id": ref_id})
+    if cv_text:
+        conn.execute(
+            text("INSERT INTO cv_search (kind, ref_id, body) VALUES (:kind, :ref_id, :body)"),
+            {"kind": kind, "ref_id": ref_id, "body": " ".join(stem_text(cv_text))},
+        )
+
+
+def _sync(db: Session, kind: str, ref_id: int, cv_text: Optional[str]) -> None:
+    if _dialect(db.get_bind()) != "sqlite":
+        return
+    _insert(db, kind, ref_id, cv_text)
+    db.commit()
+
+
+def index_application(db: Session, app: models.Application) -> None:
+    _sync(db, APPLICATION, app.id, app.cv_text)
+
+
+def index_user(db: Session, user: models.User) -> None:
+    _sync(db, USER, user.id, user.cv_text)
+
+
+def remove_applications(db: Session, application_ids: list[int]) -> None:
+    # Called before the deleting commit; SQLite reuses row ids.
+    if _dialect(db.get_bind()) != "sqlite" or not application_ids:
+        return
+    for ref_id in application_ids:
+        db.execute(text("DELETE FROM cv_search WHERE kind = :kind AND ref_id = :ref_id"), {"kind": APPLICATION, "ref_id": ref_id})
+
+
+def _fts_query(q: str) -> Optional[str]:
+    terms = list(dict.fromkeys(stem_text(q)))
+    if not terms:
+        return None
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _excerpt(cv_text: Optional[str], q: str) -> str:
+    # Window of the original text around the first token matching a query stem.
+    cv_text = cv_text or ""
+    stems = set(stem_text(q))
+    for m in re.finditer(r"\w+", cv_text):
+        if stem(m.group(0)) in stems:
+            start = max(0, m.start() - _EXCERPT_CHARS // 2)
+            return ("…" if start else "") + cv_text[start:start + _EXCERPT_CHARS].strip() + "…"
+    return cv_text[:_EXCERPT_CHARS]
+
+
+def _page(total: int, page: int, page_size: int, items: list[dict[str, Any]]) -> dict[str, Any]:
+    return {"total": total, "page": page, "page_size": page_size, "items": items}
+
+
+def search_applications(db: Session, q: str, employer_id: Optional[int], page: int = 1, page_size: int = 20) -> dict[str, Any]:
+    # employer_id=None searches applications to every vacancy (admins).
+    params: dict[str, Any] = {"employer_id": employer_id, "limit": page_size, "offset": (page - 1) * page_size}
+    scope = "v.created_by = :employer_id" if employer_id is not None else "1 = 1"
+    if _dialect(db.get_bind()) == "postgresql":
+        params["q"] = q
+        sql = f"""
+            SELECT a.id, ts_rank_cd(a.cv_tsv, query) AS rank, count(*) OVER () AS total
+            FROM applications a JOIN vacancies v ON v.id = a.vacancy_id,
+                 websearch_to_tsquery('russian', :q) query
+            WHERE a.cv_tsv @@ query AND {scope}
+            ORDER BY rank DESC, a.id DESC LIMIT :limit OFFSET :offset
+        """
+    else:
+        params["q"] = _fts_query(q)
+        if params["q"] is None:
+            return _page(0, page, page_size, [])
+        sql = f"""
+            WITH m AS MATERIALIZED (
+                SELECT ref_id, -bm25(cv_search) AS rank FROM cv_search WHERE cv_search MATCH :q AND kind = '{APPLICATION}'
+            )
+            SELECT a.id, m.rank, count(*) OVER () AS total
+            FROM m JOIN applications a ON a.id = m.ref_id JOIN vacancies v ON v.id = a.vacancy_id
+            WHERE {scope}
+            ORDER BY m.rank DESC, a.id DESC LIMIT :limit OFFSET :offset
+        """
+    rows = db.execute(text(sql), params).all()
+    if not rows:
+        return _page(0, page, page_size, [])
+    ranks = {app_id: rank for app_id, rank, _ in rows}
+    found = {
+        app.id: (app, vac)
+        for app, vac in db.query(models.Application, models.Vacancy)
+        .join(models.Vacancy, models.Application.vacancy_id == models.Vacancy.id)
+        .filter(models.Application.id.in_(ranks))
+    }
+    items = []
+    for app_id, rank, _ in rows:
+        app, vac = found[app_id]
+        items.append({
+            "id": app.id,
+            "vacancy_id": vac.id,
+            "vacancyTitle": vac.title,
+            "candidate": app.candidate_name,
+            "score": app.relevance_score,
+            "rank": round(float(rank), 4),
+            "excerpt": _excerpt(app.cv_text, q),
+        })
+    return _page(int(rows[0][2]), page, page_size, items)
+
+
+def search_candidates(db: Session, q: str, page: int = 1, page_size: int = 20) -> dict[str, Any]:
+    params: dict[str, Any] = {"limit": page_size, "offset": (page - 1) * page_size}
+    if _dialect(db.get_bind()) == "postgresql":
+        params["q"] = q
+        sql = """
+            SELECT u.id, ts_rank_cd(u.cv_tsv, query) AS rank, count(*) OVER () AS total
+            FROM users u, websearch_to_tsquery('russian', :q) query
+            WHERE u.cv_tsv @@ query
+            ORDER BY rank DESC, u.id DESC LIMIT :limit OFFSET :offset
+        """
+    else:
+        params["q"] = _fts_query(q)
+        if params["q"] is None:
+            return _page(0, page, page_size, [])
+        sql = f"""
+            WITH m AS MATERIALIZED (
+                SELECT ref_id, -bm25(cv_search) AS rank FROM cv_search WHERE cv_search MATCH :q AND kind = '{USER}'
+            )
+            SELECT u.id, m.rank, count(*) OVER () AS total
+            FROM m JOIN users u ON u.id = m.ref_id
+            ORDER BY m.rank DESC, u.id DESC LIMIT :limit OFFSET :offset
+        """
+    rows = db.execute(text(sql), params).all()
+    if not rows:
+        return _page(0, page, page_size, [])
+    users = {u.id: u for u in db.query(models.User).filter(models.User.id.in_([r[0] for r in rows]))}
+    items = [
+        {
+            "id": user_id,
+            "email": users[user_id].email,
+            "rank": round(float(rank), 4),
+            "excerpt": _excerpt(users[user_id].cv_text, q),
+        }
+        for user_id, rank, _ in rows
+    ]
+    return _page(int(rows[0][2]), page, page_size, items)
@@ -0,0 +1,398 @@
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Union
+from urllib.parse import quote
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+
+import aiofiles
+import aiofiles.os
+
+from app.core.config import settings
+
+
+# Where uploads live. A stored file is identified by its location string,
+# which is what the database keeps in cv_file_path: a filesystem path under
+# UPLOAD_DIR for local storage, "s3://<bucket>/<key>" for S3. New files go to
+# the STORAGE_PROVIDER backend; existing ones are read from whichever backend
+# their location names, so switching providers does not orphan old uploads.
+#
+# The S3 client is created once per process and shared (boto3 clients are
+# thread-safe); its connection pool, timeouts and retries come from the S3_*
+# settings, and S3_ENDPOINT_URL points it at MinIO / a local fake S3 server.
+# Blocking calls have async wrappers at the bottom that run them in a thread.
+#
+# Keys are random and sharded (ab/cd/<uuid hex><ext>, see new_key), so a
+# write never has to probe for a free name and concurrent uploads cannot
+# collide; the original filename is kept in the database (cv_file_name) and,
+# on S3, in the object's metadata.
+#
+# Uploads are written through writer(): chunks go to a temp file with
+# aiofiles (renamed into place on commit) or, for S3, into a multipart
+# upload once more than S3_MULTIPART_PART_MB has arrived, so an upload never
+# sits in memory as a whole.
+
+CHUNK_SIZE = 1024 * 1024
+Data = Union[bytes, BinaryIO]
+_SUFFIX_RE = re.compile(r"\.[a-z0-9]{1,10}$")
+FILENAME_METADATA = "original-filename"
+
+
+def new_key(filename: Optional[str] = None) -> str:
+    # The extension is kept (content type on download, easier debugging);
+    # everything else about the client's filename stays out of the key.
+    suffix = Path(filename or "").suffix.lower()
+    token = uuid.uuid4().hex
+    return f"{token[:2]}/{token[2:4]}/{token}{suffix if _SUFFIX_RE.match(suffix) else ''}"
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def location(self, key: str) -> str:
+        return str(self.root / key)
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def put(self, key: str, data: Data, content_type: Optional[str] = None) -> str:
+        dest = self.root / key
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, bytes):
+            dest.write_bytes(data)
+        else:
+            with dest.open("wb") as f:
+                shutil.copyfileobj(data, f, CHUNK_SIZE)
+        return str(dest)
+
+    def open(self, location: str) -> BinaryIO:
+        return open(location, "rb")
+
+    def read_range(self, location: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        # Bytes start..end inclusive, like an HTTP Range header.
+        with open(location, "rb") as f:
+            f.seek(start)
+            return f.read() if end is None else f.read(end - start + 1)
+
+    def iter_chunks(self, location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with open(location, "rb") as f:
+            yield from iter(lambda: f.read(chunk_size), b"")
+
+    def download_to(self, location: str, fileobj: BinaryIO) -> None:
+        with open(location, "rb") as f:
+            shutil.copyfileobj(f, fileobj, CHUNK_SIZE)
+
+    def size(self, location: str) -> int:
+        return Path(location).stat().st_size
+
+    def delete(self, location: str) -> None:
+        Path(location).unlink(missing_ok=True)
+
+    def writer(self, key: str, content_type: Optional[str] = None, filename: Optional[str] = None) -> LocalWriter:
+        return LocalWriter(self.root / key)
+
+    def public_url(self, location: str, filename: Optional[str] = None) -> str:
+        # Served by the /uploads static mount.
+        try:
+            relative = Path(location).resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            relative = Path(location).name
+        return f"/uploads/{relative}"
+
+
+class LocalWriter:
+    def __init__(self, dest: Path):
+        self.dest = dest
+        self.tmp = dest.parent / f".{uuid.uuid4().hex}.part"
+        self._file: Any = None
+
+    async def write(self, chunk: bytes) -> None:
+        if self._file is None:
+            await aiofiles.os.makedirs(self.dest.parent, exist_ok=True)
+            self._file = await aiofiles.open(self.tmp, "wb")
+        await self._file.write(chunk)
+
+    async def commit(self) -> str:
+        if self._file is None:
+            await self.write(b"")
+        await self._file.close()
+        await aiofiles.os.replace(self.tmp, self.dest)
+        return str(self.dest)
+
+    async def abort(self) -> None:
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+            await asyncio.to_thread(self.tmp.unlink, missing_ok=True)
+
+
+class S3Storage:
+    def __init__(self, bucket: str, client: Any):
+        self.bucket = bucket
+        self.client = client
+
+    def location(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    @staticmethod
+    def parse(location: str) -> tuple[str, str]:
+        bucket, _, key = location[len("s3://"):].partition("/")
+        if not bucket or not key:
+            raise ValueError(f"Invalid S3 location {location!r}: expected s3://<bucket>/<key>")
+        return bucket, key
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError  # type: ignore
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put(self, key: str, data: Data, content_type: Optional[str] = None) -> str:
+        extra = {"ContentType": content_type or "application/octet-stream"}
+        if isinstance(data, bytes):
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+        else:
+            # Switches to a multipart upload above the transfer threshold.
+            self.client.upload_fileobj(data, self.bucket, key, ExtraArgs=extra)
+        return self.location(key)
+
+    def open(self, location: str) -> BinaryIO:
+        # Streaming body: read() pulls from the socket, nothing is buffered up front.
+        bucket, key = self.parse(location)
+        return self.client.get_object(Bucket=bucket, Key=key)["Body"]
+
+    def read_range(self, location: str, start: int = 0, end: Optional[int] = None) -> bytes:
+        bucket, key = self.parse(location)
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        return self.client.get_object(Bucket=bucket, Key=key, Range=byte_range)["Body"].read()
+
+    def iter_chunks(self, location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        body = self.open(location)
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def download_to(self, location: str, fileobj: BinaryIO) -> None:
+        bucket, key = self.parse(location)
+        self.client.download_fileobj(bucket, key, fileobj)
+
+    def size(self, location: str) -> int:
+        bucket, key = self.parse(location)
+        return int(self.client.head_object(Bucket=bucket, Key=key)["ContentLength"])
+
+    def delete(self, location: str) -> None:
+        bucket, key = self.parse(location)
+        self.client.delete_object(Bucket=bucket, Key=key)
+
+    def writer(self, key: str, content_type: Optional[str] = None, filename: Optional[str] = None) -> S3Writer:
+        return S3Writer(self, key, content_type or "application/octet-stream", filename)
+
+    def public_url(self, location: str, filename: Optional[str] = None) -> str:
+        bucket, key = self.parse(location)
+        params = {"Bucket": bucket, "Key": key}
+        if filename:
+            params["ResponseContentDisposition"] = f"inline; filename*=UTF-8''{quote(filename)}"
+        return self.client.generate_presigned_url("get_object", Params=params, ExpiresIn=settings.S3_PRESIGN_SECONDS)
+
+
+class S3Writer:
+    def __init__(self, store: S3Storage, key: str, content_type: str, filename: Optional[str] = None):
+        self.store = store
+        self.key = key
+        # Metadata values must be ASCII.
+        self.extra: dict[str, Any] = {"ContentType": content_type}
+        if filename:
+            self.extra["Metadata"] = {FILENAME_METADATA: quote(filename)}
+        self.part_size = max(5, settings.S3_MULTIPART_PART_MB) * 1024 * 1024  # S3 minimum is 5 MiB
+        # The part being collected: in memory up to S3_SPOOL_MEMORY_KB, then on
+        # disk, so concurrent uploads do not each hold a part in RAM. boto3
+        # streams the request body from the file.
+        self._spool = self._new_spool()
+        self._size = 0
+        self._upload_id: Optional[str] = None
+        self._parts: list[dict[str, Any]] = []
+
+    @staticmethod
+    def _new_spool() -> tempfile.SpooledTemporaryFile:
+        return tempfile.SpooledTemporaryFile(max_size=settings.S3_SPOOL_MEMORY_KB * 1024)
+
+    async def write(self, chunk: bytes) -> None:
+        await asyncio.to_thread(self._spool.write, chunk)
+        self._size += len(chunk)
+        if self._size >= self.part_size:
+            await self._flush_part()
+
+    def _take_spool(self) -> tempfile.SpooledTemporaryFile:
+        spool, self._spool, self._size = self._spool, self._new_spool(), 0
+        spool.seek(0)
+        return spool
+
+    async def _flush_part(self) -> None:
+        client, bucket = self.store.client, self.store.bucket
+        if self._upload_id is None:
+            created = await asyncio.to_thread(client.create_multipart_upload, Bucket=bucket, Key=self.key, **self.extra)
+            self._upload_id = created["UploadId"]
+        number = len(self._parts) + 1
+        with self._take_spool() as body:
+            part = await asyncio.to_thread(
+                client.upload_part, Bucket=bucket, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=body
+            )
+        self._parts.append({"PartNumber": number, "ETag": part["ETag"]})
+
+    async def commit(self) -> str:
+        client, bucket = self.store.client, self.store.bucket
+        if self._upload_id is None:
+            # Small upload: one PUT of the spooled bytes.
+            with self._take_spool() as body:
+                await asyncio.to_thread(client.put_object, Bucket=bucket, Key=self.key, Body=body, **self.extra)
+        else:
+            if self._size:
+                await self._flush_part()
+            await asyncio.to_thread(
+                client.complete_multipart_upload,
+                Bucket=bucket, Key=self.key, UploadId=self._upload_id, MultipartUpload={"Parts": self._parts},
+            )
+        self._spool.close()
+        return self.store.location(self.key)
+
+    async def abort(self) -> None:
+        self._spool.close()
+        self._size = 0
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            await asyncio.to_thread(
+                self.store.client.abort_multipart_upload, Bucket=self.store.bucket, Key=self.key, UploadId=upload_id
+            )
+
+
+Backend = Union[LocalStorage, S3Storage]
+Writer = Union[LocalWriter, S3Writer]
+
+_LOCK = threading.Lock()
+_S3_CLIENT: Any = None
+
+
+def s3_client() -> Any:
+    global _S3_CLIENT
+    with _LOCK:
+        if _S3_CLIENT is None:
+            try:
+                import boto3  # type: ignore
+                from botocore.config import Config  # type: ignore
+            except Exception as e:
+                raise RuntimeError("boto3 is required for S3 storage but not installed") from e
+            config = Config(
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                connect_timeout=settings.S3_CONNECT_TIMEOUT_SECONDS,
+                read_timeout=settings.S3_READ_TIMEOUT_SECONDS,
+                retries={"max_attempts": settings.S3_MAX_ATTEMPTS, "mode": "standard"},
+                s3={"addressing_style": settings.S3_ADDRESSING_STYLE},
+            )
+            _S3_CLIENT = boto3.session.Session().client(
+                "s3",
+                endpoint_url=settings.S3_ENDPOINT_URL or None,
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=settings.AWS_REGION,
+                config=config,
+            )
+        return _S3_CLIENT
+
+
+def reset() -> None:
+    # Drop the cached client, e.g. after changing S3_* settings in tests.
+    global _S3_CLIENT, _LOCK
+    _LOCK = threading.Lock()
+    _S3_CLIENT = None
+
+
+# Forked PDF workers must not share the parent's pooled sockets.
+os.register_at_fork(after_in_child=reset)
+
+
+def backend() -> Backend:
+    """The backend new uploads are written to."""
+    if (settings.STORAGE_PROVIDER or "local").lower() == "s3":
+        if not settings.AWS_S3_BUCKET:
+            raise RuntimeError("AWS_S3_BUCKET is not configured")
+        return S3Storage(settings.AWS_S3_BUCKET, s3_client())
+    return LocalStorage(settings.UPLOAD_DIR)
+
+
+def for_location(location: str) -> Backend:
+    if location.startswith("s3://"):
+        bucket, _ = S3Storage.parse(location)
+        return S3Storage(bucket, s3_client())
+    return LocalStorage(settings.UPLOAD_DIR)
+
+
+def is_remote(location: str) -> bool:
+    return location.startswith("s3://")
+
+
+def read_range(location: str, start: int = 0, end: Optional[int] = None) -> bytes:
+    return for_location(location).read_range(location, start, end)
+
+
+def iter_chunks(location: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    return for_location(location).iter_chunks(location, chunk_size)
+
+
+def download_to(location: str, fileobj: BinaryIO) -> None:
+    for_location(location).download_to(location, fileobj)
+
+
+def size(location: str) -> int:
+    return for_location(location).size(location)
+
+
+def delete(location: str) -> None:
+    for_location(location).delete(location)
+
+
+def public_url(location: str, filename: Optional[str] = None) -> str:
+    """URL the browser can fetch the file from: /uploads/... or a presigned S3 link."""
+    return for_location(location).public_url(location, filename)
+
+
+async def aput(key: str, data: Data, content_type: Optional[str] = None) -> str:
+    store = backend()
+    return await asyncio.to_thread(store.put, key, data, content_type)
+
+
+async def aread_range(location: str, start: int = 0, end: Optional[int] = None) -> bytes:
+    return await asyncio.to_thread(read_range, location, start, end)
+
+
+async def asize(location: str) -> int:
+    return await asyncio.to_thread(size, location)
+
+
+async def adelete(location: str) -> None:
+    await asyncio.to_thread(delete, location)
+
+
+async def aiter_chunks(location: str, chunk_size: int = CHUNK_SIZE):
+    # Each chunk is fetched in a worker thread; the event loop only sees bytes.
+    chunks = iter_chunks(location, chunk_size)
+    sentinel = object()
+    try:
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, sentinel)
+            if chunk is sentinel:
+                return
+            yield chunk
+    finally:
+        chunks.close()
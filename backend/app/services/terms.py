@@ -0,0 +1,22 @@
+from __future__ import annotations
+from typing import Iterable
+import re
+
+
+# Normalised terms shared by the vacancy skill index and CV term sets:
+# lowercased, whitespace-collapsed words, keeping the punctuation that is part
+# of technology names (c++, c#, node.js, full-time).
+
+_TOKEN = re.compile(r"\w[\w+#.\-]*")
+
+
+def words(text: str) -> list[str]:
+    return [w for w in (t.rstrip(".-") for t in _TOKEN.findall(text.lower())) if w]
+
+
+def normalize(term: str) -> str:
+    return " ".join(words(term))
+
+
+def vacancy_terms(values: Iterable[str]) -> set[str]:
+    return {t for t in (normalize(v) for v in values if v) if t}
@@ -0,0 +1,18 @@
+from typing import Any, Optional
+from app.db import models
+
+
+def vacancy_to_dict(v: Optional[models.Vacancy]) -> dict[str, Any]:
+    return {
+        "title": v.title if v else None,
+        "city": v.city if v else None,
+        "description": v.description if v else None,
+        "min_experience_years": v.min_experience_years if v else None,
+        "employment_type": v.employment_type if v else None,
+        "education_level": v.education_level if v else None,
+        "languages": v.languages.split(",") if v and v.languages else [],
+        "salary_min": v.salary_min if v else None,
+        "salary_max": v.salary_max if v else None,
+        "currency": v.currency if v else None,
+        "skills": v.skills.split(",") if v and v.skills else [],
+    }
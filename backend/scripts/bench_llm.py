@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_PROVIDER", "mock")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+
+from app.services.llm import analyze_cv_async  # noqa: E402
+from app.services.llm_scheduler import get_scheduler  # noqa: E402
+
+
+VACANCY = {
+    "title": "Backend Engineer (FastAPI)",
+    "city": "Алматы",
+    "min_experience_years": 2,
+    "employment_type": "full-time",
+    "skills": ["Python", "FastAPI", "SQLAlchemy", "PostgreSQL"],
+    "languages": ["Русский", "English"],
+}
+CV = "Python FastAPI SQLAlchemy PostgreSQL. Опыт 3 года. Город Алматы. English B2."
+
+
+async def _one(i: int, latencies: list[float]) -> bool:
+    started = time.perf_counter()
+    out = await analyze_cv_async(f"{CV} #{i}", VACANCY)
+    latencies.append(time.perf_counter() - started)
+    return out is not None
+
+
+async def main(total: int, concurrency: int) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def _bounded(i: int) -> bool:
+        async with sem:
+            return await _one(i, latencies)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*[_bounded(i) for i in range(total)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    q = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+    print(f"requests={total} concurrency={concurrency} ok={sum(results)} elapsed={elapsed:.2f}s throughput={total / elapsed:.1f}/s")
+    print(f"latency ms: mean={statistics.mean(latencies) * 1000:.0f} p50={q(0.5):.0f} p95={q(0.95):.0f} p99={q(0.99):.0f}")
+    print(f"scheduler: {get_scheduler().metrics()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark analyze_cv_async (defaults to LLM_PROVIDER=mock)")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
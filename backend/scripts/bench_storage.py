@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from app.core.config import settings
+from app.services import fake_s3, storage
+
+
+async def main(total: int, concurrency: int, size_kb: int) -> None:
+    payload = os.urandom(size_kb * 1024)
+    sem = asyncio.Semaphore(concurrency)
+    put_latencies: list[float] = []
+    get_latencies: list[float] = []
+
+    async def _one(i: int) -> None:
+        async with sem:
+            started = time.perf_counter()
+            location = await storage.aput(f"bench/{i}.pdf", payload, "application/pdf")
+            put_latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            body = b"".join([chunk async for chunk in storage.aiter_chunks(location)])
+            get_latencies.append(time.perf_counter() - started)
+            assert len(body) == len(payload)
+            await storage.adelete(location)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_one(i) for i in range(total)])
+    elapsed = time.perf_counter() - started
+    mb = total * len(payload) / 1024 / 1024
+    print(f"backend={settings.STORAGE_PROVIDER} objects={total} size={size_kb}KiB concurrency={concurrency} elapsed={elapsed:.2f}s")
+    print(f"throughput: {total / elapsed:.1f} objects/s, {2 * mb / elapsed:.1f} MiB/s (put + get)")
+    for name, latencies in (("put", put_latencies), ("get", get_latencies)):
+        latencies.sort()
+        q = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+        print(f"{name} ms: mean={statistics.mean(latencies) * 1000:.1f} p50={q(0.5):.1f} p95={q(0.95):.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark upload storage (S3 mode against a local fake server unless S3_ENDPOINT_URL is set)")
+    parser.add_argument("--objects", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--size-kb", type=int, default=256)
+    parser.add_argument("--local", action="store_true", help="benchmark UPLOAD_DIR instead of S3")
+    args = parser.parse_args()
+    server = None
+    if args.local:
+        settings.STORAGE_PROVIDER = "local"
+    else:
+        settings.STORAGE_PROVIDER = "s3"
+        if not settings.S3_ENDPOINT_URL:
+            server = fake_s3.start()
+            settings.S3_ENDPOINT_URL = server.endpoint_url
+            settings.S3_ADDRESSING_STYLE = "path"
+            settings.AWS_S3_BUCKET = "bench"
+            settings.AWS_ACCESS_KEY_ID = settings.AWS_SECRET_ACCESS_KEY = "bench"
+            settings.AWS_REGION = settings.AWS_REGION or "us-east-1"
+    try:
+        asyncio.run(main(args.objects, args.concurrency, args.size_kb))
+    finally:
+        if server is not None:
+            server.shutdown()
@@ -0,0 +1,260 @@
+"""Recompute relevance_score / mismatch_reasons / summary_text of existing applications.
+
+    PYTHONPATH=. python scripts/rescore.py --mode heuristic --workers 4
+    PYTHONPATH=. python scripts/rescore.py --mode llm --concurrency 16
+
+Applications are streamed in id order with a server-side cursor (keyset
+pages on SQLite) and written back in chunks. Both modes score heuristically
+with the same function over the CV text and its stored matching profile
+(cv_experience_years / cv_salary); applications created before profiles
+existed get their profile backfilled. After
+every committed chunk the last id is stored in the
+checkpoint file, so an interrupted run continues where it stopped (use
+--restart to start over). Applications whose chat has finished keep the score
+the chat produced unless --include-chatted is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import exists, select, update
+
+from app.db import models
+from app.db.session import SessionLocal, engine
+from app.services import llm_metrics, llm_scheduler, llm_usage
+from app.services.llm import STAGE_SCORE, aclose_http_clients, analyze_cv_async, score_from_llm_result
+from app.services.matching import Result, VacancyMatcher, cv_profile, stored_features
+from app.services.vacancies import vacancy_to_dict
+
+Row = tuple[Any, ...]  # application id, vacancy id, then the mode's columns
+Scored = tuple[int, int, list[str], str]
+
+_A = models.Application
+# Both modes read the same columns: the substring rules need the text itself.
+COLUMNS = (_A.cv_text, _A.cv_experience_years, _A.cv_salary)
+_Profile = namedtuple("_Profile", ["cv_text", "cv_experience_years", "cv_salary"])
+
+
+def _load_checkpoint(path: str, run: dict[str, Any]) -> dict[str, Any]:
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {**run, "last_id": 0, "processed": 0}
+    if any(data.get(k) != v for k, v in run.items()):
+        raise SystemExit(f"Checkpoint {path} belongs to another run ({data}); pass --restart to discard it")
+    return data
+
+
+def _save_checkpoint(path: str, data: dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _stream_rows(after_id: int, chunk: int, vacancy_id: Optional[int], include_chatted: bool, columns: tuple[Any, ...]) -> Iterator[list[Row]]:
+    stmt = select(models.Application.id, models.Application.vacancy_id, *columns).order_by(models.Application.id)
+    if vacancy_id is not None:
+        stmt = stmt.where(models.Application.vacancy_id == vacancy_id)
+    if not include_chatted:
+        stmt = stmt.where(
+            ~exists().where(
+                models.ChatSession.application_id == models.Application.id,
+                models.ChatSession.state == "closed",
+            )
+        )
+    db = SessionLocal()
+    try:
+        if engine.dialect.name == "sqlite":
+            # No server-side cursors, and a statement left open would hold the
+            # read lock our own chunk commits need: page by id instead.
+            while True:
+                part = db.execute(stmt.where(models.Application.id > after_id).limit(chunk)).all()
+                db.rollback()
+                if not part:
+                    return
+                after_id = part[-1][0]
+                yield [tuple(row) for row in part]
+        else:
+            result = db.execute(stmt.where(models.Application.id > after_id).execution_options(yield_per=chunk))
+            for part in result.partitions():
+                yield [tuple(row) for row in part]
+    finally:
+        db.close()
+
+
+def _load_vacancies() -> dict[int, dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        return {v.id: vacancy_to_dict(v) for v in db.query(models.Vacancy).all()}
+    finally:
+        db.close()
+
+
+_VACANCIES: dict[int, dict[str, Any]] = {}
+
+
+def _init_worker(vacancies: dict[int, dict[str, Any]]) -> None:
+    # Vacancies are shipped to each worker once instead of with every chunk.
+    _VACANCIES.update(vacancies)
+
+
+def _heuristic(matcher: VacancyMatcher, app_id: int, cv: _Profile, backfill: list[dict[str, Any]]) -> Result:
+    # The one heuristic scorer of both modes; equals compute_relevance on the text.
+    if cv.cv_experience_years is None:
+        profile = cv_profile(cv.cv_text or "")
+        backfill.append({"id": app_id, **profile})
+        cv = cv._replace(cv_experience_years=profile["cv_experience_years"], cv_salary=profile["cv_salary"])
+    return matcher.score_features(stored_features(cv))
+
+
+def _score_chunk(rows: list[Row]) -> tuple[list[Scored], list[dict[str, Any]]]:
+    # Runs in a worker process; each vacancy in the chunk is compiled once.
+    # Returns the scores and the profiles computed for rows that had none.
+    vacancies = _VACANCIES
+    matchers: dict[int, VacancyMatcher] = {}
+    out: list[Scored] = []
+    backfill: list[dict[str, Any]] = []
+    for app_id, vac_id, *columns in rows:
+        matcher = matchers.get(vac_id)
+        if matcher is None:
+            matcher = matchers[vac_id] = VacancyMatcher(vacancies.get(vac_id) or vacancy_to_dict(None))
+        score, mismatches, summary = _heuristic(matcher, app_id, _Profile(*columns), backfill)
+        out.append((app_id, score, mismatches, summary))
+    return out, backfill
+
+
+def _write(results: list[Scored], backfill: Optional[list[dict[str, Any]]] = None) -> None:
+    if not results:
+        return
+    db = SessionLocal()
+    try:
+        if backfill:
+            db.execute(update(models.Application), backfill)
+        db.execute(
+            update(models.Application),
+            [
+                {
+                    "id": app_id,
+                    "relevance_score": score,
+                    "mismatch_reasons": ",".join(mismatches) if mismatches else None,
+                    "summary_text": summary,
+                }
+                for app_id, score, mismatches, summary in results
+            ],
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+class _Progress:
+    def __init__(self, checkpoint_path: str, state: dict[str, Any]) -> None:
+        self.path = checkpoint_path
+        self.state = state
+        self.started = time.perf_counter()
+        self.done = 0
+
+    def commit(self, rows: list[Row], results: list[Scored], backfill: Optional[list[dict[str, Any]]] = None) -> None:
+        _write(results, backfill)
+        self.done += len(rows)
+        self.state["last_id"] = rows[-1][0]
+        self.state["processed"] = self.state.get("processed", 0) + len(rows)
+        _save_checkpoint(self.path, self.state)
+        elapsed = time.perf_counter() - self.started
+        print(f"rescored {self.done} (total {self.state['processed']}, last id {self.state['last_id']}) {self.done / elapsed:.1f} apps/s", flush=True)
+
+    def finish(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        print(f"done: {self.done} application(s) in {elapsed:.1f}s, {rate:.1f} apps/s")
+
+
+def run_heuristic(chunks: Iterator[list[Row]], progress: _Progress, workers: int) -> None:
+    vacancies = _load_vacancies()
+    # At most 2 chunks per worker in flight, so the table is never read ahead
+    # of the pool; results are committed in id order for the checkpoint.
+    pending: deque[tuple[list[Row], Future]] = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(vacancies,)) as pool:
+        for rows in chunks:
+            pending.append((rows, pool.submit(_score_chunk, rows)))
+            if len(pending) >= workers * 2:
+                done_rows, future = pending.popleft()
+                progress.commit(done_rows, *future.result())
+        while pending:
+            done_rows, future = pending.popleft()
+            progress.commit(done_rows, *future.result())
+
+
+async def _score_llm(
+    row: Row,
+    vacancies: dict[int, dict[str, Any]],
+    employers: dict[int, Optional[int]],
+    sem: asyncio.Semaphore,
+    backfill: list[dict[str, Any]],
+) -> Scored:
+    app_id, vac_id, *columns = row
+    cv = _Profile(*columns)
+    vacancy = vacancies.get(vac_id) or vacancy_to_dict(None)
+    async with sem:
+        llm_usage.bind(app_id, None, vac_id, employers.get(vac_id))
+        llm = await analyze_cv_async(cv.cv_text or "", vacancy, priority=llm_scheduler.BATCH, stage=STAGE_SCORE)
+    if llm is not None:
+        score, mismatches, summary = score_from_llm_result(llm, vacancy)
+    else:
+        score, mismatches, summary = _heuristic(VacancyMatcher(vacancy), app_id, cv, backfill)
+    return app_id, score, mismatches, summary
+
+
+async def run_llm(chunks: Iterator[list[Row]], progress: _Progress, concurrency: int) -> None:
+    vacancies = _load_vacancies()
+    db = SessionLocal()
+    try:
+        employers = dict(db.query(models.Vacancy.id, models.Vacancy.created_by).all())
+    finally:
+        db.close()
+    sem = asyncio.Semaphore(concurrency)
+    try:
+        for rows in chunks:
+            backfill: list[dict[str, Any]] = []
+            results = await asyncio.gather(*[_score_llm(row, vacancies, employers, sem, backfill) for row in rows])
+            progress.commit(rows, list(results), backfill)
+    finally:
+        await aclose_http_clients()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recompute scores of existing applications")
+    parser.add_argument("--mode", choices=["heuristic", "llm"], default="heuristic")
+    parser.add_argument("--chunk", type=int, default=500, help="applications per fetch / commit")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="processes for --mode heuristic")
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight LLM calls for --mode llm")
+    parser.add_argument("--vacancy-id", type=int, default=None)
+    parser.add_argument("--include-chatted", action="store_true", help="also rescore applications whose chat has finished")
+    parser.add_argument("--checkpoint", default=".rescore_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    run = {"mode": args.mode, "vacancy_id": args.vacancy_id, "include_chatted": args.include_chatted}
+    state = {**run, "last_id": 0, "processed": 0} if args.restart else _load_checkpoint(args.checkpoint, run)
+    if state["last_id"]:
+        print(f"resuming after application id {state['last_id']} ({state['processed']} already rescored)")
+    chunks = _stream_rows(state["last_id"], args.chunk, args.vacancy_id, args.include_chatted, COLUMNS)
+    progress = _Progress(args.checkpoint, state)
+    if args.mode == "heuristic":
+        run_heuristic(chunks, progress, max(1, args.workers))
+    else:
+        asyncio.run(run_llm(chunks, progress, max(1, args.concurrency)))
+        llm_usage.flush()
+        llm_metrics.flush()
+    progress.finish()
+
+
+if __name__ == "__main__":
+    main()
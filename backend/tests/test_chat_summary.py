@@ -0,0 +1,43 @@
+import asyncio
+
+from app.services import chat_summary
+from app.services.llm import _format_chat_context, _gemini_prompt
+
+
+def _transcript(turns):
+    ctx = []
+    for i in range(turns):
+        ctx.append({"role": "bot", "content": f"Вопрос {i}?"})
+        ctx.append({"role": "user", "content": f"Ответ {i}"})
+    return ctx
+
+
+def test_fold_point_keeps_question_with_its_answer(monkeypatch):
+    monkeypatch.setattr(chat_summary.settings, "CHAT_RECENT_MESSAGES", 3)
+    ctx = _transcript(4)
+    assert chat_summary.fold_point(ctx[:3], 0) == 0
+    point = chat_summary.fold_point(ctx, 0)
+    assert ctx[point]["role"] == "bot"
+    assert len(ctx) - point <= 4
+
+
+def test_prompt_stays_flat_as_chat_grows(monkeypatch):
+    monkeypatch.setattr(chat_summary.settings, "CHAT_RECENT_MESSAGES", 4)
+
+    async def no_llm(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(chat_summary, "summarize_chat_async", no_llm)
+    vacancy = {"title": "Data Analyst", "skills": ["SQL"]}
+    state, summarized = chat_summary.empty(), 0
+    sizes = []
+    ctx = []
+    for turn in _transcript(12):
+        ctx.append(turn)
+        state, summarized = asyncio.run(chat_summary.fold(state, ctx, summarized, vacancy))
+        sizes.append(len(_gemini_prompt("SQL", vacancy, chat_summary.prompt_context(state, ctx, summarized))))
+    assert summarized > 0
+    assert "Ответ 0" in chat_summary.render(state)
+    assert "Ответ 0" not in _format_chat_context(chat_summary.prompt_context(state, ctx, summarized))
+    # Growth is bounded by CHAT_SUMMARY_MAX_ITEMS, not by the transcript length.
+    assert sizes[-1] < sizes[7] * 2
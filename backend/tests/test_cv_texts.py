@@ -0,0 +1,53 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import cv_texts
+
+
+def test_same_bytes_are_extracted_once(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cv.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    calls = []
+
+    async def fake_extract(path):
+        calls.append(path)
+        return "SQL Python"
+
+    monkeypatch.setattr(cv_texts.pdf_pool, "extract_text", fake_extract)
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF same bytes")
+    second.write_bytes(b"%PDF same bytes")
+
+    texts = [asyncio.run(cv_texts.extract_text(db, str(p))) for p in (first, second, first)]
+    assert texts == ["SQL Python"] * 3
+    assert calls == [str(first)]
+    stats = cv_texts.stats(db)
+    assert stats["documents"] == 1 and stats["hits"] == 2
+    assert stats["hit_ratio"] == round(2 / 3, 4)
+
+
+def test_text_extracted_under_other_limits_is_extracted_again(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cv.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    calls = []
+
+    async def fake_extract(path):
+        calls.append(cv_texts.settings.PDF_MAX_CHARS)
+        return "SQL Python"[: cv_texts.settings.PDF_MAX_CHARS]
+
+    monkeypatch.setattr(cv_texts.pdf_pool, "extract_text", fake_extract)
+    monkeypatch.setattr(cv_texts.settings, "PDF_MAX_CHARS", 3)
+    cv = tmp_path / "a.pdf"
+    cv.write_bytes(b"%PDF bytes")
+
+    assert asyncio.run(cv_texts.extract_text(db, str(cv))) == "SQL"
+    monkeypatch.setattr(cv_texts.settings, "PDF_MAX_CHARS", 50000)
+    assert asyncio.run(cv_texts.extract_text(db, str(cv))) == "SQL Python"
+    assert asyncio.run(cv_texts.extract_text(db, str(cv))) == "SQL Python"
+    assert calls == [3, 50000]
+    assert cv_texts.stats(db)["documents"] == 1
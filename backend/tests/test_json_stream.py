@@ -0,0 +1,24 @@
+import json
+
+from app.services.json_stream import JsonFieldStreamer
+
+
+def _stream(text: str, size: int) -> str:
+    streamer = JsonFieldStreamer("question")
+    return "".join(streamer.feed(text[i : i + size]) for i in range(0, len(text), size))
+
+
+def test_extracts_question_across_arbitrary_chunk_boundaries():
+    payload = {
+        "candidate_profile": {"city": "Алматы", "question": "nested"},
+        "mismatches": ["опыт", 'город "центр"'],
+        "question": 'Вы готовы к переезду?\nЭто "важно" \\ 😀',
+        "score": 55,
+    }
+    raw = "```json\n" + json.dumps(payload, ensure_ascii=True) + "\n```"
+    for size in (1, 2, 3, 7, 64):
+        assert _stream(raw, size) == payload["question"]
+
+
+def test_null_question_yields_nothing():
+    assert _stream('{"question": null, "summary": "ok"}', 4) == ""
@@ -0,0 +1,87 @@
+import asyncio
+import re
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.routers import vacancies as vacancies_router
+from app.schemas.vacancy import VacancyFitRequest
+from app.services import llm
+from app.services.cv import compute_relevance
+from app.services.matching import cv_profile
+from app.services.prompt import estimate_tokens
+from app.services.vacancies import vacancy_to_dict
+
+
+def _vacancy(i, description="-"):
+    return {"title": f"Vacancy-{i}", "city": "Астана", "description": description, "skills": ["SQL"]}
+
+
+def test_batches_split_by_count_and_by_token_budget(monkeypatch):
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_MAX_SIZE", 3)
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_BUDGET_TOKENS", 100_000)
+    batches = llm._split_batches([_vacancy(i) for i in range(7)])
+    assert [[idx for idx, _ in b] for b in batches] == [[0, 1, 2], [3, 4, 5], [6]]
+
+    long = "Требования: " + "опыт работы с базами данных " * 40
+    vacancies = [_vacancy(0), _vacancy(1, long), _vacancy(2, long), _vacancy(3), _vacancy(4, long * 10)]
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_MAX_SIZE", 10)
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_REQUIREMENTS_TOKENS", 400)
+    cost = [min(estimate_tokens(llm._requirements_text(v)), 400) for v in vacancies]
+    budget = cost[0] + cost[1] + cost[2] - 1
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_BUDGET_TOKENS", budget)
+    batches = llm._split_batches(vacancies)
+    assert [[idx for idx, _ in b] for b in batches] == [[0, 1], [2, 3], [4]]
+    # An oversized vacancy is clipped to LLM_BATCH_REQUIREMENTS_TOKENS and still gets a batch.
+    assert cost[4] == 400
+
+
+def test_batch_results_are_remapped_to_request_indices(monkeypatch):
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_MAX_SIZE", 3)
+    monkeypatch.setattr(llm.settings, "LLM_BATCH_BUDGET_TOKENS", 100_000)
+    monkeypatch.setattr(llm.settings, "LLM_CACHE_ENABLED", False)
+    prompts = []
+
+    async def complete(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        # Local index N in the prompt holds "Vacancy-<global index>".
+        pairs = re.findall(r"ВАКАНСИЯ #(\d+):\nПозиция: Vacancy-(\d+)", prompt)
+        if any(g == "4" for _, g in pairs):
+            return None  # the whole batch fails
+        results = [{"index": int(n), "score": int(g) * 10} for n, g in pairs if g != "1"]  # the model omits one
+        results += [{"index": 99, "score": 1}, {"index": "x"}, "garbage"]
+        return {"results": results}
+
+    monkeypatch.setattr(llm, "_complete_json_with_deadline", complete)
+    results = asyncio.run(llm.analyze_cv_batch_async("SQL", [_vacancy(i) for i in range(7)]))
+    assert len(prompts) == 3
+    assert all("ВАКАНСИЯ #0:" in p and "ВАКАНСИЯ #3:" not in p for p in prompts)
+    assert [r and r["score"] for r in results] == [0, None, 20, None, None, None, 60]
+
+
+def test_fit_falls_back_to_heuristics_for_missing_results(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fit.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rows = [
+        models.Vacancy(title=f"Vacancy-{i}", city="Астана", description="-", employment_type="full-time", skills=skills)
+        for i, skills in enumerate(["SQL,Python", "Java", "Excel"])
+    ]
+    db.add_all(rows)
+    db.commit()
+    cv = "SQL, Python, Excel. Астана, full-time, опыт 2 года"
+    user = models.User(email="u@example.com", password_hash="-", role="candidate", cv_text=cv, **cv_profile(cv))
+
+    async def batch(cv_text, dicts, *args, **kwargs):
+        return [{"score": 91, "mismatches": [], "summary": "ok"}, None, None]
+
+    monkeypatch.setattr(vacancies_router, "analyze_cv_batch_async", batch)
+    ids = [rows[0].id, rows[1].id, rows[2].id, rows[0].id, 12345]
+    out = asyncio.run(vacancies_router.fit_vacancies(VacancyFitRequest(vacancy_ids=ids), db, user))
+    assert [(item.vacancy_id, item.source) for item in out] == [(rows[0].id, "llm"), (rows[1].id, "heuristic"), (rows[2].id, "heuristic")]
+    assert out[0].score == 91
+    for item, row in zip(out[1:], rows[1:]):
+        score, mismatches, summary = compute_relevance(cv, vacancy_to_dict(row))
+        assert (item.score, item.mismatches, item.summary) == (score, mismatches, summary)
+    db.close()
@@ -0,0 +1,73 @@
+import asyncio
+
+from app.services import llm, llm_cache, llm_health
+
+
+def test_make_key_normalizes_whitespace():
+    vac = {"title": "Data Analyst", "skills": ["SQL"]}
+    a = llm_cache.make_key("SQL  Python\n", vac, None, "gemini", "", "v1")
+    b = llm_cache.make_key(" SQL Python", vac, [], "gemini", "", "v1")
+    c = llm_cache.make_key("SQL Python", vac, None, "gemini", "", "v2")
+    assert a == b
+    assert a != c
+
+
+def test_lru_evicts_oldest():
+    cache = llm_cache.LRUCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_concurrent_identical_calls_share_one_upstream_request():
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"score": 70}
+
+    async def run():
+        llm_cache.clear()
+        key = llm_cache.make_key("cv", {"title": "x"}, None, "test", "", "coalesce")
+        return await asyncio.gather(*[llm_cache.get_or_compute(key, compute) for _ in range(5)])
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(r == {"score": 70} for r in results)
+
+
+def test_concurrent_identical_streams_share_one_upstream_stream(monkeypatch):
+    calls = 0
+
+    async def stream():
+        nonlocal calls
+        calls += 1
+        for chunk in ('{"question": "Ваш ', 'опыт с SQL?", "score": 60}'):
+            await asyncio.sleep(0.02)
+            yield chunk
+
+    monkeypatch.setattr(llm, "_stream_sources", lambda *a, **k: [("gemini:test", "prompt", stream)])
+    monkeypatch.setattr(llm, "_budget_exhausted", lambda: False)
+    monkeypatch.setattr(llm.settings, "LLM_STREAMING", True)
+    llm_health.reset()
+
+    async def consume():
+        events = [e async for e in llm.analyze_cv_stream("cv", {"title": "stream"}, [{"role": "user", "content": "hi"}])]
+        text = "".join(v for kind, v in events if kind == "delta")
+        return text, events[-1]
+
+    async def run():
+        llm_cache.clear()
+        return await asyncio.gather(*[consume() for _ in range(3)])
+
+    results = asyncio.run(run())
+    assert calls == 1
+    for text, last in results:
+        assert text == "Ваш опыт с SQL?"
+        assert last == ("result", {"question": "Ваш опыт с SQL?", "score": 60})
+    assert llm_cache.stats()["inflight"] == 0
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services import llm, llm_health
+
+
+def test_breaker_opens_after_consecutive_failures_and_orders_last():
+    llm_health.reset()
+    for _ in range(3):
+        assert llm_health.get("gemini:a").allow()
+        llm_health.get("gemini:a").record_failure(0.1, "boom")
+    assert llm_health.get("gemini:a").state == llm_health.OPEN
+    assert not llm_health.get("gemini:a").allow()
+    llm_health.get("gemini:b").record_success(2.0)
+    llm_health.get("gemini:c").record_success(0.5)
+    assert llm_health.ordered(["a", "b", "c", "d"], prefix="gemini:") == ["c", "b", "d", "a"]
+
+
+def test_fatal_error_opens_immediately():
+    llm_health.reset()
+
+    class NotFound(Exception):
+        pass
+
+    health = llm_health.get("gemini:old")
+    health.record_failure(0.1, NotFound("model deprecated"), fatal=llm_health.is_fatal(NotFound()))
+    assert health.state == llm_health.OPEN
+
+
+def _half_open(name, monkeypatch):
+    monkeypatch.setattr(llm_health.settings, "LLM_BREAKER_COOLDOWN_SECONDS", 0)
+    llm_health.reset()
+    health = llm_health.get(name)
+    health.record_failure(0.1, "boom", fatal=True)
+    assert health.state == llm_health.OPEN
+    return health
+
+
+def test_cancelled_probe_releases_the_half_open_breaker(monkeypatch):
+    health = _half_open("gemini:probe", monkeypatch)
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def run():
+        call = llm._run_with_retries_async("gemini:probe", slow, llm._sanitize_and_parse_json)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(call, 0.05)
+
+    asyncio.run(run())
+    assert health.state == llm_health.HALF_OPEN
+    assert health.allow()
+
+
+def test_abandoned_stream_probe_releases_the_half_open_breaker(monkeypatch):
+    health = _half_open("gemini:stream", monkeypatch)
+
+    async def stream():
+        yield '{"question": "Расскажите'
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(llm, "_stream_sources", lambda *a, **k: [("gemini:stream", "prompt", stream)])
+    monkeypatch.setattr(llm, "_budget_exhausted", lambda: False)
+    monkeypatch.setattr(llm.settings, "LLM_STREAMING", True)
+
+    async def run():
+        llm.llm_cache.clear()
+        events = llm.analyze_cv_stream("cv", {"title": "probe"})
+        assert (await events.__anext__())[0] == "delta"
+        await events.aclose()
+
+    asyncio.run(run())
+    assert health.allow()
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from app.services import llm, llm_health, llm_metrics
+
+
+def test_secondary_fires_after_the_delay_and_first_valid_result_wins():
+    started = {}
+    cancelled = []
+
+    async def primary():
+        started["primary"] = time.monotonic()
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("primary")
+            raise
+        return {"from": "primary"}
+
+    async def secondary():
+        started["secondary"] = time.monotonic()
+        await asyncio.sleep(0.01)
+        return {"from": "secondary"}
+
+    async def run():
+        out = await llm._hedged(primary, secondary, 0.1)
+        await asyncio.sleep(0)  # let the cancellation reach the loser
+        return out
+
+    assert asyncio.run(run()) == {"from": "secondary"}
+    assert started["secondary"] - started["primary"] >= 0.09
+    assert cancelled == ["primary"]
+
+
+def test_empty_result_from_the_faster_call_does_not_win():
+    async def primary():
+        await asyncio.sleep(0.1)
+        return {"from": "primary"}
+
+    async def secondary():
+        return None
+
+    assert asyncio.run(llm._hedged(primary, secondary, 0.01)) == {"from": "primary"}
+
+
+def test_fast_primary_failure_falls_through_to_secondary():
+    calls = []
+
+    async def primary():
+        calls.append("primary")
+        return None
+
+    async def secondary():
+        calls.append("secondary")
+        return {"from": "secondary"}
+
+    started = time.monotonic()
+    assert asyncio.run(llm._hedged(primary, secondary, 5)) == {"from": "secondary"}
+    assert time.monotonic() - started < 1
+    assert calls == ["primary", "secondary"]
+
+
+def test_hedge_delay_follows_observed_latency(monkeypatch):
+    llm_health.reset()
+    monkeypatch.setattr(llm.settings, "LLM_HEDGE_DEFAULT_DELAY_SECONDS", 4.0)
+    monkeypatch.setattr(llm.settings, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.5)
+    monkeypatch.setattr(llm.settings, "LLM_HEDGE_PERCENTILE", 0.9)
+    assert llm._hedge_delay("openrouter") == 4.0
+    health = llm_health.get(f"openrouter:{llm._openrouter_model(llm.STAGE_SCORE)}")
+    for latency in (0.1, 0.2, 0.3):
+        health.record_success(latency)
+    assert llm._hedge_delay("openrouter") == 0.5
+    for latency in (2.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0, 3.0):
+        health.record_success(latency)
+    assert llm._hedge_delay("openrouter") == 3.0
+
+
+def test_deadline_returns_none_so_callers_use_heuristics(monkeypatch):
+    llm_metrics.reset()
+
+    async def slow(*args, **kwargs):
+        await asyncio.sleep(10)
+        return {"score": 90}
+
+    monkeypatch.setattr(llm, "_complete_json_async", slow)
+    monkeypatch.setattr(llm, "_budget_exhausted", lambda: False)
+    monkeypatch.setattr(llm.settings, "LLM_DEADLINE_SECONDS", 0.05)
+
+    started = time.monotonic()
+    assert asyncio.run(llm._complete_json_with_deadline("g", "o")) is None
+    assert time.monotonic() - started < 1
+    kinds = {item["labels"]["kind"]: item["value"] for item in llm_metrics.snapshot()["counters"]["llm_fallbacks_total"]}
+    assert kinds == {"deadline": 1, "heuristic": 1}
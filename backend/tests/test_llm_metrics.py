@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import llm, llm_health, llm_metrics, llm_usage
+
+
+def _counter(name, **labels):
+    for item in llm_metrics.snapshot()["counters"].get(name, []):
+        if all(item["labels"].get(k) == v for k, v in labels.items()):
+            return item["value"]
+    return 0
+
+
+def test_call_outcomes_and_parse_failures_are_counted():
+    llm_metrics.reset()
+    llm_health.reset()
+
+    async def call():
+        return '```json\n{"score": 80}\n```'
+
+    async def broken():
+        return "not json"
+
+    async def run():
+        ok = await llm._run_with_retries_async("gemini:test", call, llm._sanitize_and_parse_json, prompt="ТРЕБОВАНИЯ")
+        bad = await llm._run_with_retries_async("gemini:test", broken, llm._sanitize_and_parse_json, prompt="ТРЕБОВАНИЯ")
+        return ok, bad
+
+    ok, bad = asyncio.run(run())
+    assert ok == {"score": 80} and bad is None
+    assert _counter("llm_calls_total", model="test", outcome="ok") == 1
+    assert _counter("llm_calls_total", model="test", outcome="invalid_json") == 1
+    assert _counter("llm_json_parse_failures_total", provider="gemini", model="test") == 1
+    latency = llm_metrics.snapshot()["histograms"]["llm_upstream_latency_seconds"][0]
+    assert latency["count"] == 2
+    text = llm_metrics.render_prometheus()
+    assert 'llm_calls_total{model="test",outcome="ok",provider="gemini"} 1' in text
+    assert 'llm_prompt_tokens_bucket{model="test",provider="gemini",le="+Inf"} 2' in text
+
+
+def test_call_logs_are_written_in_batches_off_the_caller(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'calls.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    writers = []
+
+    def session():
+        writers.append(threading.current_thread().name)
+        return Session()
+
+    monkeypatch.setattr(llm_metrics, "SessionLocal", session)
+    monkeypatch.setattr(llm_metrics.settings, "LLM_CALL_LOG_ENABLED", True)
+
+    async def run():
+        llm_usage.bind(application_id=5)
+        for _ in range(3):
+            llm_metrics.finish_call(llm_metrics.start_call("gemini:test", 1, 10, 3), "error", "boom")
+
+    asyncio.run(run())
+    assert llm_metrics.flush()
+    assert writers and set(writers) == {"llm-call-log-writer"}
+    db = Session()
+    assert [r.outcome for r in db.query(models.LLMCallLog).filter_by(application_id=5)] == ["error"] * 3
+    db.close()
+
+
+def test_blocking_retries_refuse_to_run_on_the_event_loop():
+    llm_health.reset()
+
+    def call():
+        return '{"score": 55}'
+
+    def blocking():
+        return llm._run_with_retries("gemini:test", call, llm._sanitize_and_parse_json)
+
+    async def on_loop():
+        return blocking()
+
+    async def offloaded():
+        return await asyncio.to_thread(blocking)
+
+    with pytest.raises(RuntimeError, match="event loop"):
+        asyncio.run(on_loop())
+    assert asyncio.run(offloaded()) == {"score": 55}
@@ -0,0 +1,105 @@
+import asyncio
+
+from app.services import llm_scheduler
+
+
+def test_waiters_are_admitted_by_priority_then_fifo():
+    scheduler = llm_scheduler.LLMScheduler(1, {})
+    order = []
+
+    async def job(name, priority, release=None):
+        async with scheduler.slot(priority):
+            order.append(name)
+            if release is not None:
+                await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        first = asyncio.create_task(job("first", llm_scheduler.BATCH, release))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(job("batch", llm_scheduler.BATCH)),
+            asyncio.create_task(job("application", llm_scheduler.APPLICATION)),
+            asyncio.create_task(job("chat-1", llm_scheduler.INTERACTIVE)),
+            asyncio.create_task(job("chat-2", llm_scheduler.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.metrics()["queue_depth"] == {"interactive": 2, "application": 1, "batch": 1}
+        release.set()
+        await asyncio.gather(first, *tasks)
+
+    asyncio.run(run())
+    assert order == ["first", "chat-1", "chat-2", "application", "batch"]
+    assert scheduler.metrics()["running"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    scheduler = llm_scheduler.LLMScheduler(1, {})
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.slot().__aenter__())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        await holder
+        async with scheduler.slot():
+            pass
+
+    asyncio.run(asyncio.wait_for(run(), 2))
+    assert scheduler.metrics()["running"] == 0
+
+
+def test_token_bucket_reports_wait_when_empty():
+    bucket = llm_scheduler.TokenBucket(rate_per_second=2, burst=1)
+    assert bucket.try_take() == 0
+    assert 0 < bucket.try_take() <= 0.5
+
+
+def test_rate_limited_waiters_take_tokens_by_priority_without_holding_slots():
+    scheduler = llm_scheduler.LLMScheduler(4, {"gemini": (20.0, 1.0)})
+    order = []
+
+    async def job(name, priority):
+        async with scheduler.slot(priority, "gemini"):
+            order.append(name)
+
+    async def run():
+        tasks = [asyncio.create_task(job(f"batch-{i}", llm_scheduler.BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        # The first batch call took the only token; the rest wait without a slot.
+        assert scheduler.metrics()["running"] == 0
+        assert scheduler.metrics()["queue_depth"]["batch"] == 2
+        tasks.append(asyncio.create_task(job("chat", llm_scheduler.INTERACTIVE)))
+        await asyncio.gather(*tasks)
+
+    asyncio.run(asyncio.wait_for(run(), 2))
+    assert order == ["batch-0", "chat", "batch-1", "batch-2"]
+    assert scheduler.metrics()["running"] == 0
+
+
+def test_exhausted_provider_does_not_block_other_providers():
+    scheduler = llm_scheduler.LLMScheduler(2, {"gemini": (0.5, 1.0)})
+    order = []
+
+    async def job(name, priority, provider):
+        async with scheduler.slot(priority, provider):
+            order.append(name)
+
+    async def run():
+        await job("gemini-1", llm_scheduler.INTERACTIVE, "gemini")
+        waiting = asyncio.create_task(job("gemini-2", llm_scheduler.INTERACTIVE, "gemini"))
+        await asyncio.sleep(0)
+        await job("openrouter", llm_scheduler.BATCH, "openrouter")
+        waiting.cancel()
+
+    asyncio.run(asyncio.wait_for(run(), 2))
+    assert order == ["gemini-1", "openrouter"]
+    assert scheduler.metrics()["running"] == 0
@@ -0,0 +1,29 @@
+from app.services import llm, llm_health
+
+
+def test_stage_routes_model_and_generation_params(monkeypatch):
+    llm_health.reset()
+    monkeypatch.setattr(llm.settings, "LLM_MODEL", None)
+    monkeypatch.setattr(llm.settings, "LLM_QUESTION_MODEL", "google/gemini-1.5-flash")
+    monkeypatch.setattr(llm.settings, "LLM_QUESTION_TEMPERATURE", 0.2)
+    monkeypatch.setattr(llm.settings, "LLM_QUESTION_MAX_TOKENS", 300)
+    monkeypatch.setattr(llm.settings, "LLM_FINAL_MODEL", "google/gemini-1.5-pro")
+
+    _, _, payload = llm._openrouter_request("prompt", llm.STAGE_QUESTION)
+    assert payload["model"] == "google/gemini-1.5-flash"
+    assert payload["temperature"] == 0.2 and payload["max_tokens"] == 300
+    _, _, payload = llm._openrouter_request("prompt", llm.STAGE_FINAL)
+    assert payload["model"] == "google/gemini-1.5-pro"
+    assert "temperature" not in payload and "max_tokens" not in payload
+
+    assert llm._gemini_models(llm.STAGE_QUESTION)[0] == "gemini-1.5-flash"
+    assert llm._gemini_models(llm.STAGE_FINAL)[0] == "gemini-1.5-pro"
+    assert llm._gemini_models(llm.STAGE_SCORE) == llm._gemini_models()
+
+
+def test_cache_is_shared_only_between_identically_configured_stages(monkeypatch):
+    monkeypatch.setattr(llm.settings, "LLM_FINAL_MODEL", None)
+    args = ("cv", {"title": "Data Analyst"}, None)
+    assert llm._cache_key(*args, stage=llm.STAGE_QUESTION) == llm._cache_key(*args, stage=llm.STAGE_FINAL)
+    monkeypatch.setattr(llm.settings, "LLM_FINAL_MODEL", "deepseek/deepseek-r1")
+    assert llm._cache_key(*args, stage=llm.STAGE_QUESTION) != llm._cache_key(*args, stage=llm.STAGE_FINAL)
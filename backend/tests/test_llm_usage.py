@@ -0,0 +1,78 @@
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import llm, llm_usage
+
+
+def test_exhausted_budget_degrades_without_upstream_calls(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(llm_usage, "SessionLocal", Session)
+    monkeypatch.setattr(llm_usage.settings, "LLM_TOKEN_BUDGET_PER_EMPLOYER", 500)
+    monkeypatch.setattr(llm.settings, "LLM_CACHE_ENABLED", False)
+    llm_usage.reset_totals()
+
+    calls = 0
+
+    async def upstream(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        llm._record_usage(700, 100)
+        return {"score": 50}
+
+    monkeypatch.setattr(llm, "_complete_json_async", upstream)
+
+    async def run():
+        llm_usage.bind(application_id=1, vacancy_id=10, employer_id=7)
+        record = llm.llm_metrics.start_call("gemini:test", 1, 10, 3)
+        first = await llm.analyze_cv_async("cv", {"title": "x"})
+        llm.llm_metrics.finish_call(record, "ok")
+        second = await llm.analyze_cv_async("cv", {"title": "x"})
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"score": 50}
+    assert second is None
+    assert calls == 1
+    assert llm_usage.flush()
+    db = Session()
+    report = llm_usage.report(db, "employer")
+    db.close()
+    assert report == [
+        {"employer_id": 7, "calls": 1, "prompt_tokens": 700, "completion_tokens": 100, "total_tokens": 800, "budget": 500}
+    ]
+
+
+def test_budget_totals_are_kept_in_memory_and_reloaded_off_the_caller(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(llm_usage, "SessionLocal", Session)
+    llm_usage.reset_totals()
+    db = Session()
+    db.add(models.LLMUsage(vacancy_id=3, employer_id=4, provider="gemini", model="m", prompt_tokens=600, completion_tokens=200))
+    db.commit()
+    db.close()
+
+    # The first check only schedules the load; it does not wait for it.
+    assert llm_usage._total("employer", 4) in (0, 800)
+    assert llm_usage.flush()
+    assert llm_usage._total("employer", 4) == 800
+
+    async def run():
+        llm_usage.bind(application_id=1, vacancy_id=3, employer_id=4)
+        llm_usage.record("gemini", "m", 100, 50, True)
+        # Counted before the row is written.
+        return llm_usage._total("vacancy", 3)
+
+    assert asyncio.run(run()) == 950
+    assert llm_usage.flush()
+    assert llm_usage._PENDING == {}
+    assert llm_usage._total("employer", 4) == 950
+    db = Session()
+    assert db.query(models.LLMUsage).count() == 2
+    db.close()
@@ -0,0 +1,141 @@
+import random
+import re
+
+from app.services import matching
+from app.services.cv import compute_relevance
+
+
+def _reference(cv_text, vacancy):
+    # compute_relevance as it was before the compiled matcher; scores must not drift.
+    text = cv_text.lower()
+    score = 40
+    mismatches, notes = [], []
+    skills = [s.lower() for s in (vacancy.get("skills", []) or [])]
+    matched_skills = sum(1 for s in skills if s and s in text)
+    if skills:
+        score += int(35 * (matched_skills / max(1, len(skills))))
+        notes.append(f"навыки {matched_skills}/{len(skills)}")
+    city = (vacancy.get("city") or "").lower()
+    if city:
+        if city in text:
+            score += 6
+            notes.append("город совпадает")
+        else:
+            mismatches.append("город")
+    min_exp = int(vacancy.get("min_experience_years") or 0)
+    if min_exp:
+        exp_match = re.search(r"(опыт\s*(\d+))|((\d+)\+?\s*год)", text)
+        years = int(next((g for g in exp_match.groups() if g and g.isdigit()), "0")) if exp_match else 0
+        if years >= min_exp:
+            score += 6
+            notes.append(f"опыт {years} >= {min_exp}")
+        else:
+            mismatches.append("опыт")
+    emp = (vacancy.get("employment_type") or "").lower()
+    if emp:
+        if emp in text:
+            score += 3
+        else:
+            mismatches.append("занятость")
+    edu = (vacancy.get("education_level") or "").lower()
+    if edu:
+        if edu in text or ("бакалавр" in edu and "бакалавр" in text):
+            score += 3
+        else:
+            mismatches.append("образование")
+    langs = [l.lower() for l in (vacancy.get("languages") or [])]
+    if langs:
+        lang_hit = sum(1 for l in langs if l and l in text)
+        if lang_hit == 0:
+            mismatches.append("языки")
+        else:
+            score += 3
+            notes.append(f"языки {lang_hit}/{len(langs)}")
+    try:
+        smin = float(vacancy.get("salary_min") or 0.0)
+    except Exception:
+        smin = 0.0
+    if smin:
+        sal_match = re.search(r"(\d{2,6})\s*(k|тыс|тг|₸)?", text)
+        if sal_match:
+            if float(sal_match.group(1)) <= smin * 1.2:
+                score += 4
+            else:
+                mismatches.append("зарплата")
+    title = (vacancy.get("title") or "").lower()
+    if title:
+        key = title.split("(")[0].strip()
+        if any(tok for tok in key.split() if tok in text):
+            score += 5
+            notes.append("позиция релевантна")
+    return max(0, min(100, score)), mismatches, "; ".join(notes) if notes else ""
+
+
+WORDS = ["SQL", "Python", "Java", "JavaScript", "React", "Go", "Tableau", "английский", "казахский", "Алматы",
+         "Астана", "full-time", "part-time", "бакалавр", "магистр", "Data", "Analyst", "Developer", "опыт 3", "5 лет",
+         "2+ года", "300000 тг", "450 тыс", "", "(React)"]
+
+
+def _corpus(seed):
+    rnd = random.Random(seed)
+    vacancies = [
+        {
+            "title": " ".join(rnd.sample(WORDS, 2)) + rnd.choice(["", " (Senior)"]),
+            "city": rnd.choice(["Алматы", "Астана", None]),
+            "min_experience_years": rnd.choice([0, 1, 3, 6, None]),
+            "employment_type": rnd.choice(["full-time", "part-time", None]),
+            "education_level": rnd.choice(["бакалавр", "Бакалавр ИТ", "магистр", None]),
+            "languages": rnd.sample(["английский", "казахский", "немецкий"], rnd.randint(0, 2)),
+            "salary_min": rnd.choice([None, 0, 250000, 400, "abc"]),
+            "skills": rnd.sample(WORDS, rnd.randint(0, 5)),
+        }
+        for _ in range(60)
+    ]
+    cvs = [" ".join(rnd.choices(WORDS, k=rnd.randint(0, 30))) for _ in range(40)]
+    return vacancies, cvs
+
+
+def test_bulk_scores_match_reference(monkeypatch):
+    vacancies, cvs = _corpus(7)
+    expected = [[_reference(cv, v) for v in vacancies] for cv in cvs]
+    assert [[compute_relevance(cv, v) for v in vacancies] for cv in cvs] == expected
+    assert [matching.score_vacancies(cv, vacancies) for cv in cvs] == expected
+    assert [matching.score_cvs(v, cvs) for v in vacancies] == [list(col) for col in zip(*expected)]
+    monkeypatch.setattr(matching, "_AUTOMATON_MIN_PATTERNS", 0)
+    assert [matching.score_vacancies(cv, vacancies) for cv in cvs] == expected
+
+
+def test_pattern_set_finds_overlapping_patterns():
+    found = matching.PatternSet(["java", "javascript", "script", "ava", "sql"]).search("i write javascript")
+    assert found == {"java", "javascript", "script", "ava"}
+
+
+def _stored(cv_text):
+    return matching.stored_features(type("Row", (), dict(matching.cv_profile(cv_text), cv_text=cv_text))())
+
+
+def test_stored_profile_scores_equal_compute_relevance(monkeypatch):
+    vacancies, cvs = _corpus(11)
+    vacancies.append({
+        "title": "Backend Developer", "city": "Алматы", "employment_type": "full-time",
+        "skills": ["C++", "C#", "Node.js", "React", "SQL", ".NET", "1С"],
+    })
+    cvs.append("C++, C#, Node.js, React.js, PostgreSQL, .NET. Опыт 4 года, Алматы, full-time. 350000 тг")
+    expected = [[compute_relevance(cv, v) for v in vacancies] for cv in cvs]
+    assert expected[-1][-1][2].startswith("навыки 6/7")
+    assert [[matching.VacancyMatcher(v).score_features(_stored(cv)) for v in vacancies] for cv in cvs] == expected
+    assert [matching.score_vacancies(_stored(cv), vacancies) for cv in cvs] == expected
+    monkeypatch.setattr(matching, "_AUTOMATON_MIN_PATTERNS", 0)
+    assert [matching.score_vacancies(_stored(cv), vacancies) for cv in cvs] == expected
+
+    legacy = type("Row", (), {"cv_experience_years": None, "cv_text": cvs[-1]})()
+    assert matching.VacancyMatcher(vacancies[-1]).score_features(matching.stored_features(legacy)) == expected[-1][-1]
+
+
+def test_profile_stores_sorted_distinct_words_for_candidate_lookup():
+    text = "Python, SQL и снова Python. Опыт 3 года, Астана"
+    profile = matching.cv_profile(text)
+    assert profile["cv_terms"] == "3 python sql астана года и опыт снова"
+    assert profile["cv_experience_years"] == 3
+    stored = _stored(text)
+    assert stored.terms == matching.CVFeatures(text).terms
@@ -0,0 +1,31 @@
+from app.services import llm, mock_llm
+from app.services.cv import compute_relevance
+
+
+VACANCY = {
+    "title": "Data Analyst",
+    "city": "Астана",
+    "min_experience_years": 1,
+    "employment_type": "full-time",
+    "skills": ["SQL", "Python", "Tableau"],
+    "languages": [],
+    "salary_min": None,
+}
+CV = "SQL Python. Опыт 2 года. Город Алматы."
+
+
+def test_mock_answer_is_derived_from_compute_relevance():
+    answer = mock_llm.build_answer(llm._openrouter_prompt(CV, VACANCY))
+    score, mismatches, _ = compute_relevance(CV, VACANCY)
+    assert answer["score"] == score
+    assert answer["mismatches"] == mismatches
+    assert "Астана" in answer["question"]
+
+
+def test_mock_follow_up_moves_to_next_mismatch_and_finishes():
+    ctx = [{"role": "bot", "content": "?"}, {"role": "user", "content": "Готов к переезду"}]
+    answer = mock_llm.build_answer(llm._openrouter_prompt(CV, VACANCY, ctx))
+    assert "занятости" in answer["question"]
+    ctx += [{"role": "bot", "content": "?"}, {"role": "user", "content": "Полная"}]
+    answer = mock_llm.build_answer(llm._openrouter_prompt(CV, VACANCY, ctx))
+    assert answer["question"] is None
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.services import pdf_pool
+from app.services.cv import extract_pdf
+
+
+def _pdf(tmp_path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    path = tmp_path / "cv.pdf"
+    with path.open("wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def _text_pdf(tmp_path, pages):
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    })
+    for i in range(pages):
+        page = writer.add_blank_page(width=200, height=200)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): writer._add_object(font)}),
+        })
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 12 Tf 20 100 Td (Page {i} SQL Python) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    path = tmp_path / "text.pdf"
+    with path.open("wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_extraction_stops_once_enough_text_is_collected(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_pool.settings, "PDF_TRACE_MEMORY", True)
+    path = _text_pdf(tmp_path, 10)
+    full, stats = extract_pdf(path)
+    assert full.splitlines()[3] == "Page 3 SQL Python"
+    assert stats["pages"] == 10 and not stats["truncated"]
+
+    text, stats = extract_pdf(path, max_chars=40)
+    assert text == full[:40]
+    assert stats["truncated"] and stats["pages"] == 3 and stats["chars"] == 40
+    assert stats["peak_bytes"] > 0
+
+
+def test_timed_out_document_recycles_pool_and_next_one_succeeds(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_pool.settings, "PDF_WORKERS", 1)
+    monkeypatch.setattr(pdf_pool.settings, "PDF_MAX_PAGES", 2)
+    path = _pdf(tmp_path, 3)
+
+    async def run():
+        with pytest.raises(pdf_pool.PdfExtractionError):
+            await pdf_pool.run(time.sleep, 30, timeout=0.5)
+        return await pdf_pool.extract_text(path)
+
+    try:
+        started = time.monotonic()
+        assert asyncio.run(run()) == "\n"  # two of three pages
+        assert time.monotonic() - started < 20
+    finally:
+        pdf_pool.shutdown()
+
+
+def test_unreadable_pdf_is_reported(tmp_path):
+    bad = tmp_path / "bad.pdf"
+    bad.write_bytes(b"not a pdf")
+    try:
+        with pytest.raises(pdf_pool.PdfExtractionError):
+            asyncio.run(pdf_pool.extract_text(str(bad)))
+    finally:
+        pdf_pool.shutdown()
+
+
+def test_peak_memory_is_reported_per_document_without_tracing(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_pool.settings, "PDF_TRACE_MEMORY", False)
+    path = _text_pdf(tmp_path, 3)
+    _, stats = extract_pdf(path)
+    assert stats["peak_bytes"] is None
+    assert isinstance(stats["rss_growth_bytes"], int) and stats["rss_growth_bytes"] >= 0
+
+    pdf_pool.llm_metrics.reset()
+    try:
+        assert "Page 2 SQL Python" in asyncio.run(pdf_pool.extract_text(path))
+    finally:
+        pdf_pool.shutdown()
+    histograms = pdf_pool.llm_metrics.snapshot()["histograms"]
+    assert histograms["pdf_extract_rss_growth_bytes"][0]["count"] == 1
+    assert "pdf_extract_peak_bytes" not in histograms
@@ -0,0 +1,25 @@
+from app.services import prompt
+
+
+def test_clip_to_tokens_respects_budget():
+    text = "Опыт работы с Python и SQL. " * 500
+    clipped = prompt.clip_to_tokens(text, 200)
+    assert prompt.estimate_tokens(clipped) <= 200
+    assert clipped.startswith("Опыт работы")
+
+
+def test_profile_mode_sends_relevant_passages_instead_of_cv():
+    cv = (
+        "Работал аналитиком в банке, строил отчёты в Excel. " * 12 + "\n\n"
+        + "Развёртывал сервисы в Kubernetes, настраивал Helm чарты. " * 8 + "\n\n"
+        + "Хобби: шахматы и бег. " * 30
+    )
+    context = prompt.build_context(
+        "Позиция: DevOps",
+        cv,
+        profile={"city": "Алматы", "skills": ["Excel"]},
+        focus=["Нет подтверждённого опыта с Kubernetes"],
+    )
+    assert "РЕЗЮМЕ(ПОЛНЫЙ ТЕКСТ)" not in context
+    assert "Kubernetes, настраивал Helm" in context
+    assert "шахматы" not in context
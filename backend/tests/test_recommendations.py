@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import recommendations
+from app.services.cv import compute_relevance
+from app.services.vacancies import vacancy_to_dict
+
+
+def test_recommendations_use_the_index_and_follow_create_delete(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rec.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(recommendations, "SessionLocal", Session)
+    monkeypatch.setattr(recommendations, "_LOADED_AT", None)
+    db = Session()
+
+    def vacancy(title, skills, city="Астана"):
+        v = models.Vacancy(title=title, city=city, description="-", employment_type="full-time", skills=skills)
+        db.add(v)
+        db.commit()
+        return v
+
+    analyst = vacancy("Data Analyst", "SQL,Python,Tableau")
+    backend = vacancy("Backend", "Python,FastAPI", city="Алматы")
+    vacancy("Designer", "Figma,Photoshop", city="Шымкент")
+    cv = "Аналитик: SQL, Python, Tableau, Machine Learning. Астана."
+
+    top = recommendations.recommend(cv, k=5)
+    assert [vid for vid, _, _ in top] == [analyst.id, backend.id]  # the designer shares no term
+    assert top[0][2] == compute_relevance(cv, vacancy_to_dict(analyst))
+
+    ml = vacancy("ML Engineer", "Machine Learning,SQL")
+    recommendations.add(ml)
+    assert ml.id in [vid for vid, _, _ in recommendations.recommend(cv, k=5)]
+    recommendations.remove(analyst.id)
+    assert analyst.id not in [vid for vid, _, _ in recommendations.recommend(cv, k=5)]
+
+
+def test_rebuild_is_single_flight_and_keeps_concurrent_changes(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rec.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(recommendations, "SessionLocal", Session)
+    monkeypatch.setattr(recommendations, "_LOADED_AT", None)
+    db = Session()
+    gone = models.Vacancy(title="Gone", city="Астана", description="-", employment_type="full-time", skills="SQL")
+    kept = models.Vacancy(title="Kept", city="Астана", description="-", employment_type="full-time", skills="SQL")
+    db.add_all([gone, kept])
+    db.commit()
+    recommendations.rebuild()
+
+    # Changes made while a rebuild is reading the table survive the swap.
+    late = models.Vacancy(id=999, title="Late", city="Астана", description="-", employment_type="full-time", skills="SQL")
+    entry = recommendations._entry
+
+    def entry_with_concurrent_changes(v):
+        if v.id == gone.id:
+            recommendations.remove(gone.id)
+            recommendations.add(late)
+        return entry(v)
+
+    monkeypatch.setattr(recommendations, "_entry", entry_with_concurrent_changes)
+    recommendations.rebuild()
+    monkeypatch.setattr(recommendations, "_entry", entry)
+    assert sorted(vid for vid, _, _ in recommendations.recommend("SQL", k=5)) == sorted([kept.id, 999])
+
+    # A stale index is served while one background rebuild runs.
+    builds = []
+    rebuild_locked = recommendations._rebuild_locked
+
+    def slow_rebuild():
+        builds.append(1)
+        time.sleep(0.2)
+        rebuild_locked()
+
+    monkeypatch.setattr(recommendations, "_rebuild_locked", slow_rebuild)
+    monkeypatch.setattr(recommendations, "_LOADED_AT", time.monotonic() - 10_000)
+    threads = [threading.Thread(target=recommendations.recommend, args=("SQL",)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    deadline = time.monotonic() + 5
+    while recommendations._REFRESHING and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert builds == [1]
+
+
+def test_candidates_match_a_full_scan_on_a_large_index(monkeypatch):
+    rng = random.Random(5)
+    pool = ["SQL", "Python", "Java", "Go", "Docker", "Kubernetes", "React", "Figma", "Excel", "Tableau", "Spark", "Kafka"]
+    cities = ["Астана", "Алматы", "Шымкент"]
+    vacancies = []
+    for i in range(1, 20001):
+        skills = rng.sample(pool, rng.randint(1, 6))
+        vacancies.append(models.Vacancy(
+            id=i, title=f"Vacancy {i}", city=rng.choice(cities), description="-",
+            employment_type="full-time", skills=",".join(skills),
+        ))
+    postings, entries = {}, {}
+    for v in vacancies:
+        recommendations._put(postings, entries, v.id, recommendations._entry(v))
+    monkeypatch.setattr(recommendations, "_POSTINGS", postings)
+    monkeypatch.setattr(recommendations, "_ENTRIES", entries)
+    monkeypatch.setattr(recommendations, "_LOADED_AT", time.monotonic())
+
+    for cv in (
+        "SQL, Python, Docker. Астана, full-time",
+        "Java Kafka Spark Kubernetes Go, Алматы",
+        "Excel и Tableau, опыт 2 года, Шымкент",
+    ):
+        full = sorted(
+            ((v.id, compute_relevance(cv, vacancy_to_dict(v))) for v in vacancies),
+            key=lambda item: (-item[1][0], -item[0]),
+        )
+        top = recommendations.recommend(cv, k=10)
+        assert [result[0] for _, _, result in top] == [result[0] for _, result in full[:10]]
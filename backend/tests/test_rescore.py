@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services.cv import compute_relevance
+from app.services.matching import cv_profile
+from app.services.vacancies import vacancy_to_dict
+from scripts import rescore
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rescore.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(rescore, "SessionLocal", Session)
+    monkeypatch.setattr(rescore, "engine", engine)
+    session = Session()
+    vacancy = models.Vacancy(title="Data Analyst", city="Астана", description="-", employment_type="full-time", skills="SQL,Python")
+    session.add(vacancy)
+    session.commit()
+    for i in range(25):
+        text = f"SQL {'Python ' if i % 2 else ''}Астана, опыт {i % 5} года"
+        # Every third application predates stored profiles.
+        profile = cv_profile(text) if i % 3 else {}
+        session.add(models.Application(
+            vacancy_id=vacancy.id, candidate_name=f"c{i}", candidate_email=f"c{i}@example.com",
+            cv_file_path="x", cv_text=text, **profile,
+        ))
+    session.commit()
+    chatted = session.query(models.Application).order_by(models.Application.id).all()[4]
+    session.add(models.ChatSession(application_id=chatted.id, state="closed"))
+    session.commit()
+    rescore._init_worker(rescore._load_vacancies())
+    yield session
+    session.close()
+
+
+def _run(state, checkpoint, include_chatted=False, stop_after=None):
+    progress = rescore._Progress(str(checkpoint), state)
+    chunks = rescore._stream_rows(state["last_id"], 10, None, include_chatted, rescore.COLUMNS)
+    for n, rows in enumerate(chunks):
+        if stop_after is not None and n == stop_after:
+            break
+        progress.commit(rows, *rescore._score_chunk(rows))
+    return progress
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(db, tmp_path):
+    checkpoint = tmp_path / "cp.json"
+    run = {"mode": "heuristic", "vacancy_id": None, "include_chatted": False}
+    apps = db.query(models.Application).order_by(models.Application.id).all()
+    chatted = apps[4].id
+
+    _run(rescore._load_checkpoint(str(checkpoint), run), checkpoint, stop_after=1)
+    saved = json.loads(checkpoint.read_text())
+    db.expire_all()
+    scored = [a.id for a in db.query(models.Application).filter(models.Application.relevance_score.isnot(None))]
+    # One committed chunk of 10, not counting the application with a finished chat.
+    assert saved["processed"] == 10 and saved["last_id"] == scored[-1] and len(scored) == 10
+    assert chatted not in scored
+
+    state = rescore._load_checkpoint(str(checkpoint), run)
+    assert state["last_id"] == saved["last_id"]
+    _run(state, checkpoint)
+    assert json.loads(checkpoint.read_text())["processed"] == 24
+
+    db.expire_all()
+    vacancy = vacancy_to_dict(db.query(models.Vacancy).one())
+    for app in db.query(models.Application).order_by(models.Application.id):
+        if app.id == chatted:
+            assert app.relevance_score is None
+            continue
+        assert app.relevance_score == compute_relevance(app.cv_text, vacancy)[0]
+        assert app.cv_terms is not None and app.cv_experience_years is not None  # profiles backfilled
+
+
+def test_checkpoint_of_another_run_is_refused(tmp_path):
+    checkpoint = tmp_path / "cp.json"
+    rescore._save_checkpoint(str(checkpoint), {"mode": "llm", "vacancy_id": None, "include_chatted": False, "last_id": 7, "processed": 7})
+    with pytest.raises(SystemExit, match="another run"):
+        rescore._load_checkpoint(str(checkpoint), {"mode": "heuristic", "vacancy_id": None, "include_chatted": False})
+
+
+def test_include_chatted_also_rescores_finished_chats(db, tmp_path):
+    checkpoint = tmp_path / "cp.json"
+    run = {"mode": "heuristic", "vacancy_id": None, "include_chatted": True}
+    _run(rescore._load_checkpoint(str(checkpoint), run), checkpoint, include_chatted=True)
+    assert json.loads(checkpoint.read_text())["processed"] == 25
+    db.expire_all()
+    assert db.query(models.Application).filter(models.Application.relevance_score.is_(None)).count() == 0
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import scoring
+
+
+def test_job_scores_application_in_background(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    monkeypatch.setattr(scoring, "SessionLocal", Session)
+    monkeypatch.setattr(scoring, "_QUEUE", None)
+
+    async def no_llm(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(scoring, "analyze_cv_async", no_llm)
+
+    db = Session()
+    vacancy = models.Vacancy(
+        title="Data Analyst", city="Астана", description="SQL", employment_type="full-time", skills="SQL,Python", min_experience_years=1
+    )
+    db.add(vacancy)
+    db.commit()
+    app = models.Application(vacancy_id=vacancy.id, candidate_name="t", candidate_email="t@example.com", cv_file_path="x", cv_text="SQL Python, Астана")
+    db.add(app)
+    db.commit()
+
+    async def run():
+        await scoring.enqueue(db, app.id)
+        assert scoring.scoring_status(db, app.id) == "scoring"
+        await scoring.start_workers()
+        for _ in range(100):
+            db.expire_all()
+            if scoring.scoring_status(db, app.id) != "scoring":
+                break
+            await asyncio.sleep(0.01)
+        await scoring.stop_workers()
+
+    asyncio.run(run())
+    db.expire_all()
+    assert scoring.scoring_status(db, app.id) == "scored"
+    assert db.get(models.Application, app.id).relevance_score is not None
+    db.close()
+
+
+def test_worker_database_calls_run_off_the_event_loop(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    threads = []
+
+    def session():
+        threads.append(threading.current_thread())
+        return Session()
+
+    monkeypatch.setattr(scoring, "SessionLocal", session)
+    monkeypatch.setattr(scoring, "_QUEUE", None)
+
+    async def no_llm(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(scoring, "analyze_cv_async", no_llm)
+    db = Session()
+    vacancy = models.Vacancy(title="Analyst", city="Астана", description="-", employment_type="full-time", skills="SQL", created_by=None)
+    db.add(vacancy)
+    db.commit()
+    app = models.Application(vacancy_id=vacancy.id, candidate_name="t", candidate_email="t@example.com", cv_file_path="x", cv_text="SQL")
+    db.add(app)
+    db.commit()
+    job = models.ScoringJob(application_id=app.id, status=scoring.QUEUED)
+    db.add(job)
+    db.commit()
+
+    asyncio.run(scoring._run_job(job.id))
+    db.expire_all()
+    assert db.get(models.ScoringJob, job.id).status == scoring.DONE
+    assert db.get(models.Application, app.id).relevance_score is not None
+    assert threads and threading.main_thread() not in threads
+    db.close()
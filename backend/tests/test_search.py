@@ -0,0 +1,51 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.services import search
+from app.services.stemmer import stem
+
+
+def test_russian_word_forms_share_a_stem():
+    assert stem("разработчиками") == stem("разработчика") == stem("разработчик")
+    assert stem("аналитиком") == stem("аналитика")
+    assert stem("Kubernetes") == "kubernetes"
+
+
+def test_search_is_stemmed_ranked_and_scoped_to_employer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    mine = models.Vacancy(title="DevOps", city="Алматы", description="k8s", employment_type="full-time", created_by=1)
+    other = models.Vacancy(title="DevOps", city="Алматы", description="k8s", employment_type="full-time", created_by=2)
+    db.add_all([mine, other])
+    db.commit()
+
+    def apply(vacancy, cv_text):
+        app = models.Application(vacancy_id=vacancy.id, candidate_name="c", candidate_email="c@x", cv_file_path="x", cv_text=cv_text)
+        db.add(app)
+        db.commit()
+        return app
+
+    existing = apply(mine, "Работал разработчиком, Kubernetes в продакшене. Kubernetes, Helm.")
+    search.ensure_index(engine)  # backfills rows created before the index
+    later = apply(mine, "Опыт работы разработчиком Python, немного Kubernetes")
+    search.index_application(db, later)
+    hidden = apply(other, "Kubernetes разработчик")
+    search.index_application(db, hidden)
+    apply(mine, "Tableau, SQL")  # not indexed through index_application -> invisible, not an error
+
+    result = search.search_applications(db, "kubernetes разработчики", employer_id=1)
+    assert result["total"] == 2
+    assert [item["id"] for item in result["items"]] == [existing.id, later.id]
+    assert all(item["vacancy_id"] == mine.id for item in result["items"])
+    assert "Kubernetes" in result["items"][0]["excerpt"]
+    assert search.search_applications(db, "kubernetes", employer_id=None)["total"] == 3
+    assert search.search_applications(db, "kubernetes", employer_id=1, page=2, page_size=1)["items"][0]["id"] == later.id
+    assert search.search_applications(db, '"; DROP', employer_id=1)["total"] == 0
+
+    search.remove_applications(db, [existing.id])
+    db.commit()
+    result = search.search_applications(db, "kubernetes", employer_id=1)
+    assert [item["id"] for item in result["items"]] == [later.id]
+    assert hidden.id not in [item["id"] for item in result["items"]]
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import io
+import re
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import unquote
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.services import fake_s3, files, storage
+from app.services.cv import extract_text_from_pdf
+from tests.test_pdf_pool import _text_pdf
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    server = fake_s3.start()
+    for name, value in {
+        "STORAGE_PROVIDER": "s3",
+        "AWS_S3_BUCKET": "cvs",
+        "AWS_ACCESS_KEY_ID": "test",
+        "AWS_SECRET_ACCESS_KEY": "test",
+        "AWS_REGION": "us-east-1",
+        "S3_ENDPOINT_URL": server.endpoint_url,
+        "S3_ADDRESSING_STYLE": "path",
+    }.items():
+        monkeypatch.setattr(storage.settings, name, value)
+    storage.reset()
+    yield server
+    storage.reset()
+    server.shutdown()
+
+
+def test_s3_backend_round_trip(s3, tmp_path):
+    data = bytes(range(256)) * 4096  # 1 MiB
+    upload = UploadFile(io.BytesIO(data), filename="резюме.bin")
+    first, digest = asyncio.run(files.save_upload_with_digest(upload))
+    assert re.fullmatch(r"s3://cvs/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{28}\.bin", first) and len(digest) == 64
+    obj = s3.objects[storage.S3Storage.parse(first)]
+    assert unquote(obj.metadata[storage.FILENAME_METADATA]) == "резюме.bin"
+    assert "filename%2A%3DUTF-8%27%27" in storage.public_url(first, "резюме.bin")
+    second = asyncio.run(files.save_upload(UploadFile(io.BytesIO(b"other"), filename="резюме.bin")))
+    assert second != first
+
+    assert storage.size(first) == len(data)
+    assert storage.read_range(first, 10, 19) == data[10:20]
+    assert asyncio.run(storage.aread_range(first, len(data) - 5)) == data[-5:]
+    assert b"".join(storage.iter_chunks(first, 100_000)) == data
+
+    async def collect():
+        return [chunk async for chunk in storage.aiter_chunks(first, 300_000)]
+
+    assert [len(c) for c in asyncio.run(collect())] == [300_000, 300_000, 300_000, 148_576]
+
+    with open(_text_pdf(tmp_path, 2), "rb") as pdf:
+        location = storage.backend().put("cv.pdf", pdf, "application/pdf")
+    assert extract_text_from_pdf(location) == "Page 0 SQL Python\nPage 1 SQL Python"
+
+    storage.delete(second)
+    assert not storage.backend().exists(storage.S3Storage.parse(second)[1])
+
+
+def test_local_backend_reads_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage.settings, "UPLOAD_DIR", str(tmp_path))
+    location = storage.backend().put("a/b.txt", b"0123456789")
+    assert location == str(tmp_path / "a" / "b.txt")
+    assert storage.read_range(location, 2, 4) == b"234"
+    assert storage.size(location) == 10
+
+
+def test_large_upload_goes_multipart_and_oversized_is_aborted(s3, monkeypatch):
+    monkeypatch.setattr(storage.settings, "S3_MULTIPART_PART_MB", 5)
+    monkeypatch.setattr(storage.settings, "MAX_UPLOAD_MB", 12)
+    data = bytes(range(256)) * (11 * 4096)  # 11 MiB: parts of 5 + 5 + 1 MiB
+    location, digest = asyncio.run(files.save_upload_with_digest(UploadFile(io.BytesIO(data), filename="big.pdf")))
+    assert storage.size(location) == len(data) and digest == hashlib.sha256(data).hexdigest()
+    assert s3.objects[storage.S3Storage.parse(location)].etag.endswith('-3"')
+
+    too_big = UploadFile(io.BytesIO(data + data), filename="huge.pdf")
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(files.save_upload_with_digest(too_big))
+    assert e.value.status_code == 413
+    assert too_big.file.tell() <= 13 * 1024 * 1024  # stopped reading right after the limit
+    assert len(s3.objects) == 1 and not s3.uploads
+
+
+def test_local_upload_is_streamed_and_oversized_leaves_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage.settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(storage.settings, "MAX_UPLOAD_MB", 1)
+    data = b"%PDF" + b"x" * 700_000
+    location, digest = asyncio.run(files.save_upload_with_digest(UploadFile(io.BytesIO(data), filename="cv.pdf")))
+    assert open(location, "rb").read() == data and digest == hashlib.sha256(data).hexdigest()
+
+    with pytest.raises(HTTPException):
+        asyncio.run(files.save_upload_with_digest(UploadFile(io.BytesIO(data * 2), filename="big.pdf")))
+    assert [str(p) for p in tmp_path.rglob("*") if p.is_file()] == [location]
+
+
+def test_concurrent_uploads_of_one_name_get_distinct_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage.settings, "UPLOAD_DIR", str(tmp_path))
+
+    async def upload_all():
+        uploads = [UploadFile(io.BytesIO(b"%%PDF %d" % i), filename="cv.pdf") for i in range(50)]
+        return await asyncio.gather(*[files.save_upload(u) for u in uploads])
+
+    locations = asyncio.run(upload_all())
+    assert len(set(locations)) == 50
+    assert sorted(open(p, "rb").read() for p in locations) == sorted(b"%%PDF %d" % i for i in range(50))
+    assert storage.public_url(locations[0]) == "/uploads/" + Path(locations[0]).relative_to(tmp_path).as_posix()
+
+
+def test_multipart_upload_spools_parts_instead_of_holding_them_in_memory(monkeypatch):
+    # tracemalloc sees every thread, so the fake server runs in its own
+    # process here; otherwise the bytes it receives would count as ours.
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.services.fake_s3", "--port", str(port)],
+        cwd=Path(__file__).resolve().parents[1], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                assert time.monotonic() < deadline, "fake S3 server did not start"
+                time.sleep(0.05)
+        for name, value in {
+            "STORAGE_PROVIDER": "s3",
+            "AWS_S3_BUCKET": "cvs",
+            "AWS_ACCESS_KEY_ID": "test",
+            "AWS_SECRET_ACCESS_KEY": "test",
+            "AWS_REGION": "us-east-1",
+            "S3_ENDPOINT_URL": f"http://127.0.0.1:{port}",
+            "S3_ADDRESSING_STYLE": "path",
+            "S3_MULTIPART_PART_MB": 5,
+            "S3_SPOOL_MEMORY_KB": 256,
+        }.items():
+            monkeypatch.setattr(storage.settings, name, value)
+        storage.reset()
+        chunk = bytes(range(256)) * 256  # 64 KiB, reused for every write
+        total = 12 * 1024 * 1024
+        parts = []
+        client = storage.s3_client()
+        upload_part = client.upload_part
+
+        def record_part(**kwargs):
+            parts.append(kwargs["Body"]._rolled)  # spooled to disk, not held in memory
+            return upload_part(**kwargs)
+
+        monkeypatch.setattr(client, "upload_part", record_part)
+
+        async def upload():
+            writer = storage.backend().writer(storage.new_key("big.pdf"), "application/pdf")
+            tracemalloc.start()
+            try:
+                for _ in range(total // len(chunk)):
+                    await writer.write(chunk)
+                location = await writer.commit()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            return location, peak
+
+        location, peak = asyncio.run(upload())
+        assert parts == [True, True, True]  # 5 + 5 + 2 MiB
+        assert storage.size(location) == total
+        assert storage.read_range(location, total - len(chunk), total - 1) == chunk
+        assert peak < 4 * 1024 * 1024  # under one 5 MiB part, let alone the 12 MiB upload
+    finally:
+        storage.reset()
+        server.terminate()
+        server.wait(10)
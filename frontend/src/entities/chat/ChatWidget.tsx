@@ -23,6 +23,7 @@ export default function ChatWidget({ applicationId, chatToken }: ChatWidgetProps
   const listRef = useRef<HTMLDivElement | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
   const messageIdCounter = useRef(0);
+  const draftRef = useRef<{ qid: number; msgId: number } | null>(null);
   const reconnectAttempts = useRef(0);
   const shouldReconnect = useRef(true);
 
@@ -70,9 +71,42 @@ export default function ChatWidget({ applicationId, chatToken }: ChatWidgetProps
             setIsBotTyping(data.value);
             break;
 
-          case "question":
+          case "question_delta": {
             setIsBotTyping(false);
             setStatusMessage("");
+            const draft = draftRef.current;
+            if (draft && draft.qid === data.id) {
+              setMessages((prev) =>
+                prev.map((m) => (m.id === draft.msgId ? { ...m, text: m.text + data.text } : m))
+              );
+            } else {
+              const msgId = ++messageIdCounter.current;
+              draftRef.current = { qid: data.id, msgId };
+              setMessages((prev) => [...prev, { id: msgId, text: data.text, sender: "them" }]);
+            }
+            break;
+          }
+
+          case "question_reset": {
+            const draft = draftRef.current;
+            draftRef.current = null;
+            if (draft) {
+              setMessages((prev) => prev.filter((m) => m.id !== draft.msgId));
+            }
+            break;
+          }
+
+          case "question": {
+            setIsBotTyping(false);
+            setStatusMessage("");
+            const draft = draftRef.current;
+            draftRef.current = null;
+            if (draft && draft.qid === data.id) {
+              setMessages((prev) =>
+                prev.map((m) => (m.id === draft.msgId ? { ...m, text: data.text } : m))
+              );
+              break;
+            }
             const questionMsg: Message = {
               id: ++messageIdCounter.current,
               text: data.text,
@@ -80,6 +114,7 @@ export default function ChatWidget({ applicationId, chatToken }: ChatWidgetProps
             };
             setMessages((prev) => [...prev, questionMsg]);
             break;
+          }
 
           case "analysis_update":
             const ackMsg: Message = {
@@ -92,6 +127,11 @@ export default function ChatWidget({ applicationId, chatToken }: ChatWidgetProps
 
           case "final_summary":
             setIsBotTyping(false);
+            if (draftRef.current) {
+              const draftId = draftRef.current.msgId;
+              draftRef.current = null;
+              setMessages((prev) => prev.filter((m) => m.id !== draftId));
+            }
             const summaryMsg: Message = {
               id: ++messageIdCounter.current,
               text: data.message,
@@ -43,12 +43,14 @@ export interface ApplicationSummary {
   relevance_score?: number;
   mismatch_reasons?: string[];
   summary_text?: string;
+  scoring_status?: 'scoring' | 'scored' | 'failed';
 }
 
 export interface CreateApplicationResponse {
   application_id: number;
   chat_token: string;
   ws_url: string;
+  scoring_status?: 'scoring' | 'scored' | 'failed';
 }
 
 export interface ApplicationListResponse {